@@ -0,0 +1,136 @@
+"""
+Control de admisión y descarte de carga por clase de ruta
+
+Cada clase (p. ej. "calculate", "report") tiene un límite de peticiones
+concurrentes y una cola de espera acotada (FIFO) con plazo máximo. Si la cola
+está llena, o el plazo vence antes de obtener turno, la petición se rechaza
+de inmediato con Overloaded (el servidor responde 503 + Retry-After) en vez
+de acumular latencia sin límite.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class Overloaded(Exception):
+    """Petición rechazada por sobrecarga; `retry_after` en segundos."""
+
+    def __init__(self, route_class: str, reason: str, retry_after: int):
+        super().__init__(f"Servicio saturado ({route_class}: {reason})")
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionLimiter:
+    """Semáforo con cola FIFO acotada, plazo de espera y métricas."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._queue: deque = deque()
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._service_ewma = 0.0  # segundos por petición (media móvil)
+
+    def _retry_after(self) -> int:
+        per_slot = self._service_ewma or self.queue_timeout
+        return max(1, math.ceil(per_slot * (len(self._queue) + 1) / self.max_concurrent))
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.active < self.max_concurrent and not self._queue:
+                self.active += 1
+                self.admitted += 1
+                return
+            if len(self._queue) >= self.max_queue:
+                self.rejected_full += 1
+                raise Overloaded(self.name, "cola llena", self._retry_after())
+            waiter = _Waiter()
+            self._queue.append(waiter)
+            self.queued += 1
+
+        waiter.event.wait(self.queue_timeout)
+        with self._lock:
+            if waiter.granted:
+                self.admitted += 1
+                return
+            self._queue.remove(waiter)
+            self.rejected_timeout += 1
+            raise Overloaded(self.name, "plazo de espera agotado", self._retry_after())
+
+    def release(self, elapsed: float = 0.0) -> None:
+        with self._lock:
+            if elapsed > 0:
+                self._service_ewma = elapsed if not self._service_ewma else 0.8 * self._service_ewma + 0.2 * elapsed
+            if self._queue:
+                # Traspaso directo del turno al primero de la cola (active no cambia)
+                waiter = self._queue.popleft()
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self.active -= 1
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout_s": self.queue_timeout,
+                "active": self.active,
+                "queue_depth": len(self._queue),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected_full": self.rejected_full,
+                "rejected_timeout": self.rejected_timeout,
+                "avg_service_ms": round(self._service_ewma * 1000, 2),
+            }
+
+
+# Límites por defecto por clase: (concurrencia, cola, plazo en s).
+# Configurables con CARDIORISK_ADMISSION_<CLASE>="concurrencia,cola,plazo".
+DEFAULT_LIMITS = {
+    "calculate": (32, 64, 2.0),
+    "report": (4, 8, 10.0),
+}
+
+
+def limiters_from_env(defaults: Dict = DEFAULT_LIMITS) -> Dict[str, AdmissionLimiter]:
+    limiters = {}
+    for name, (conc, queue, timeout) in defaults.items():
+        raw = os.environ.get(f"CARDIORISK_ADMISSION_{name.upper()}")
+        if raw:
+            parts = [p.strip() for p in raw.split(",")]
+            conc = int(parts[0]) if len(parts) > 0 and parts[0] else conc
+            queue = int(parts[1]) if len(parts) > 1 and parts[1] else queue
+            timeout = float(parts[2]) if len(parts) > 2 and parts[2] else timeout
+        limiters[name] = AdmissionLimiter(name, conc, queue, timeout)
+    return limiters
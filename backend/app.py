@@ -4,7 +4,12 @@ Autor: <tu-nombre>
 Licencia: MIT
 """
 
+import hmac
+import json
+import os
+import time
 from datetime import datetime, timedelta
+from functools import wraps
 from uuid import uuid4
 
 from flask import Flask, request, jsonify, send_file
@@ -13,16 +18,68 @@ from flask_cors import CORS
 
 from calculators import (
     framingham_risk,
-    score_risk,
+    score2_risk_with_path,
     acc_aha_risk,
+    recalculate,
+    MODEL_VERSION,
 )
+from admission import Overloaded, limiters_from_env
+from audit_log import audit_from_env
+from canonical import normalize_patient, inputs_digest
+from columnar import CATEGORY_LABELS, patients_to_columns, row_patient
+from debug_tools import MemoryTracer, SamplingProfiler
+from exporters import FORMATS, attachment_name, negotiate, render
+from jobs import TERMINAL as JOB_TERMINAL, JobQueueFull, jobs_from_env
+from microbatch import batcher_from_env, dedup_evaluate
+from models_spec import build_model_spec
+from percentiles import get_percentile_index
+from scenarios import run_scenarios
+from shadow import shadow_from_env
+from targets import FACTORS, solve_targets_batch
+from tokens import InvalidToken, looks_like_token, token_name, tokens_from_env
 from validators import validate_patient_data
-from report_generator import build_pdf_report
+from wire import MEDIA_TYPE as WIRE_MEDIA_TYPE, decode as wire_decode, encode as wire_encode, \
+    response_meta as wire_response_meta, score_decoded as wire_score
+# report_generator (reportlab) se importa de forma diferida en generate_report:
+# el núcleo de cálculo arranca sin cargar la librería de PDF.
 
 # ­In-memory store con expiración de 1 hora
 SESSIONS = {}
 EXPIRE_MINUTES = 60
 
+METHODS = ("framingham", "score", "acc-aha", "all")
+# Los resultados de /risk dependen solo de entradas y versión: inmutables
+RISK_CACHE_MAX_AGE = 86400
+# /models/spec tiene URL fija: revalidación frecuente por ETag (versión)
+SPEC_CACHE_MAX_AGE = 3600
+
+# Tamaño máximo del cuerpo binario de /calculate-batch (se lee entero en memoria)
+WIRE_MAX_BYTES = int(os.environ.get("CARDIORISK_WIRE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Límites de concurrencia y cola por clase de ruta (ver admission.py)
+ADMISSION = limiters_from_env()
+
+# Registro de auditoría de cálculos (None si CARDIORISK_AUDIT_PATH no está definido)
+AUDIT = audit_from_env()
+
+# Evaluación en sombra de una versión candidata (None si CARDIORISK_SHADOW_DIR no está definido)
+SHADOW = shadow_from_env()
+
+# Índice de percentiles de la población de referencia (None si falta o es de otra versión)
+PERCENTILES = get_percentile_index()
+# Versión de los resultados: coeficientes + índice de percentiles (ETag de /risk)
+RESULT_VERSION = MODEL_VERSION if PERCENTILES is None else f"{MODEL_VERSION}+{PERCENTILES.version}"
+
+# Tokens de resultado firmados (None si CARDIORISK_TOKEN_SECRET no está definido); en modo
+# sin estado (CARDIORISK_STATELESS=1) no se guardan sesiones y los informes salen del token
+TOKENS = tokens_from_env()
+STATELESS = TOKENS is not None and os.environ.get("CARDIORISK_STATELESS") == "1"
+
+# Rutas /debug/* deshabilitadas (404) salvo que se defina un token
+DEBUG_TOKEN = os.environ.get("CARDIORISK_DEBUG_TOKEN", "")
+PROFILER = SamplingProfiler()
+MEMORY_TRACER = MemoryTracer()
+
 app = Flask(__name__)
 # Habilitar CORS para todos los endpoints del backend
 CORS(app)
@@ -32,8 +89,9 @@ CORS(app)
 def add_cors_headers(response):
     """Asegura encabezados CORS para peticiones desde archivo o puertos distintos."""
     response.headers.setdefault("Access-Control-Allow-Origin", "*")
-    response.headers.setdefault("Access-Control-Allow-Headers", "Content-Type")
-    response.headers.setdefault("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+    response.headers.setdefault("Access-Control-Allow-Headers", "Content-Type, If-None-Match")
+    response.headers.setdefault("Access-Control-Expose-Headers", "ETag")
+    response.headers.setdefault("Access-Control-Allow-Methods", "GET, POST, PATCH, DELETE, OPTIONS")
     return response
 
 
@@ -41,14 +99,126 @@ def _cleanup_expired():
     """Elimina resultados almacenados con más de EXPIRE_MINUTES."""
     now = datetime.utcnow()
     expired = [
-        sid for sid, data in SESSIONS.items()
+        sid for sid, data in list(SESSIONS.items())  # copia: otros hilos insertan sesiones
         if now - data["timestamp"] > timedelta(minutes=EXPIRE_MINUTES)
     ]
     for sid in expired:
-        del SESSIONS[sid]
+        SESSIONS.pop(sid, None)
+
+
+def _session_data(key: str):
+    """(datos, None) de la sesión `key` o de un token firmado; (None, respuesta de error) si no vale."""
+    data = SESSIONS.get(key)
+    if data is not None:
+        return data, None
+    if TOKENS is not None and looks_like_token(key):
+        try:
+            return TOKENS.verify(key), None
+        except InvalidToken as err:
+            return None, (jsonify({"status": "error", "errors": [str(err)]}), 403)
+    return None, (jsonify({"status": "error", "errors": ["Sesión no encontrada"]}), 404)
+
+
+def _result_response(session_id, patient: dict, result: dict, warnings) -> dict:
+    """Cuerpo de respuesta de /calculate y PATCH (con token si están activados)."""
+    body = {"status": "ok"}
+    if session_id is not None:
+        body["session_id"] = session_id
+    if TOKENS is not None:
+        body["token"] = TOKENS.issue(normalize_patient(patient), result, warnings, MODEL_VERSION)
+    body.update(result=result, warnings=warnings)
+    return body
+
+
+def admitted(route_class: str):
+    """
+    Aplica el control de admisión de `route_class` a la vista. En respuestas
+    en streaming (exportaciones, lotes) el trabajo ocurre al consumir el
+    generador, después de volver de la vista: el turno se libera al cerrar
+    la respuesta.
+    """
+    limiter = ADMISSION[route_class]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter.acquire()
+            start = time.perf_counter()
+
+            def release():
+                limiter.release(time.perf_counter() - start)
+
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except BaseException:
+                release()
+                raise
+            # send_file (direct_passthrough) entrega un fichero ya generado y
+            # el servidor WSGI no llama a los call_on_close de esas respuestas
+            if response.is_streamed and not response.direct_passthrough:
+                response.call_on_close(release)
+            else:
+                release()
+            return response
+        return wrapper
+    return decorator
+
+
+@app.errorhandler(Overloaded)
+def handle_overloaded(err: Overloaded):
+    response = jsonify({"status": "error", "errors": [str(err)]})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(err.retry_after)
+    return response
+
+
+def _run_scales(method: str, patient: dict, meta: dict = None) -> dict:
+    """Ejecuta las escalas pedidas por `method` (puede lanzar ValueError).
+    Si hay índice de percentiles, cada escala lleva "percentile" (0–100).
+    Si se pasa `meta`, anota la ruta SCORE2 usada en meta["score2_path"].
+    """
+    result = {}
+    if method in ("framingham", "all"):
+        result["framingham"] = framingham_risk(patient)
+    if method in ("score", "all"):
+        result["score"], path = score2_risk_with_path(patient)
+        if meta is not None:
+            meta["score2_path"] = path
+    if method in ("acc-aha", "all"):
+        result["acc_aha"] = acc_aha_risk(patient)
+    if PERCENTILES is not None:
+        PERCENTILES.annotate(result, patient)
+    return result
+
+
+def _run_all(patient: dict):
+    meta = {}
+    return _run_scales("all", patient, meta), meta
+
+
+# Micro-batching opcional de /calculate/all (None si CARDIORISK_MICROBATCH no está definido)
+MICROBATCH = batcher_from_env(dedup_evaluate(_run_all))
+
+
+def _audit(route: str, method: str, patient: dict, result: dict, warnings, session_id: str = None,
+           score2_path: str = None) -> None:
+    """Encola la entrada de auditoría (sin E/S en la petición)."""
+    if AUDIT is None:
+        return
+    AUDIT.record({
+        "route": route,
+        "method": method,
+        "session_id": session_id,
+        "model_version": MODEL_VERSION,
+        "score2_path": score2_path,
+        "patient": patient,
+        "result": result,
+        "warnings": warnings,
+    })
 
 
 @app.route("/calculate/<string:method>", methods=["POST"])
+@admitted("calculate")
 def calculate(method):
     """
     Calcula riesgo según el método indicado:
@@ -62,49 +232,247 @@ def calculate(method):
     if not ok:
         return jsonify({"status": "error", "errors": warnings_or_errors}), 400
 
-    result = {}
+    meta = {}
     try:
-        if method in ("framingham", "all"):
-            result["framingham"] = framingham_risk(patient)
-        if method in ("score", "all"):
-            result["score"] = score_risk(patient)
-        if method in ("acc-aha", "all"):
-            result["acc_aha"] = acc_aha_risk(patient)
+        if method == "all" and MICROBATCH is not None:
+            result, meta = MICROBATCH.submit(patient)
+        else:
+            result = _run_scales(method, patient, meta)
     except ValueError as err:
         # Algoritmo devolvió error médico
         return jsonify({"status": "error", "errors": [str(err)]}), 422
     except Exception as err:  # Fallback a JSON legible en caso de error inesperado
         return jsonify({"status": "error", "errors": [f"Error interno: {type(err).__name__}: {err}"]}), 500
 
-    # Almacenar sesión temporal
-    session_id = str(uuid4())
-    SESSIONS[session_id] = {
-        "timestamp": datetime.utcnow(),
-        "patient": patient,
+    # Almacenar sesión temporal (salvo en modo sin estado: el token la sustituye)
+    session_id = None
+    if not STATELESS:
+        session_id = str(uuid4())
+        SESSIONS[session_id] = {
+            "timestamp": datetime.utcnow(),
+            "patient": patient,
+            "result": result,
+            "warnings": warnings_or_errors,
+            "score2_path": meta.get("score2_path"),
+        }
+    _audit("calculate", method, patient, result, warnings_or_errors, session_id, meta.get("score2_path"))
+    if SHADOW is not None:
+        SHADOW.offer(patient, result)
+    return jsonify(_result_response(session_id, patient, result, warnings_or_errors))
+
+
+@app.route("/calculate/<string:session_id>", methods=["PATCH"])
+@admitted("calculate")
+def recalculate_session(session_id):
+    """
+    Recalcula una sesión existente (o un token) a partir de los campos
+    modificados. Solo se vuelven a ejecutar las escalas que dependen de esos
+    campos; la respuesta tiene la misma forma que POST /calculate/<method>.
+    """
+    _cleanup_expired()
+    data, error = _session_data(session_id)
+    if error:
+        return error
+    from_token = session_id not in SESSIONS
+
+    changes = request.json or {}
+    if not isinstance(changes, dict):
+        return jsonify({"status": "error", "errors": ["Se esperaba un objeto con los campos modificados"]}), 400
+    changed = {k for k, v in changes.items() if data["patient"].get(k, object()) != v}
+    patient = {**data["patient"], **changes}
+    if from_token and data.get("model_version") != MODEL_VERSION:
+        changed = set(patient)  # resultado de otra versión de coeficientes: recalcular todo
+
+    ok, warnings_or_errors = validate_patient_data(patient)
+    if not ok:
+        return jsonify({"status": "error", "errors": warnings_or_errors}), 400
+
+    meta = {"score2_path": data.get("score2_path")}
+    try:
+        result = recalculate(patient, data["result"], changed, meta)
+    except ValueError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 422
+    except Exception as err:
+        return jsonify({"status": "error", "errors": [f"Error interno: {type(err).__name__}: {err}"]}), 500
+    if PERCENTILES is not None:
+        PERCENTILES.annotate(result, patient)  # las escalas recalculadas llegan sin percentil
+
+    data.update(
+        timestamp=datetime.utcnow(),
+        patient=patient,
+        result=result,
+        warnings=warnings_or_errors,
+        score2_path=meta["score2_path"],
+    )
+    stored_id = None if from_token else session_id
+    _audit("recalculate", "patch", patient, result, warnings_or_errors, stored_id, meta["score2_path"])
+    return jsonify(_result_response(stored_id, patient, result, warnings_or_errors))
+
+
+# Respuestas a preflight explícitas (por si el navegador exige OPTIONS)
+@app.route("/calculate/<string:method>", methods=["OPTIONS"])
+def calculate_options(method):
+    return ("", 204)
+
+
+@app.route("/risk/<string:method>", methods=["GET"])
+@admitted("calculate")
+def risk_cacheable(method):
+    """
+    Variante GET determinista de /calculate (sin sesión), con entradas en la
+    query string. Se identifica por el hash de las entradas normalizadas y la
+    versión de coeficientes (y del índice de percentiles), que se usa como
+    ETag fuerte; con If-None-Match
+    coincidente responde 304 sin calcular.
+    """
+    if method not in METHODS:
+        return jsonify({"status": "error", "errors": [f"Método desconocido: {method}"]}), 404
+
+    patient = normalize_patient(request.args)
+    etag = inputs_digest(method, patient, RESULT_VERSION)
+    cache_control = f"public, max-age={RISK_CACHE_MAX_AGE}, immutable"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+        return response
+
+    ok, warnings_or_errors = validate_patient_data(patient)
+    if not ok:
+        return jsonify({"status": "error", "errors": warnings_or_errors}), 400
+
+    meta = {}
+    try:
+        result = _run_scales(method, patient, meta)
+    except ValueError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 422
+    _audit("risk", method, patient, result, warnings_or_errors, score2_path=meta.get("score2_path"))
+
+    response = jsonify({
+        "status": "ok",
+        "model_version": MODEL_VERSION,
         "result": result,
         "warnings": warnings_or_errors,
-    }
+    })
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+@app.route("/models/spec", methods=["GET"])
+def models_spec():
+    """
+    Coeficientes, clamps, umbrales y validación de todas las escalas
+    (evaluación en cliente). "percentiles" indica que el servidor añade
+    "percentile", que el cliente no puede calcular.
+    """
+    etag = f"spec-{RESULT_VERSION}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(dict(build_model_spec(), percentiles=PERCENTILES is not None))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={SPEC_CACHE_MAX_AGE}"
+    return response
+
+
+@app.route("/targets/<string:method>", methods=["POST"])
+@admitted("calculate")
+def treatment_targets(method):
+    """
+    Objetivos por factor modificable para bajar del umbral de riesgo.
+    Cuerpo: {"patient": {...}} o {"patients": [...]}, y opcionalmente
+    "threshold" (%) y "factors". `method` como en /calculate.
+    """
+    if method not in METHODS:
+        return jsonify({"status": "error", "errors": [f"Método desconocido: {method}"]}), 404
+    body = request.json or {}
+    if not isinstance(body, dict):
+        return jsonify({"status": "error", "errors": ["Se esperaba un objeto con 'patient' o 'patients'"]}), 400
+    patients = body.get("patients") if "patients" in body else [body.get("patient", {})]
+    if not isinstance(patients, list):
+        return jsonify({"status": "error", "errors": ["'patients' debe ser una lista"]}), 400
+
+    errors = []
+    for idx, patient in enumerate(patients):
+        if not isinstance(patient, dict):
+            errors.append(f"paciente {idx}: El paciente debe ser un objeto JSON")
+            continue
+        ok, warnings_or_errors = validate_patient_data(patient)
+        if not ok:
+            errors += [f"paciente {idx}: {e}" for e in warnings_or_errors]
+    if errors:
+        return jsonify({"status": "error", "errors": errors}), 400
+
+    scales = ("framingham", "score", "acc_aha") if method == "all" else (method.replace("-", "_"),)
+    try:
+        result = solve_targets_batch(patients, scales, body.get("threshold"), body.get("factors", FACTORS))
+    except ValueError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 422
     return jsonify({
         "status": "ok",
-        "session_id": session_id,
-        "result": result,
-        "warnings": warnings_or_errors,
+        "model_version": MODEL_VERSION,
+        "result": result if "patients" in body else result[0],
     })
 
 
-# Respuestas a preflight explícitas (por si el navegador exige OPTIONS)
-@app.route("/calculate/<string:method>", methods=["OPTIONS"])
-def calculate_options(method):
-    return ("", 204)
+@app.route("/scenarios/<string:method>", methods=["POST"])
+@admitted("report")
+def intervention_scenarios(method):
+    """
+    Escenarios de intervención sobre una cohorte (ver scenarios.py). Cuerpo:
+    {"patients": [...], "scenarios": [{"name", "actions": [...]}], "seed": 0}.
+    Los pacientes no válidos se excluyen y se cuentan en "excluded".
+    """
+    if method not in METHODS:
+        return jsonify({"status": "error", "errors": [f"Método desconocido: {method}"]}), 404
+    body = request.get_json(silent=True) or {}
+    patients, scenarios = body.get("patients"), body.get("scenarios")
+    if not isinstance(patients, list) or not isinstance(scenarios, list):
+        return jsonify({"status": "error", "errors": ["Se esperaban las listas 'patients' y 'scenarios'"]}), 400
+
+    valid, excluded = [], []
+    for idx, patient in enumerate(patients):
+        ok, warnings_or_errors = validate_patient_data(patient)
+        if ok:
+            valid.append(normalize_patient(patient))
+        else:
+            excluded.append({"index": idx, "errors": warnings_or_errors})
+    if not valid:
+        return jsonify({"status": "error", "errors": ["Ningún paciente válido"], "excluded": excluded}), 400
+
+    scales = ("framingham", "score", "acc_aha") if method == "all" else (method.replace("-", "_"),)
+    try:
+        result = run_scenarios(patients_to_columns(valid), scenarios, scales, seed=body.get("seed", 0))
+    except (ValueError, TypeError) as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 422
+    return jsonify({"status": "ok", "model_version": MODEL_VERSION, "excluded": excluded, "result": result})
 
 
 @app.route("/generate-report/<string:session_id>", methods=["GET"])
+@admitted("report")
 def generate_report(session_id):
-    """Genera un PDF profesional con los resultados almacenados."""
+    """
+    Genera el informe de la sesión o del token firmado devuelto por
+    /calculate. Por defecto PDF; con ?format=csv|html|jsonl (o Accept:
+    text/csv / application/x-ndjson) devuelve el formato ligero en streaming
+    (ver exporters.py).
+    """
     _cleanup_expired()
-    data = SESSIONS.get(session_id)
-    if not data:
-        return jsonify({"status": "error", "errors": ["Sesión no encontrada"]}), 404
+    data, error = _session_data(session_id)
+    if error:
+        return error
+    stem = f"reporte_{token_name(session_id) if session_id not in SESSIONS else session_id}"
+
+    try:
+        fmt = negotiate(request.args.get("format"), request.accept_mimetypes)
+    except ValueError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 406
+    if fmt != "pdf":
+        record = {"patient": data["patient"], "result": data["result"], "warnings": data["warnings"]}
+        return _stream_export(fmt, [record], stem)
+
+    from report_generator import build_pdf_report
 
     pdf_path = build_pdf_report(
         patient=data["patient"],
@@ -114,6 +482,224 @@ def generate_report(session_id):
     return send_file(pdf_path, as_attachment=True)
 
 
+def _stream_export(fmt: str, records, stem: str):
+    response = app.response_class(render(fmt, records), mimetype=FORMATS[fmt])
+    response.headers["Content-Disposition"] = f'attachment; filename="{attachment_name(stem, fmt)}"'
+    return response
+
+
+def _batch_record(method: str, idx: int, patient, meta: dict) -> dict:
+    """Registro de exportación de un paciente (sin auditar)."""
+    record = {"index": idx, "patient": patient, "result": {}, "warnings": [], "errors": []}
+    if not isinstance(patient, dict):
+        record["errors"] = ["El paciente debe ser un objeto JSON"]
+        return record
+    ok, warnings_or_errors = validate_patient_data(patient)
+    if not ok:
+        record["errors"] = warnings_or_errors
+        return record
+    record["warnings"] = warnings_or_errors
+    try:
+        record["result"] = _run_scales(method, patient, meta)
+    except ValueError as err:
+        record["errors"] = [str(err)]
+    return record
+
+
+def _batch_records(method: str, patients):
+    """Registros de exportación calculados bajo demanda (uno por paciente)."""
+    for idx, patient in enumerate(patients):
+        meta = {}
+        record = _batch_record(method, idx, patient, meta)
+        if record["result"]:
+            _audit("batch", method, patient, record["result"], record["warnings"],
+                   score2_path=meta.get("score2_path"))
+        yield record
+
+
+@app.route("/calculate-batch/<string:method>", methods=["POST"])
+@admitted("calculate")
+def calculate_batch(method):
+    """
+    Cálculo por lotes sin sesión: cuerpo {"patients": [...]} (o lista).
+    Respuesta en streaming, por defecto JSON Lines; ?format=csv|html|jsonl
+    o Accept. Los pacientes inválidos llevan "errors" y no cortan el lote.
+    Con Content-Type application/vnd.cardiorisk.columns el cuerpo y la
+    respuesta van en el formato binario columnar de wire.py.
+    """
+    if method not in METHODS:
+        return jsonify({"status": "error", "errors": [f"Método desconocido: {method}"]}), 404
+    if request.mimetype == WIRE_MEDIA_TYPE:
+        return _calculate_batch_columns(method)
+    body = request.json
+    patients = body.get("patients") if isinstance(body, dict) else body
+    if not isinstance(patients, list):
+        return jsonify({"status": "error", "errors": ["Se esperaba una lista 'patients'"]}), 400
+    try:
+        fmt = negotiate(request.args.get("format"), request.accept_mimetypes, default="jsonl")
+    except ValueError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 406
+    if fmt == "pdf":
+        if request.args.get("format"):
+            return jsonify({"status": "error", "errors": ["El PDF solo está disponible por sesión"]}), 406
+        fmt = "jsonl"  # Accept genérico (*/*)
+    return _stream_export(fmt, _batch_records(method, patients), f"lote_{method}")
+
+
+def _calculate_batch_columns(method: str):
+    """Lote en formato binario columnar: sin dicts por paciente salvo para auditoría."""
+    if request.content_length is None or request.content_length > WIRE_MAX_BYTES:
+        return jsonify({"status": "error",
+                        "errors": [f"El cuerpo binario debe indicar Content-Length y no superar "
+                                   f"{WIRE_MAX_BYTES} bytes"]}), 413
+    payload = request.get_data(cache=False)
+    try:
+        header, columns = wire_decode(payload)
+        out = wire_score(header, columns, method)
+    except ValueError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 400
+    meta = wire_response_meta(method)
+    if AUDIT is not None:
+        status = out["status"]
+        for i in range(len(status)):
+            if status[i] == 0:
+                _audit("batch", method, row_patient(columns, i),
+                       {scale: {"percent": out[f"pct:{scale}"][i],
+                                "category": CATEGORY_LABELS[out[f"cat:{scale}"][i]]}
+                        for scale in meta["scales"]}, [])
+    return app.response_class(wire_encode(out, meta), mimetype=WIRE_MEDIA_TYPE)
+
+
+def _score_job_chunk(method: str, start: int, patients):
+    """Bloque de un trabajo (se ejecuta en el pool de procesos): registros y ruta SCORE2 de cada uno."""
+    metas = [{} for _ in patients]
+    records = [_batch_record(method, start + i, p, metas[i]) for i, p in enumerate(patients)]
+    return records, [meta.get("score2_path") for meta in metas]
+
+
+def _audit_job_chunk(job, records, score2_paths) -> None:
+    for record, path in zip(records, score2_paths):
+        if record["result"]:
+            _audit("job", job.method, record["patient"], record["result"], record["warnings"],
+                   score2_path=path)
+
+
+# Trabajos asíncronos de cohortes (ver jobs.py)
+JOBS = jobs_from_env(_score_job_chunk, _audit_job_chunk)
+
+
+def _job_or_404(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        return None, (jsonify({"status": "error", "errors": ["Trabajo no encontrado o expirado"]}), 404)
+    return job, None
+
+
+@app.route("/jobs/<string:method>", methods=["POST"])
+@admitted("report")
+def create_job(method):
+    """
+    Encola una cohorte como trabajo y responde 202 con su estado. Cuerpo:
+    CSV con las columnas de /calculate (text/csv o multipart, campo "file";
+    ?delimiter=;) o JSON {"patients": [...]}. Resultados en
+    /jobs/<id>/results, también parciales mientras se procesa.
+    """
+    if method not in METHODS:
+        return jsonify({"status": "error", "errors": [f"Método desconocido: {method}"]}), 404
+    delimiter = request.args.get("delimiter", ",")
+    if len(delimiter) != 1:
+        return jsonify({"status": "error", "errors": ["'delimiter' debe ser un único carácter"]}), 400
+    try:
+        if "file" in request.files:
+            job = JOBS.submit_csv(method, request.files["file"].stream, delimiter)
+        elif request.mimetype in ("text/csv", "application/csv", "text/plain"):
+            job = JOBS.submit_csv(method, request.stream, delimiter)
+        else:
+            body = request.get_json(silent=True)
+            patients = body.get("patients") if isinstance(body, dict) else body
+            if not isinstance(patients, list):
+                return jsonify({"status": "error", "errors": ["Se esperaba un CSV o una lista 'patients'"]}), 400
+            job = JOBS.submit_patients(method, patients)
+    except JobQueueFull as err:
+        response = jsonify({"status": "error", "errors": [str(err)]})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+    response = jsonify({"status": "ok", "job": job.status()})
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response
+
+
+@app.route("/jobs/<string:job_id>", methods=["GET"])
+def job_status(job_id):
+    """Estado, progreso y ETA del trabajo."""
+    job, error = _job_or_404(job_id)
+    if error:
+        return error
+    return jsonify({"status": "ok", "job": job.status()})
+
+
+@app.route("/jobs/<string:job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Progreso como Server-Sent Events (un evento por cambio, hasta terminar)."""
+    job, error = _job_or_404(job_id)
+    if error:
+        return error
+
+    def events():
+        seq = -1
+        while True:
+            current = job.wait_change(seq, timeout=15.0)
+            status = job.status()
+            if current == seq:
+                yield ": keep-alive\n\n"
+                continue
+            seq = current
+            yield f"event: progress\ndata: {json.dumps(status, ensure_ascii=False)}\n\n"
+            if status["state"] in JOB_TERMINAL:
+                return
+
+    response = app.response_class(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/jobs/<string:job_id>/results", methods=["GET"])
+def job_results(job_id):
+    """Registros terminados hasta ahora (todos si el trabajo acabó); ?format=jsonl|csv|html."""
+    job, error = _job_or_404(job_id)
+    if error:
+        return error
+    try:
+        fmt = negotiate(request.args.get("format"), request.accept_mimetypes, default="jsonl")
+    except ValueError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 406
+    if fmt == "pdf":
+        if request.args.get("format"):
+            return jsonify({"status": "error", "errors": ["El PDF solo está disponible por sesión"]}), 406
+        fmt = "jsonl"
+    status = job.status()
+    response = _stream_export(fmt, JOBS.iter_results(job), f"trabajo_{job.id}")
+    response.headers["X-Job-State"] = status["state"]
+    response.headers["X-Job-Rows"] = str(status["rows_done"])
+    return response
+
+
+@app.route("/jobs/<string:job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    """Cancela un trabajo en curso (202) o borra uno terminado y sus resultados (204)."""
+    job, error = _job_or_404(job_id)
+    if error:
+        return error
+    if job.state in JOB_TERMINAL:
+        JOBS.delete(job)
+        return ("", 204)
+    JOBS.cancel(job)
+    return jsonify({"status": "ok", "job": job.status()}), 202
+
+
 @app.route("/generate-report/<string:session_id>", methods=["OPTIONS"])
 def report_options(session_id):
     return ("", 204)
@@ -159,6 +745,107 @@ def healthz():
     return jsonify({"status": "ok", "message": "API OK"})
 
 
+def debug_only(view):
+    """Exige la cabecera X-Debug-Token == CARDIORISK_DEBUG_TOKEN; si no, 404."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get("X-Debug-Token", "")
+        if not DEBUG_TOKEN or not hmac.compare_digest(token.encode(), DEBUG_TOKEN.encode()):
+            return jsonify({"status": "error", "errors": ["Recurso no encontrado"]}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route("/debug/jobs", methods=["GET"])
+@debug_only
+def debug_list_jobs():
+    """Todos los trabajos (solo diagnóstico: cada id da acceso a los datos de su cohorte)."""
+    return jsonify({"status": "ok", "jobs": JOBS.list()})
+
+
+@app.route("/debug/profile", methods=["GET"])
+@debug_only
+def debug_profile():
+    """
+    Perfil por muestreo de todos los hilos durante `seconds` (máx. 60).
+    format=collapsed (por defecto, texto para flamegraph) | json (top funciones).
+    """
+    seconds = request.args.get("seconds", 5, type=float)
+    interval = request.args.get("interval_ms", 5, type=float) / 1000.0
+    try:
+        result = PROFILER.run(seconds, interval)
+    except RuntimeError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 409
+    if request.args.get("format") == "json":
+        return jsonify({
+            "status": "ok",
+            "seconds": result["seconds"],
+            "samples": result["samples"],
+            "top": SamplingProfiler.top_functions(result, request.args.get("top", 25, type=int)),
+        })
+    return app.response_class(SamplingProfiler.collapsed(result), mimetype="text/plain")
+
+
+@app.route("/debug/tracemalloc/<string:action>", methods=["GET", "POST"])
+@debug_only
+def debug_tracemalloc(action):
+    """start | stop (solo POST) | snapshot (fija línea base) | diff (crecimiento desde la base)."""
+    if action in ("start", "stop") and request.method != "POST":
+        response = jsonify({"status": "error", "errors": [f"{action} requiere POST"]})
+        response.status_code = 405
+        response.headers["Allow"] = "POST"
+        return response
+    top = request.args.get("top", 20, type=int)
+    key_type = request.args.get("key", "lineno")
+    if key_type not in ("lineno", "filename", "traceback"):
+        return jsonify({"status": "error", "errors": ["key debe ser lineno | filename | traceback"]}), 400
+    try:
+        if action == "start":
+            MEMORY_TRACER.start(request.args.get("frames", 25, type=int))
+            return jsonify({"status": "ok", "tracing": True})
+        if action == "stop":
+            MEMORY_TRACER.stop()
+            return jsonify({"status": "ok", "tracing": False})
+        if action == "snapshot":
+            return jsonify({"status": "ok", **MEMORY_TRACER.snapshot(top, key_type)})
+        if action == "diff":
+            reset = request.args.get("reset", "0") in ("1", "true")
+            return jsonify({"status": "ok", **MEMORY_TRACER.diff(top, key_type, reset)})
+    except RuntimeError as err:
+        return jsonify({"status": "error", "errors": [str(err)]}), 409
+    return jsonify({"status": "error", "errors": [f"Acción desconocida: {action}"]}), 404
+
+
+@app.route("/metrics/audit", methods=["GET"])
+def audit_metrics():
+    """Estado del registro de auditoría (profundidad de buffer, descartes, lotes)."""
+    return jsonify({"enabled": AUDIT is not None, **(AUDIT.stats() if AUDIT else {})})
+
+
+@app.route("/metrics/microbatch", methods=["GET"])
+def microbatch_metrics():
+    """Tamaño medio de lote y ventana efectiva del micro-batching de /calculate/all."""
+    return jsonify({"enabled": MICROBATCH is not None, **(MICROBATCH.stats() if MICROBATCH else {})})
+
+
+@app.route("/metrics/shadow", methods=["GET"])
+def shadow_metrics():
+    """Diferencias candidato − producción acumuladas por la evaluación en sombra."""
+    return jsonify({"enabled": SHADOW is not None, **(SHADOW.report() if SHADOW else {})})
+
+
+@app.route("/metrics/jobs", methods=["GET"])
+def jobs_metrics():
+    """Trabajos por estado, cola y configuración del pool."""
+    return jsonify({"enabled": True, **JOBS.stats()})
+
+
+@app.route("/metrics/admission", methods=["GET"])
+def admission_metrics():
+    """Profundidad de cola, concurrencia y rechazos por clase de ruta."""
+    return jsonify({"status": "ok", "admission": {name: lim.stats() for name, lim in ADMISSION.items()}})
+
+
 if __name__ == "__main__":
     # Mostrar rutas registradas para verificación
     try:
@@ -0,0 +1,246 @@
+"""
+Registro de auditoría de cálculos (append-only) con escritura diferida
+
+La petición solo añade la entrada a un buffer circular en memoria (O(1), sin
+E/S); un hilo escritor la serializa y la persiste por lotes ("group commit")
+en un fichero JSON Lines o en SQLite. La durabilidad se regula con el
+intervalo de fsync y, si el buffer se llena, la política de contrapresión
+decide: descartar la entrada más antigua, descartar la nueva o bloquear la
+petición un tiempo acotado.
+
+Configuración por entorno (ver audit_from_env):
+    CARDIORISK_AUDIT_PATH      fichero destino (.db/.sqlite/.sqlite3 → SQLite; otro → JSONL)
+    CARDIORISK_AUDIT_POLICY    drop_oldest | drop_new | block   (por defecto block)
+    CARDIORISK_AUDIT_FSYNC     segundos entre fsync; 0 = en cada lote; -1 = nunca
+    CARDIORISK_AUDIT_CAPACITY  entradas en memoria (por defecto 65536)
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+POLICIES = ("drop_oldest", "drop_new", "block")
+
+
+class JsonlSink:
+    """Una línea JSON por entrada; el fichero se abre en modo append."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._fh = open(path, "ab")
+
+    def write_batch(self, entries: List[Dict]) -> None:
+        payload = b"".join(
+            json.dumps(e, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+            for e in entries
+        )
+        self._fh.write(payload)
+        self._fh.flush()
+
+    def sync(self) -> None:
+        os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class SqliteSink:
+    """Tabla `audit` en modo WAL; cada lote es una única transacción."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # Conexión propiedad del hilo escritor (se crea allí, ver AuditLog._run)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Los commits no hacen fsync; sync() fuerza un checkpoint (que sí lo hace)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS audit ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " ts REAL NOT NULL, route TEXT, method TEXT, session_id TEXT,"
+                " model_version TEXT, score2_path TEXT, entry TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def write_batch(self, entries: List[Dict]) -> None:
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO audit (ts, route, method, session_id, model_version, score2_path, entry)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (e.get("ts"), e.get("route"), e.get("method"), e.get("session_id"),
+                     e.get("model_version"), e.get("score2_path"),
+                     json.dumps(e, ensure_ascii=False, separators=(",", ":"), default=str))
+                    for e in entries
+                ],
+            )
+
+    def sync(self) -> None:
+        self._connection().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def open_sink(path: str):
+    if path.lower().endswith((".db", ".sqlite", ".sqlite3")):
+        return SqliteSink(path)
+    return JsonlSink(path)
+
+
+class AuditLog:
+    """Buffer circular acotado + hilo escritor con commits por lotes."""
+
+    def __init__(self, sink, capacity: int = 65536, policy: str = "block", fsync_interval: float = 1.0,
+                 batch_size: int = 1024, flush_interval: float = 0.05, block_timeout: float = 0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"Política desconocida: {policy} (válidas: {', '.join(POLICIES)})")
+        self.sink = sink
+        self.capacity = max(1, capacity)
+        self.policy = policy
+        self.fsync_interval = fsync_interval
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self._buffer: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.syncs = 0
+        self.last_error: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, entry: Dict) -> bool:
+        """Encola una entrada (añade "ts" si falta); False si se descartó (buffer lleno o log cerrado).
+        La entrada no debe modificarse después: se serializa en el hilo escritor.
+        """
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._buffer) >= self.capacity:
+                if self.policy == "drop_new":
+                    self.dropped += 1
+                    return False
+                if self.policy == "drop_oldest":
+                    self._buffer.popleft()
+                    self.dropped += 1
+                else:
+                    self._cond.notify_all()
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._buffer) >= self.capacity and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not self._cond.wait(remaining):
+                            if len(self._buffer) >= self.capacity:
+                                self.dropped += 1
+                                return False
+                    if self._closed:
+                        return False
+            entry.setdefault("ts", time.time())
+            self._buffer.append(entry)
+            self.recorded += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def _take_batch(self) -> List[Dict]:
+        with self._cond:
+            if not self._buffer and not self._closed:
+                self._cond.wait(self.flush_interval)
+            n = min(len(self._buffer), self.batch_size)
+            batch = [self._buffer.popleft() for _ in range(n)]
+            if batch:
+                self._cond.notify_all()  # libera a los productores en espera (política block)
+            return batch
+
+    def _run(self) -> None:
+        last_sync = time.monotonic()
+        dirty = False
+        while True:
+            batch = self._take_batch()
+            if batch:
+                try:
+                    self.sink.write_batch(batch)
+                    self.written += len(batch)
+                    self.batches += 1
+                    dirty = True
+                except Exception as err:  # el registro no debe tumbar el servidor
+                    self.dropped += len(batch)
+                    self.last_error = f"{type(err).__name__}: {err}"
+            now = time.monotonic()
+            if dirty and self.fsync_interval >= 0 and now - last_sync >= self.fsync_interval:
+                self._sync()
+                last_sync, dirty = now, False
+            with self._cond:
+                if self._closed and not self._buffer:
+                    break
+        if dirty and self.fsync_interval >= 0:
+            self._sync()
+        self.sink.close()
+
+    def _sync(self) -> None:
+        try:
+            self.sink.sync()
+            self.syncs += 1
+        except Exception as err:
+            self.last_error = f"{type(err).__name__}: {err}"
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Vacía el buffer, hace el último fsync y cierra el destino."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            depth = len(self._buffer)
+        return {
+            "path": getattr(self.sink, "path", None),
+            "policy": self.policy,
+            "capacity": self.capacity,
+            "fsync_interval_s": self.fsync_interval,
+            "queue_depth": depth,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "syncs": self.syncs,
+            "last_error": self.last_error,
+        }
+
+
+def audit_from_env() -> Optional[AuditLog]:
+    """AuditLog configurado por entorno, o None si CARDIORISK_AUDIT_PATH no está definido."""
+    path = os.environ.get("CARDIORISK_AUDIT_PATH")
+    if not path:
+        return None
+    log = AuditLog(
+        open_sink(path),
+        capacity=int(os.environ.get("CARDIORISK_AUDIT_CAPACITY", "65536")),
+        policy=os.environ.get("CARDIORISK_AUDIT_POLICY", "block"),
+        fsync_interval=float(os.environ.get("CARDIORISK_AUDIT_FSYNC", "1.0")),
+    )
+    atexit.register(log.close)
+    return log
@@ -10,8 +10,11 @@ Escalas incluidas:
 - ACC/AHA Pooled Cohort Equations 2013 – implementación con coeficientes e interacciones (blancos).
 """
 
+import hashlib
+import json
 import math
-from typing import Dict
+import os
+from typing import Dict, Iterable, Optional, Set, Tuple
 try:
     # Cálculo SCORE2 oficial (si hay coeficientes cargados)
     from .score2_official import score2_risk_official  # type: ignore
@@ -53,11 +56,15 @@ FR_WOMEN = {
 }
 
 
+_ln = math.log
+
+
 def _safe_ln(value: float) -> float:
-    return math.log(max(value, 1e-6))
+    return _ln(max(value, 1e-6))
 
 
-def framingham_general_risk_pct(patient: Dict) -> float:
+def framingham_linear_predictor(patient: Dict) -> Tuple[float, Dict]:
+    """Índice lineal L y coeficientes del sexo del paciente (riesgo = 1 − S0^exp(L − meanL))."""
     is_male = str(patient.get("sexo", "hombre")).lower() == "hombre"
     p = FR_MEN if is_male else FR_WOMEN
 
@@ -79,6 +86,11 @@ def framingham_general_risk_pct(patient: Dict) -> float:
         + p["smoker"] * smoker
         + p["diabetes"] * diabetes
     )
+    return L, p
+
+
+def framingham_general_risk_pct(patient: Dict) -> float:
+    L, p = framingham_linear_predictor(patient)
     risk = 1 - (p["S0"] ** math.exp(L - p["meanL"]))
     return max(0.0, min(round(risk * 100.0, 1), 100.0))
 
@@ -90,22 +102,29 @@ def framingham_risk(patient: Dict) -> Dict:
     return {"percent": risk_pct, "category": category}
 
 
-def score2_lookup(patient: Dict) -> float:
-    """Fallback mejorado de SCORE2 (modelo tipo Cox/Fine-Gray con transformaciones log).
-    - Usa no-HDL si está disponible; si no, calcula TC−HDL y convierte a mmol/L.
-    - Clamps en rangos de validez de SCORE2 (40–89 años, PAS 100–179, no-HDL 3.0–7.9 mmol/L).
-    - Calibración regional por escala multiplicativa.
+# Coeficientes surrogate corregidos (estructura coherente con SCORE2)
+# Ajustados para que mujeres tengan perfil de riesgo realista y consistente
+SCORE2_SURROGATE = {
+    "men": {"S0": 0.952, "mean": 12.0, "ln_age": 1.18, "ln_age2": 0.018, "ln_sbp": 1.10, "ln_chol": 0.52, "smoker": 0.70},
+    "women": {"S0": 0.960, "mean": 11.5, "ln_age": 1.20, "ln_age2": 0.019, "ln_sbp": 1.12, "ln_chol": 0.54, "smoker": 0.72},
+}
+SCORE2_REGION_SCALE = {"low": 0.90, "moderate": 1.00, "high": 1.30, "very_high": 1.60}
+# Clamps del modelo continuo (no-HDL en mmol/L)
+SCORE2_CLAMPS = {"edad": (40.0, 89.0), "presion_sistolica": (100.0, 179.0), "no_hdl_mmol": (3.0, 7.9)}
+MG_DL_PER_MMOL_L = 38.67
+SCORE2_REGION_MAP = {"bajo": "low", "low": "low", "moderado": "moderate", "moderate": "moderate", "alto": "high", "high": "high", "muy_alto": "very_high", "very_high": "very_high", "muy-alto": "very_high"}
 
-    Nota: este Fallback conserva la estructura de la ecuación oficial y mejora la
-    aproximación previa basada en sumas ad‑hoc. Cuando existan tablas/coeficientes
-    oficiales, la ruta principal del cálculo los usará con prioridad.
+
+def score2_linear_predictor(patient: Dict) -> Tuple[float, Dict, float]:
+    """Modelo continuo de SCORE2: (L, coeficientes, escala regional) con clamps aplicados.
+    riesgo % = min(100·(1 − S0^exp(L − mean))·escala, 50).
     """
     # Entradas y clamps
     age = float(patient.get("edad", 40.0))
-    age = max(40.0, min(89.0, age))
+    age = max(SCORE2_CLAMPS["edad"][0], min(SCORE2_CLAMPS["edad"][1], age))
 
     sbp = float(patient.get("presion_sistolica", 120.0))
-    sbp = max(100.0, min(179.0, sbp))
+    sbp = max(SCORE2_CLAMPS["presion_sistolica"][0], min(SCORE2_CLAMPS["presion_sistolica"][1], sbp))
 
     if "no_hdl" in patient:
         non_hdl_mg = float(patient.get("no_hdl", 130.0))
@@ -113,31 +132,22 @@ def score2_lookup(patient: Dict) -> float:
         tc = float(patient.get("colesterol_total", 200.0))
         hdl = float(patient.get("hdl", 50.0))
         non_hdl_mg = max(0.0, tc - hdl)
-    non_hdl_mmol = non_hdl_mg / 38.67
-    non_hdl_mmol = max(3.0, min(7.9, non_hdl_mmol))
+    non_hdl_mmol = non_hdl_mg / MG_DL_PER_MMOL_L
+    non_hdl_mmol = max(SCORE2_CLAMPS["no_hdl_mmol"][0], min(SCORE2_CLAMPS["no_hdl_mmol"][1], non_hdl_mmol))
 
     smoker = 1 if bool(patient.get("fumador", False)) else 0
 
     is_male = str(patient.get("sexo", "hombre")).lower() == "hombre"
     region_str = str(patient.get("region_riesgo", "moderado")).lower().replace(" ", "_").replace("-", "_")
-    region_map = {"bajo": "low", "low": "low", "moderado": "moderate", "moderate": "moderate", "alto": "high", "high": "high", "muy_alto": "very_high", "very_high": "very_high", "muy-alto": "very_high"}
-    region = region_map.get(region_str, "moderate")
-
-    # Coeficientes surrogate corregidos (estructura coherente con SCORE2)
-    # Ajustados para que mujeres tengan perfil de riesgo realista y consistente
-    S2_SURR = {
-        "men": {"S0": 0.952, "mean": 12.0, "ln_age": 1.18, "ln_age2": 0.018, "ln_sbp": 1.10, "ln_chol": 0.52, "smoker": 0.70},
-        "women": {"S0": 0.960, "mean": 11.5, "ln_age": 1.20, "ln_age2": 0.019, "ln_sbp": 1.12, "ln_chol": 0.54, "smoker": 0.72},
-    }
-    REGION_SCALE = {"low": 0.90, "moderate": 1.00, "high": 1.30, "very_high": 1.60}
+    region = SCORE2_REGION_MAP.get(region_str, "moderate")
 
-    p = S2_SURR["men" if is_male else "women"]
+    p = SCORE2_SURROGATE["men" if is_male else "women"]
 
     # Transformaciones
-    ln_age = math.log(age)
+    ln_age = _ln(age)
     ln_age2 = ln_age * ln_age
-    ln_sbp = math.log(sbp)
-    ln_chol = math.log(non_hdl_mmol)
+    ln_sbp = _ln(sbp)
+    ln_chol = _ln(non_hdl_mmol)
 
     # Índice lineal
     L = (
@@ -147,42 +157,66 @@ def score2_lookup(patient: Dict) -> float:
         + p["ln_chol"] * ln_chol
         + p["smoker"] * smoker
     )
+    return L, p, SCORE2_REGION_SCALE.get(region, 1.0)
+
+
+def score2_lookup(patient: Dict) -> float:
+    """Fallback mejorado de SCORE2 (modelo tipo Cox/Fine-Gray con transformaciones log).
+    - Usa no-HDL si está disponible; si no, calcula TC−HDL y convierte a mmol/L.
+    - Clamps en rangos de validez de SCORE2 (40–89 años, PAS 100–179, no-HDL 3.0–7.9 mmol/L).
+    - Calibración regional por escala multiplicativa.
+
+    Nota: este Fallback conserva la estructura de la ecuación oficial y mejora la
+    aproximación previa basada en sumas ad‑hoc. Cuando existan tablas/coeficientes
+    oficiales, la ruta principal del cálculo los usará con prioridad.
+    """
+    L, p, region_scale = score2_linear_predictor(patient)
 
     # Conversión a riesgo 10 años (estructura de Cox)
     k = math.exp(L - p["mean"])  # factor relativo
     risk = 1.0 - (p["S0"] ** k)
 
     # Calibración regional y límites
-    risk_pct = max(0.0, min(risk * 100.0 * REGION_SCALE.get(region, 1.0), 50.0))
+    risk_pct = max(0.0, min(risk * 100.0 * region_scale, 50.0))
     return round(risk_pct, 1)
 
 
-def score2_risk(patient: Dict) -> Dict:
-    """Interfaz de alto nivel para SCORE2.
-    Intenta usar implementación oficial (coeficientes JSON). Si no, usa aproximación.
+def score2_risk_with_path(patient: Dict, tables: Optional[Dict] = None,
+                          official_coeffs: Optional[Dict] = None) -> Tuple[Dict, str]:
+    """Como score2_risk, indicando además la ruta usada:
+    "tables" | "official" | "surrogate".
+    `tables` / `official_coeffs` sustituyen a los JSON del directorio (shadow.py);
+    las rutas disponibles son siempre las mismas que en producción.
     """
     # 1) Prioridad: tablas oficiales (si están cargadas)
     if callable(score2_lookup_from_tables):
         try:
-            table_res = score2_lookup_from_tables(patient)
+            table_res = score2_lookup_from_tables(patient, tables)
             if table_res is not None:
                 pct, category, _meta = table_res
-                return {"percent": pct, "category": category}
+                return {"percent": pct, "category": category}, "tables"
         except Exception:
             pass
     # 2) Intentar implementación oficial con coeficientes
     if callable(score2_risk_official):
         try:
-            result = score2_risk_official(patient)
+            result = score2_risk_official(patient, official_coeffs)
             if result and isinstance(result, dict) and result.get("percent") is not None:
-                return {"percent": result["percent"], "category": result.get("category", categorize_score2(result["percent"], float(patient.get("edad", 60))))}
+                return {"percent": result["percent"], "category": result.get("category", categorize_score2(result["percent"], float(patient.get("edad", 60))))}, "official"
         except Exception:
             pass
     # Fallback mejorado
     risk_pct = score2_lookup(patient)
     # Categorías SCORE2 (dependientes de edad)
     category = categorize_score2(risk_pct, float(patient.get("edad", 60)))
-    return {"percent": risk_pct, "category": category}
+    return {"percent": risk_pct, "category": category}, "surrogate"
+
+
+def score2_risk(patient: Dict) -> Dict:
+    """Interfaz de alto nivel para SCORE2.
+    Intenta usar implementación oficial (coeficientes JSON). Si no, usa aproximación.
+    """
+    return score2_risk_with_path(patient)[0]
 
 # Compatibilidad con app existente
 score_risk = score2_risk
@@ -228,30 +262,43 @@ ACC_AHA_WHITE_F = {
 }
 
 
+# Clamps de entradas en rangos razonables para PCE
+ACC_AHA_CLAMPS = {
+    "edad": (40.0, 79.0),
+    "colesterol_total": (130.0, 320.0),
+    "hdl": (20.0, 90.0),
+    "presion_sistolica": (90.0, 200.0),
+}
+
+
 def _clamp(value: float, low: float, high: float) -> float:
     return max(low, min(high, value))
 
 
-def acc_aha_equation(patient: Dict) -> float:
-    """Pooled Cohort Equations (2013) – implementación directa población blanca.
-    Incluye todas las interacciones (y ln(edad)^2 en mujeres) y clamps de entradas.
+def acc_aha_linear_predictor(patient: Dict, coeffs: Optional[Dict] = None) -> Tuple[float, Dict]:
+    """Índice lineal L de las PCE (con clamps) y coeficientes del sexo del paciente.
+    `coeffs` ({"men": {...}, "women": {...}}, formato de accaha_pce_coeffs.json)
+    sustituye a los coeficientes embebidos.
     """
     is_male = str(patient.get("sexo", "hombre")).lower() == "hombre"
-    p = ACC_AHA_WHITE_M if is_male else ACC_AHA_WHITE_F
+    if coeffs:
+        p = coeffs["men" if is_male else "women"]
+    else:
+        p = ACC_AHA_WHITE_M if is_male else ACC_AHA_WHITE_F
 
     # Clamps de entradas en rangos razonables para PCE
-    age = _clamp(float(patient["edad"]), 40.0, 79.0)
-    tc = _clamp(float(patient["colesterol_total"]), 130.0, 320.0)
-    hdl = _clamp(float(patient["hdl"]), 20.0, 90.0)
-    sbp = _clamp(float(patient["presion_sistolica"]), 90.0, 200.0)
+    age = _clamp(float(patient["edad"]), *ACC_AHA_CLAMPS["edad"])
+    tc = _clamp(float(patient["colesterol_total"]), *ACC_AHA_CLAMPS["colesterol_total"])
+    hdl = _clamp(float(patient["hdl"]), *ACC_AHA_CLAMPS["hdl"])
+    sbp = _clamp(float(patient["presion_sistolica"]), *ACC_AHA_CLAMPS["presion_sistolica"])
     smoker = 1 if bool(patient.get("fumador", False)) else 0
     diabetes = 1 if bool(patient.get("diabetes", False)) else 0
     tx_htn = 1 if bool(patient.get("tratamiento_hipertension", False)) else 0
 
-    ln_age = math.log(age)
-    ln_tc = math.log(tc)
-    ln_hdl = math.log(hdl)
-    ln_sys = math.log(sbp)
+    ln_age = _ln(age)
+    ln_tc = _ln(tc)
+    ln_hdl = _ln(hdl)
+    ln_sys = _ln(sbp)
 
     # SBP tratado vs no tratado
     sbp_term = (p.get("ln_sbp_tr", 0.0) * ln_sys) if tx_htn else (p.get("ln_sbp_ut", 0.0) * ln_sys)
@@ -274,6 +321,14 @@ def acc_aha_equation(patient: Dict) -> float:
     L += p.get("ln_age_ln_tc", 0.0) * (ln_age * ln_tc)
     L += p.get("ln_age_ln_hdl", 0.0) * (ln_age * ln_hdl)
     L += p.get("ln_age_smoker", 0.0) * (ln_age * smoker)
+    return L, p
+
+
+def acc_aha_equation(patient: Dict, coeffs: Optional[Dict] = None) -> float:
+    """Pooled Cohort Equations (2013) – implementación directa población blanca.
+    Incluye todas las interacciones (y ln(edad)^2 en mujeres) y clamps de entradas.
+    """
+    L, p = acc_aha_linear_predictor(patient, coeffs)
 
     # Conversión a riesgo 10 años
     risk = 1 - (p["S0"] ** math.exp(L - p["meanXB"]))
@@ -282,30 +337,44 @@ def acc_aha_equation(patient: Dict) -> float:
     return round(risk_pct, 1)
 
 
-def acc_aha_risk(patient: Dict) -> Dict:
-    risk_pct = acc_aha_equation(patient)
+def acc_aha_risk(patient: Dict, coeffs: Optional[Dict] = None) -> Dict:
+    risk_pct = acc_aha_equation(patient, coeffs)
     category = categorize_accaha(risk_pct)
     return {"percent": risk_pct, "category": category}
 
 
 # ­Funciones auxiliares de categorización
+# Umbrales como datos: lista ordenada de [límite, operador, etiqueta]
+# ("lt": pct < límite, "le": pct <= límite); si ninguno aplica, "else".
+# Se exportan tal cual en /models/spec para que el cliente categorice igual.
+CATEGORY_RULES = {
+    "framingham": {"cuts": [[10, "lt", "bajo"], [20, "le", "intermedio"]], "else": "alto"},
+    "acc_aha": {"cuts": [[5, "lt", "bajo"], [7.5, "lt", "limítrofe"], [20, "lt", "intermedio"]], "else": "alto"},
+    # SCORE2 por edad: [edad límite (exclusiva) | None, reglas]
+    "score2": [
+        [50, {"cuts": [[2.5, "lt", "bajo"], [7.5, "lt", "alto"]], "else": "muy alto"}],
+        [70, {"cuts": [[5, "lt", "bajo"], [10, "lt", "alto"]], "else": "muy alto"}],
+        [None, {"cuts": [[7.5, "lt", "bajo"], [15, "lt", "alto"]], "else": "muy alto"}],
+    ],
+    # Colores de las tablas ESC (ruta de tablas y coeficientes oficiales)
+    "score2_chart": {"cuts": [[2.5, "lt", "bajo"], [7.5, "lt", "moderado"], [15, "lt", "alto"]], "else": "muy_alto"},
+}
+
+
+def _categorize(pct: float, rule: Dict) -> str:
+    for bound, op, label in rule["cuts"]:
+        if (pct < bound) if op == "lt" else (pct <= bound):
+            return label
+    return rule["else"]
+
+
 def categorize_framingham(pct: float) -> str:
     """Framingham (10a CHD/CVD): <10 bajo, 10–20 intermedio, >20 alto."""
-    if pct < 10:
-        return "bajo"
-    if pct <= 20:
-        return "intermedio"
-    return "alto"
+    return _categorize(pct, CATEGORY_RULES["framingham"])
 
 def categorize_accaha(pct: float) -> str:
     """ACC/AHA PCE (ASCVD 10a): <5 bajo; 5–7.5 limítrofe; 7.5–20 intermedio; ≥20 alto."""
-    if pct < 5:
-        return "bajo"
-    if pct < 7.5:
-        return "limítrofe"
-    if pct < 20:
-        return "intermedio"
-    return "alto"
+    return _categorize(pct, CATEGORY_RULES["acc_aha"])
 
 def categorize_score2(pct: float, age: float) -> str:
     """SCORE2 categorías por edad (ESC 2021).
@@ -313,21 +382,129 @@ def categorize_score2(pct: float, age: float) -> str:
     - 50–69: <5 bajo‑mod; 5–<10 alto; ≥10 muy alto
     - 70–89 (SCORE2‑OP): <7.5 bajo‑mod; 7.5–<15 alto; ≥15 muy alto
     """
-    if age < 50:
-        if pct < 2.5:
-            return "bajo"
-        if pct < 7.5:
-            return "alto"
-        return "muy alto"
-    if age < 70:
-        if pct < 5:
-            return "bajo"
-        if pct < 10:
-            return "alto"
-        return "muy alto"
-    # 70–89
-    if pct < 7.5:
-        return "bajo"
-    if pct < 15:
-        return "alto"
-    return "muy alto"
+    for upper_age, rule in CATEGORY_RULES["score2"]:
+        if upper_age is None or age < upper_age:
+            return _categorize(pct, rule)
+
+
+# ­Grafo de dependencias entradas → escalas (recálculo incremental)
+# Cada escala declara qué campos del paciente lee; un cambio en un campo
+# fuera de su conjunto no puede alterar su resultado.
+SCALE_INPUTS: Dict[str, frozenset] = {
+    "framingham": frozenset({
+        "edad", "sexo", "colesterol_total", "hdl", "presion_sistolica",
+        "tratamiento_hipertension", "fumador", "diabetes",
+    }),
+    "score": frozenset({
+        "edad", "sexo", "colesterol_total", "hdl", "no_hdl", "presion_sistolica",
+        "fumador", "region_riesgo",
+    }),
+    "acc_aha": frozenset({
+        "edad", "sexo", "colesterol_total", "hdl", "presion_sistolica",
+        "tratamiento_hipertension", "fumador", "diabetes",
+    }),
+}
+
+SCALE_FUNCTIONS = {
+    "framingham": framingham_risk,
+    "score": score2_risk,
+    "acc_aha": acc_aha_risk,
+}
+
+
+def affected_scales(changed: Iterable[str], scales: Iterable[str] = SCALE_INPUTS) -> Set[str]:
+    """Escalas (claves de resultado) cuyo resultado depende de algún campo cambiado."""
+    changed = set(changed)
+    return {name for name in scales if SCALE_INPUTS.get(name, frozenset()) & changed}
+
+
+def recalculate(patient: Dict, previous: Dict, changed: Iterable[str], meta: Optional[Dict] = None) -> Dict:
+    """Recalcula solo las escalas de `previous` afectadas por `changed`.
+    `patient` debe contener ya los valores nuevos; las escalas no afectadas
+    reutilizan su resultado previo tal cual. Si se pasa `meta` y SCORE2 se
+    recalcula, se anota la ruta usada en meta["score2_path"].
+    """
+    stale = affected_scales(changed, previous)
+    result = {}
+    for name, value in previous.items():
+        if name not in stale:
+            result[name] = value
+        elif name == "score" and meta is not None:
+            result[name], meta["score2_path"] = score2_risk_with_path(patient)
+        else:
+            result[name] = SCALE_FUNCTIONS[name](patient)
+    return result
+
+
+# ­Recalibración local (scripts/recalibrate.py, backend/recalibration.py)
+# Parámetros de línea base por escala y sexo: (coeficientes, clave de la media
+# del índice lineal). Un fichero de recalibración sustituye S0, la media y las
+# escalas regionales del modelo continuo SCORE2; las tablas y los coeficientes
+# oficiales SCORE2 no se tocan. Los valores cargados entran en MODEL_VERSION.
+BASELINE_PARAMS = {
+    "framingham": ({"men": FR_MEN, "women": FR_WOMEN}, "meanL"),
+    "score": (SCORE2_SURROGATE, "mean"),
+    "acc_aha": ({"men": ACC_AHA_WHITE_M, "women": ACC_AHA_WHITE_F}, "meanXB"),
+}
+RECALIBRATION_FORMAT = 1
+RECALIBRATION_PATH = os.path.join(os.path.dirname(__file__), "recalibration.json")
+
+
+def _apply_recalibration(path: Optional[str] = None) -> Optional[Dict]:
+    """Aplica recalibration.json (o CARDIORISK_RECALIBRATION_PATH) si existe;
+    devuelve su procedencia o None."""
+    path = path or os.environ.get("CARDIORISK_RECALIBRATION_PATH") or RECALIBRATION_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("format") != RECALIBRATION_FORMAT:
+        return None
+    fitted = data.get("scales", {})
+    for scale, (params, mean_key) in BASELINE_PARAMS.items():
+        for sex, p in params.items():
+            entry = fitted.get(scale, {}).get(sex)
+            if entry:
+                p["S0"] = float(entry["S0"])
+                p[mean_key] = float(entry[mean_key])
+    SCORE2_REGION_SCALE.update({k: float(v) for k, v in fitted.get("score", {}).get("region_scale", {}).items()
+                                if k in SCORE2_REGION_SCALE})
+    return {"path": path, "source": data.get("source"), "created": data.get("created")}
+
+
+RECALIBRATION = _apply_recalibration()
+
+
+# ­Versión de coeficientes
+# Huella de todos los parámetros que determinan un resultado: coeficientes
+# embebidos, JSON de tablas/coeficientes SCORE2 y ruta SCORE2 disponible.
+# Cambia automáticamente cuando cambia cualquiera de ellos.
+_MODEL_JSON_FILES = ("score2_risk_tables.json", "score2_coeffs.json", "accaha_pce_coeffs.json")
+
+
+def _model_fingerprint() -> str:
+    digest = hashlib.sha256()
+    embedded = {
+        "FR_MEN": FR_MEN,
+        "FR_WOMEN": FR_WOMEN,
+        "ACC_AHA_WHITE_M": ACC_AHA_WHITE_M,
+        "ACC_AHA_WHITE_F": ACC_AHA_WHITE_F,
+        "SCORE2_SURROGATE": SCORE2_SURROGATE,
+        "SCORE2_REGION_SCALE": SCORE2_REGION_SCALE,
+        "SCORE2_CLAMPS": SCORE2_CLAMPS,
+        "ACC_AHA_CLAMPS": ACC_AHA_CLAMPS,
+        "CATEGORY_RULES": CATEGORY_RULES,
+        "score2_paths": [callable(score2_lookup_from_tables), callable(score2_risk_official)],
+    }
+    digest.update(json.dumps(embedded, sort_keys=True).encode("utf-8"))
+    here = os.path.dirname(__file__)
+    for name in _MODEL_JSON_FILES:
+        path = os.path.join(here, name)
+        if os.path.exists(path):
+            with open(path, "rb") as fh:
+                digest.update(name.encode("utf-8") + b"\0" + fh.read())
+    return digest.hexdigest()[:16]
+
+
+MODEL_VERSION = _model_fingerprint()
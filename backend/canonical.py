@@ -0,0 +1,71 @@
+"""
+Normalización canónica de entradas y huella de contenido para cacheo HTTP
+"""
+
+import hashlib
+import json
+from typing import Dict, Mapping
+
+try:
+    from .validators import RANGES  # type: ignore
+    from .calculators import MODEL_VERSION, SCORE2_REGION_MAP  # type: ignore
+except ImportError:
+    from validators import RANGES
+    from calculators import MODEL_VERSION, SCORE2_REGION_MAP
+
+BOOL_FIELDS = ("fumador", "diabetes", "tratamiento_hipertension")
+NUMERIC_FIELDS = tuple(RANGES) + ("no_hdl",)
+
+_TRUE = {"true", "1", "si", "sí", "yes", "on"}
+_FALSE = {"false", "0", "no", "off", ""}
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    s = str(value).strip().lower()
+    if s in _TRUE:
+        return True
+    if s in _FALSE:
+        return False
+    return value  # el validador lo señalará
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value  # el validador lo señalará
+
+
+def normalize_patient(data: Mapping) -> Dict:
+    """
+    Devuelve solo los campos que influyen en el cálculo, con tipos canónicos:
+    numéricos como float, booleanos como bool, sexo en minúsculas y región
+    con su clave interna ("low" | "moderate" | "high" | "very_high").
+    Entradas equivalentes ("55" y 55.0, "alto" y "high") producen el mismo dict.
+    """
+    patient = {}
+    for key in NUMERIC_FIELDS:
+        if key in data:
+            patient[key] = _to_number(data[key])
+    for key in BOOL_FIELDS:
+        if key in data:
+            patient[key] = _to_bool(data[key])
+    if "sexo" in data:
+        patient["sexo"] = str(data["sexo"]).strip().lower()
+    if "region_riesgo" in data:
+        region = str(data["region_riesgo"]).strip().lower().replace(" ", "_").replace("-", "_")
+        patient["region_riesgo"] = SCORE2_REGION_MAP.get(region, region)
+    return patient
+
+
+def canonical_json(patient: Mapping) -> str:
+    """Serialización estable (claves ordenadas, sin espacios)."""
+    return json.dumps(patient, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def inputs_digest(method: str, patient: Mapping, version: str = MODEL_VERSION) -> str:
+    """Hash de contenido de (versión de coeficientes, método, entradas normalizadas)."""
+    payload = f"{version}\n{method}\n{canonical_json(patient)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,246 @@
+"""
+Analítica de cohortes en una sola pasada y memoria acotada
+
+Consume resultados bloque a bloque y mantiene únicamente estructuras
+combinables (mergeables) de tamaño fijo:
+- QuantileSketch: histograma exacto en décimas de punto (0–100 %), porque
+  todas las escalas redondean a 0.1; 1001 contadores por escala y sexo
+  dan percentiles exactos con memoria constante.
+- Contadores de categoría por sexo, banda de edad y región.
+- Discordancia entre escalas con la misma regla que frontend/script.js.
+
+Varios agregadores (p. ej. uno por worker) se combinan con merge() o
+serializando con to_dict()/from_dict().
+"""
+
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .calculators import SCORE2_REGION_MAP  # type: ignore
+    from .columnar import CATEGORY_LABELS, REGION_CODES, SEX_CODES, column_length  # type: ignore
+except ImportError:
+    from calculators import SCORE2_REGION_MAP
+    from columnar import CATEGORY_LABELS, REGION_CODES, SEX_CODES, column_length
+
+BINS = 1001  # 0.0, 0.1, ..., 100.0
+DEFAULT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95, 99)
+DISCORDANCE_GAP = 2  # misma regla que displayResults (dispersión >= 2 niveles)
+
+
+def category_level(category: str) -> int:
+    """Nivel ordinal de una categoría de cualquier escala (como levelOf en script.js)."""
+    s = str(category).lower()
+    if "muy" in s:
+        return 4
+    if "alto" in s:
+        return 3
+    if "intermedio" in s:
+        return 2
+    if "moderado" in s or "limítrofe" in s or "limi" in s:
+        return 1
+    return 0
+
+
+_LEVEL_BY_CODE = tuple(category_level(label) for label in CATEGORY_LABELS)
+
+
+def age_band(age: float) -> str:
+    low = int(float(age) // 10 * 10)
+    return f"{low}-{low + 9}"
+
+
+class QuantileSketch:
+    """Histograma combinable de porcentajes con resolución 0.1 pp."""
+
+    __slots__ = ("counts", "n", "total")
+
+    def __init__(self):
+        self.counts = array("q", bytes(8 * BINS))
+        self.n = 0
+        self.total = 0.0
+
+    def add(self, pct: float) -> None:
+        if pct != pct:  # NaN: fila sin resultado
+            return
+        idx = int(round(pct * 10))
+        self.counts[0 if idx < 0 else (BINS - 1 if idx >= BINS else idx)] += 1
+        self.n += 1
+        self.total += pct
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        counts = self.counts
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+        self.n += other.n
+        self.total += other.total
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Percentil q∈[0, 1] (método nearest-rank)."""
+        if not self.n:
+            return None
+        rank = max(1, int(-(-q * self.n // 1)))  # ceil(q·n), mínimo 1
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return i / 10
+        return (BINS - 1) / 10
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.n if self.n else None
+
+    def to_dict(self) -> Dict:
+        return {"n": self.n, "total": self.total, "counts": {i: c for i, c in enumerate(self.counts) if c}}
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "QuantileSketch":
+        sketch = cls()
+        sketch.n = data["n"]
+        sketch.total = data["total"]
+        for i, c in data["counts"].items():
+            sketch.counts[int(i)] = c
+        return sketch
+
+
+class CohortAggregator:
+    """
+    Resumen en streaming de resultados de cohortes.
+    `add` recibe (paciente, result) con la forma de /calculate;
+    `add_scored` recibe columnas + salida de columnar.score_columns.
+    """
+
+    def __init__(self, scales: Sequence[str] = ("framingham", "score", "acc_aha")):
+        self.scales = tuple(scales)
+        self.rows = 0
+        self.skipped = 0  # filas sin resultado (NaN o sin categoría) en add_scored
+        self.sketches: Dict[Tuple[str, str], QuantileSketch] = {}
+        # (escala, dimensión, valor, categoría) -> n
+        self.categories: Counter = Counter()
+        self.discordance: Counter = Counter()  # "evaluated" / "discordant" por sexo y total
+
+    def _sketch(self, scale: str, sex: str) -> QuantileSketch:
+        key = (scale, sex)
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = QuantileSketch()
+        return sketch
+
+    def _add_row(self, sex: str, band: str, region: str, values: Iterable[Tuple[str, float, str, int]]) -> None:
+        self.rows += 1
+        cats = self.categories
+        levels = []
+        for scale, pct, category, level in values:
+            self._sketch(scale, sex).add(pct)
+            cats[(scale, "total", "total", category)] += 1
+            cats[(scale, "sexo", sex, category)] += 1
+            cats[(scale, "edad", band, category)] += 1
+            cats[(scale, "region", region, category)] += 1
+            levels.append(level)
+        if len(levels) == len(self.scales) and len(levels) > 1:
+            discordant = max(levels) - min(levels) >= DISCORDANCE_GAP
+            for key in ("total", sex):
+                self.discordance[(key, "evaluated")] += 1
+                if discordant:
+                    self.discordance[(key, "discordant")] += 1
+
+    def add(self, patient: Mapping, result: Mapping) -> None:
+        sex = str(patient.get("sexo", "hombre")).lower()
+        region_key = str(patient.get("region_riesgo", "moderado")).lower().replace(" ", "_").replace("-", "_")
+        region = SCORE2_REGION_MAP.get(region_key, "moderate")
+        values = [
+            (scale, result[scale]["percent"], result[scale]["category"], category_level(result[scale]["category"]))
+            for scale in self.scales if scale in result
+        ]
+        self._add_row(sex, age_band(patient["edad"]), region, values)
+
+    def add_chunk(self, rows: Iterable[Tuple[Mapping, Mapping]]) -> None:
+        for patient, result in rows:
+            self.add(patient, result)
+
+    def add_scored(self, columns: Mapping[str, Sequence], scored: Mapping[str, Tuple[Sequence, Sequence]],
+                   start: int = 0) -> None:
+        """
+        Bloque columnar: `scored[escala]` cubre las filas [start, start + len).
+        Las filas con percent NaN o sin categoría (shards fallidos de
+        score_cohort_parallel) se omiten y se cuentan en `skipped`.
+        """
+        n = len(scored[self.scales[0]][0]) if scored else 0
+        if start + n > column_length(columns):
+            raise ValueError("El bloque puntuado excede la longitud de las columnas")
+        outputs = [(scale, scored[scale][0], scored[scale][1]) for scale in self.scales if scale in scored]
+        ages, sexes, regions = columns["edad"], columns["sexo"], columns["region_riesgo"]
+        n_labels = len(CATEGORY_LABELS)
+        for j in range(n):
+            i = start + j
+            if any(pct[j] != pct[j] or cat[j] >= n_labels for _scale, pct, cat in outputs):
+                self.skipped += 1
+                continue
+            values = [(scale, pct[j], CATEGORY_LABELS[cat[j]], _LEVEL_BY_CODE[cat[j]]) for scale, pct, cat in outputs]
+            self._add_row(SEX_CODES[sexes[i]], age_band(ages[i]), REGION_CODES[regions[i]], values)
+
+    def merge(self, other: "CohortAggregator") -> "CohortAggregator":
+        self.rows += other.rows
+        self.skipped += other.skipped
+        for key, sketch in other.sketches.items():
+            self._sketch(*key).merge(sketch)
+        self.categories.update(other.categories)
+        self.discordance.update(other.discordance)
+        return self
+
+    def summary(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict:
+        """Percentiles por escala (y sexo), proporciones por categoría y discordancia."""
+        out: Dict = {"rows": self.rows, "skipped": self.skipped, "scales": {}, "discordance": {}}
+        for scale in self.scales:
+            groups = {sex: s for (sc, sex), s in self.sketches.items() if sc == scale}
+            if not groups:
+                continue
+            overall = QuantileSketch()
+            for sketch in groups.values():
+                overall.merge(sketch)
+            entry = {"n": overall.n, "mean": overall.mean(),
+                     "percentiles": {str(p): overall.quantile(p / 100) for p in percentiles},
+                     "by_sex": {}, "categories": {}}
+            for sex, sketch in sorted(groups.items()):
+                entry["by_sex"][sex] = {"n": sketch.n, "mean": sketch.mean(),
+                                        "percentiles": {str(p): sketch.quantile(p / 100) for p in percentiles}}
+            totals: Counter = Counter()
+            for (sc, dim, value, _cat), n in self.categories.items():
+                if sc == scale:
+                    totals[(dim, value)] += n
+            for (sc, dim, value, cat), n in sorted(self.categories.items()):
+                if sc != scale:
+                    continue
+                entry["categories"].setdefault(dim, {}).setdefault(value, {})[cat] = {
+                    "n": n, "share": n / totals[(dim, value)],
+                }
+            out["scales"][scale] = entry
+        for (group, kind), n in self.discordance.items():
+            if kind == "evaluated":
+                discordant = self.discordance[(group, "discordant")]
+                out["discordance"][group] = {"evaluated": n, "discordant": discordant, "rate": discordant / n}
+        return out
+
+    def to_dict(self) -> Dict:
+        return {
+            "scales": list(self.scales),
+            "rows": self.rows,
+            "skipped": self.skipped,
+            "sketches": {f"{scale}|{sex}": s.to_dict() for (scale, sex), s in self.sketches.items()},
+            "categories": {"|".join(k): n for k, n in self.categories.items()},
+            "discordance": {"|".join(k): n for k, n in self.discordance.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "CohortAggregator":
+        agg = cls(data["scales"])
+        agg.rows = data["rows"]
+        agg.skipped = data.get("skipped", 0)
+        for key, sketch in data["sketches"].items():
+            agg.sketches[tuple(key.split("|", 1))] = QuantileSketch.from_dict(sketch)
+        agg.categories.update({tuple(k.split("|")): n for k, n in data["categories"].items()})
+        agg.discordance.update({tuple(k.split("|")): n for k, n in data["discordance"].items()})
+        return agg
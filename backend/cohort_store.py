@@ -0,0 +1,279 @@
+"""
+Almacén columnar binario de cohortes con recarga por mmap
+
+Una cohorte se ingiere una vez (p. ej. desde CSV) a un fichero con:
+- columnas numéricas float64 (valores exactos de entrada),
+- sexo y región como códigos uint8,
+- booleanos empaquetados a 1 bit por fila.
+
+Al reabrirla, el fichero se mapea en memoria (solo lectura) y cada columna
+es una vista sin copia que se materializa la primera vez que se accede:
+recarga casi instantánea y memoria proporcional a las columnas tocadas.
+
+Formato (little-endian):
+    b"CRCS" | u16 versión | u32 longitud de cabecera | cabecera JSON | columnas
+    (cada columna alineada a 64 bytes; offsets absolutos en la cabecera)
+"""
+
+import csv
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping as MappingABC
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .canonical import normalize_patient  # type: ignore
+    from .columnar import FLAG_COLUMNS, REGION_CODES, SCHEMA, SEX_CODES, column_length, empty_columns  # type: ignore
+    from .validators import validate_patient_data  # type: ignore
+except ImportError:
+    from canonical import normalize_patient
+    from columnar import FLAG_COLUMNS, REGION_CODES, SCHEMA, SEX_CODES, column_length, empty_columns
+    from validators import validate_patient_data
+
+MAGIC = b"CRCS"
+FORMAT_VERSION = 1
+ALIGN = 64
+_DTYPES = {"d": "f8", "B": "u1"}
+
+
+def pack_bits(values: Sequence[int]) -> bytes:
+    """Empaqueta 0/1 a bits (LSB primero dentro de cada byte)."""
+    out = bytearray((len(values) + 7) // 8)
+    for i, v in enumerate(values):
+        if v:
+            out[i >> 3] |= 1 << (i & 7)
+    return bytes(out)
+
+
+class BitColumn:
+    """Columna booleana empaquetada, leída bajo demanda (secuencia de 0/1)."""
+
+    __slots__ = ("_buf", "_n")
+
+    def __init__(self, buf, n: int):
+        self._buf = buf
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("BitColumn index out of range")
+        return (self._buf[i >> 3] >> (i & 7)) & 1
+
+    def __iter__(self) -> Iterator[int]:
+        buf, n = self._buf, self._n
+        for i in range(n):
+            yield (buf[i >> 3] >> (i & 7)) & 1
+
+
+def write_store(path: str, columns: Mapping[str, Sequence], source: Optional[str] = None) -> int:
+    """Escribe columnas (ver columnar.SCHEMA) al formato binario. Devuelve filas."""
+    n = column_length(columns)
+    blobs = []
+    for name, code in SCHEMA:
+        if name in FLAG_COLUMNS:
+            blobs.append((name, "bits", pack_bits(columns[name])))
+            continue
+        arr = array(code, columns[name])
+        if sys.byteorder == "big":
+            arr.byteswap()
+        blobs.append((name, _DTYPES[code], arr.tobytes()))
+
+    def build_header(base: int) -> Dict:
+        cols, offset = [], base
+        for name, dtype, blob in blobs:
+            offset = (offset + ALIGN - 1) // ALIGN * ALIGN
+            cols.append({"name": name, "dtype": dtype, "offset": offset, "nbytes": len(blob)})
+            offset += len(blob)
+        return {
+            "rows": n,
+            "columns": cols,
+            "sex_codes": list(SEX_CODES),
+            "region_codes": list(REGION_CODES),
+            "source": source,
+            "created": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        }
+
+    # La cabecera contiene offsets que dependen de su propia longitud: se
+    # reserva espacio de sobra con un primer cálculo y se rellena con espacios.
+    draft = json.dumps(build_header(0)).encode("utf-8")
+    reserved = len(draft) + 64
+    header = json.dumps(build_header(10 + reserved)).encode("utf-8").ljust(reserved)
+    with open(path, "wb") as fh:
+        fh.write(MAGIC + struct.pack("<HI", FORMAT_VERSION, reserved) + header)
+        for col, (_name, _dtype, blob) in zip(json.loads(header)["columns"], blobs):
+            fh.write(b"\0" * (col["offset"] - fh.tell()))
+            fh.write(blob)
+    return n
+
+
+def iter_csv_patients(csv_path: str, delimiter: str = ",") -> Iterator[Dict]:
+    with open(csv_path, "r", encoding="utf-8", newline="") as fh:
+        for row in csv.DictReader(fh, delimiter=delimiter):
+            yield normalize_patient(row)
+
+
+def collect_patients(patients: Iterable[Mapping]) -> Dict[str, array]:
+    """
+    Columnas compactas (SCHEMA) a partir de dicts de paciente normalizados, en
+    un recorrido. Cada fila se valida como en /calculate (RANGES, sexo), los
+    indicadores deben ser booleanos y la región debe ser conocida; si no,
+    ValueError con la fila.
+    """
+    cols = empty_columns()
+    numeric = [(name, cols[name].append) for name, code in SCHEMA if code == "d"]
+    for line, p in enumerate(patients, start=1):
+        ok, errors = validate_patient_data(p)
+        if not ok:
+            raise ValueError(f"Fila {line}: {'; '.join(errors)}")
+        region = p.get("region_riesgo", "moderate")
+        if region not in REGION_CODES:
+            raise ValueError(f"Fila {line}: región desconocida {region!r}")
+        for name, put in numeric:
+            put(float(p[name]))
+        cols["sexo"].append(SEX_CODES.index(str(p["sexo"]).lower()))
+        cols["region_riesgo"].append(REGION_CODES.index(region))
+        for name in FLAG_COLUMNS:
+            flag = p.get(name)
+            if not isinstance(flag, bool):
+                raise ValueError(f"Fila {line}: {name} debe ser verdadero o falso (recibido {flag!r})")
+            cols[name].append(1 if flag else 0)
+    return cols
+
+
+def ingest_patients(patients: Iterable[Mapping], path: str, source: Optional[str] = None) -> int:
+    """Ingiere dicts de paciente normalizados (un recorrido, columnas compactas)."""
+    return write_store(path, collect_patients(patients), source)
+
+
+def ingest_csv(csv_path: str, store_path: str, delimiter: str = ",") -> int:
+    """CSV con las columnas de /calculate (cabecera obligatoria) → almacén binario."""
+    return ingest_patients(iter_csv_patients(csv_path, delimiter), store_path, source=csv_path)
+
+
+_OUTCOME_VALUES = {"1": 1, "0": 0, "true": 1, "false": 0, "si": 1, "sí": 1, "no": 0}
+
+
+def read_labelled_csv(csv_path: str, outcome_columns: Sequence[str],
+                      delimiter: str = ",") -> Tuple[Dict[str, array], Dict[str, array]]:
+    """
+    CSV etiquetado: columnas de paciente (SCHEMA) y, por cada columna de
+    `outcome_columns`, el resultado observado a 10 años como 0/1 (uint8).
+    """
+    outcomes = {name: array("B") for name in outcome_columns}
+
+    def rows() -> Iterator[Dict]:
+        with open(csv_path, "r", encoding="utf-8", newline="") as fh:
+            for line, row in enumerate(csv.DictReader(fh, delimiter=delimiter), start=1):
+                for name, out in outcomes.items():
+                    value = _OUTCOME_VALUES.get(str(row.get(name, "")).strip().lower())
+                    if value is None:
+                        raise ValueError(f"Fila {line}: resultado '{name}' ausente o no válido ({row.get(name)!r})")
+                    out.append(value)
+                yield normalize_patient(row)
+
+    return collect_patients(rows()), outcomes
+
+
+class _LazyColumns(MappingABC):
+    def __init__(self, store: "CohortStore"):
+        self._store = store
+
+    def __getitem__(self, name):
+        return self._store.column(name)
+
+    def __iter__(self):
+        return iter(self._store.column_names)
+
+    def __len__(self):
+        return len(self._store.column_names)
+
+
+class CohortStore:
+    """Almacén abierto por mmap. Usar como context manager o llamar a close()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cache: Dict[str, Sequence] = {}
+        self._exports = []  # memoryviews sobre el mmap (liberar antes de cerrar)
+        self._view = None
+        self._fh = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # fichero vacío
+            self._fh.close()
+            raise ValueError(f"{path}: almacén vacío") from None
+        if self._mm[:4] != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: no es un almacén CRCS")
+        version, header_len = struct.unpack("<HI", self._mm[4:10])
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path}: versión de formato {version} no soportada")
+        self.header = json.loads(self._mm[10:10 + header_len].decode("utf-8"))
+        self.rows: int = self.header["rows"]
+        self._meta = {c["name"]: c for c in self.header["columns"]}
+        self._view = memoryview(self._mm)
+
+    @classmethod
+    def open(cls, path: str) -> "CohortStore":
+        return cls(path)
+
+    @property
+    def column_names(self):
+        return list(self._meta)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, name: str) -> Sequence:
+        """Vista sin copia de la columna (se crea en el primer acceso)."""
+        col = self._cache.get(name)
+        if col is not None:
+            return col
+        meta = self._meta[name]
+        raw = self._view[meta["offset"]:meta["offset"] + meta["nbytes"]]
+        self._exports.append(raw)
+        if meta["dtype"] == "bits":
+            col = BitColumn(raw, self.rows)
+        elif sys.byteorder == "little":
+            col = raw.cast("d" if meta["dtype"] == "f8" else "B")
+            self._exports.append(col)
+        else:
+            col = array("d" if meta["dtype"] == "f8" else "B", raw.tobytes())
+            col.byteswap()
+        self._cache[name] = col
+        return col
+
+    def columns(self) -> Mapping[str, Sequence]:
+        """Mapping perezoso {columna: vista}, compatible con columnar.*"""
+        return _LazyColumns(self)
+
+    def close(self) -> None:
+        self._cache.clear()
+        for view in reversed(self._exports):
+            view.release()
+        self._exports.clear()
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._fh.close()
+
+    def __enter__(self) -> "CohortStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,121 @@
+"""
+Representación columnar de cohortes (arrays tipados de la stdlib, sin numpy)
+
+Una cohorte es un dict {columna: array} con todas las columnas de igual
+longitud. Sexo y región se guardan como códigos enteros pequeños y los
+booleanos como 0/1, de modo que cada columna cabe en un buffer contiguo
+(reutilizable en memoria compartida, ficheros mapeados o formatos binarios).
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .calculators import CATEGORY_RULES, SCALE_FUNCTIONS, SCORE2_REGION_MAP  # type: ignore
+except ImportError:
+    from calculators import CATEGORY_RULES, SCALE_FUNCTIONS, SCORE2_REGION_MAP
+
+SEX_CODES = ("hombre", "mujer")
+REGION_CODES = ("low", "moderate", "high", "very_high")
+
+# (columna, typecode de array): "d" float64, "B" uint8
+SCHEMA: Tuple[Tuple[str, str], ...] = (
+    ("edad", "d"),
+    ("presion_sistolica", "d"),
+    ("colesterol_total", "d"),
+    ("hdl", "d"),
+    ("sexo", "B"),
+    ("region_riesgo", "B"),
+    ("fumador", "B"),
+    ("diabetes", "B"),
+    ("tratamiento_hipertension", "B"),
+)
+NUMERIC_COLUMNS = tuple(name for name, code in SCHEMA if code == "d")
+FLAG_COLUMNS = ("fumador", "diabetes", "tratamiento_hipertension")
+
+SCALES = tuple(SCALE_FUNCTIONS)
+
+
+def _category_labels() -> Tuple[str, ...]:
+    labels: List[str] = []
+    rules = [CATEGORY_RULES["framingham"], CATEGORY_RULES["acc_aha"], CATEGORY_RULES["score2_chart"]]
+    rules += [rule for _age, rule in CATEGORY_RULES["score2"]]
+    for rule in rules:
+        for label in [cut[2] for cut in rule["cuts"]] + [rule["else"]]:
+            if label not in labels:
+                labels.append(label)
+    return tuple(labels) + ("error",)
+
+
+# Código uint8 de cada categoría (índice en esta tupla)
+CATEGORY_LABELS = _category_labels()
+CATEGORY_CODE = {label: idx for idx, label in enumerate(CATEGORY_LABELS)}
+
+
+def encode_region(value) -> int:
+    key = str(value).strip().lower().replace(" ", "_").replace("-", "_")
+    return REGION_CODES.index(SCORE2_REGION_MAP.get(key, "moderate"))
+
+
+def encode_sex(value) -> int:
+    return 0 if str(value).strip().lower() == "hombre" else 1
+
+
+def empty_columns(n: int = 0) -> Dict[str, array]:
+    """Columnas a cero de longitud n."""
+    return {name: array(code, bytes(array(code).itemsize * n)) for name, code in SCHEMA}
+
+
+def patients_to_columns(patients: Iterable[Mapping]) -> Dict[str, array]:
+    """Convierte dicts de paciente (formato de /calculate) a columnas."""
+    cols = empty_columns()
+    for p in patients:
+        for name in NUMERIC_COLUMNS:
+            cols[name].append(float(p[name]))
+        cols["sexo"].append(encode_sex(p.get("sexo", "hombre")))
+        cols["region_riesgo"].append(encode_region(p.get("region_riesgo", "moderado")))
+        for name in FLAG_COLUMNS:
+            cols[name].append(1 if p.get(name, False) else 0)
+    return cols
+
+
+def column_length(columns: Mapping[str, Sequence]) -> int:
+    return len(columns[SCHEMA[0][0]])
+
+
+def row_patient(columns: Mapping[str, Sequence], i: int) -> Dict:
+    """Dict de paciente de la fila i, listo para framingham_risk y compañía."""
+    return {
+        "edad": columns["edad"][i],
+        "presion_sistolica": columns["presion_sistolica"][i],
+        "colesterol_total": columns["colesterol_total"][i],
+        "hdl": columns["hdl"][i],
+        "sexo": SEX_CODES[columns["sexo"][i]],
+        "region_riesgo": REGION_CODES[columns["region_riesgo"][i]],
+        "fumador": bool(columns["fumador"][i]),
+        "diabetes": bool(columns["diabetes"][i]),
+        "tratamiento_hipertension": bool(columns["tratamiento_hipertension"][i]),
+    }
+
+
+def iter_patients(columns: Mapping[str, Sequence], start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+    stop = column_length(columns) if stop is None else stop
+    for i in range(start, stop):
+        yield row_patient(columns, i)
+
+
+def score_columns(columns: Mapping[str, Sequence], start: int = 0, stop: Optional[int] = None,
+                  scales: Sequence[str] = SCALES) -> Dict[str, Tuple[array, array]]:
+    """
+    Evalúa las escalas sobre las filas [start, stop).
+    Devuelve {escala: (percent float64, código de categoría uint8)}.
+    """
+    out = {name: (array("d"), array("B")) for name in scales}
+    funcs = [(SCALE_FUNCTIONS[name], out[name][0].append, out[name][1].append) for name in scales]
+    code = CATEGORY_CODE
+    for patient in iter_patients(columns, start, stop):
+        for func, put_pct, put_cat in funcs:
+            res = func(patient)
+            put_pct(res["percent"])
+            put_cat(code[res["category"]])
+    return out
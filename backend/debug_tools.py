@@ -0,0 +1,153 @@
+"""
+Herramientas de diagnóstico en caliente: perfilador por muestreo y tracemalloc
+
+- SamplingProfiler: muestrea periódicamente las pilas de todos los hilos
+  (sys._current_frames) durante N segundos mientras el servidor atiende
+  tráfico real y devuelve pilas colapsadas ("a;b;c N"), el formato de entrada
+  de flamegraph.pl / speedscope.
+- MemoryTracer: envoltorio de tracemalloc para tomar snapshots y comparar
+  contra una línea base sin reiniciar el proceso.
+
+Las rutas que los exponen están protegidas con CARDIORISK_DEBUG_TOKEN.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+MAX_PROFILE_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Perfilador estadístico de todos los hilos; una sesión a la vez."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def run(self, seconds: float, interval: float = 0.005) -> Dict:
+        seconds = max(0.0, min(float(seconds), MAX_PROFILE_SECONDS))
+        interval = max(MIN_INTERVAL, float(interval))
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Ya hay un perfilado en curso")
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float) -> Dict:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                thread = names.get(ident) or str(ident)
+                stacks[";".join([thread] + labels[::-1])] += 1
+            samples += 1
+            time.sleep(interval)
+        return {"seconds": seconds, "interval": interval, "samples": samples, "stacks": stacks}
+
+    @staticmethod
+    def collapsed(result: Dict) -> str:
+        """Texto de pilas colapsadas, una por línea: 'hilo;f1;f2 N'."""
+        return "\n".join(f"{stack} {n}" for stack, n in result["stacks"].most_common()) + "\n"
+
+    @staticmethod
+    def top_functions(result: Dict, limit: int = 25) -> List[Dict]:
+        """Funciones por muestras propias (hoja de la pila) y acumuladas."""
+        own: Counter = Counter()
+        cumulative: Counter = Counter()
+        for stack, n in result["stacks"].items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += n
+            for label in set(frames):
+                cumulative[label] += n
+        total = sum(result["stacks"].values()) or 1
+        return [
+            {"function": label, "cumulative": n, "own": own[label], "cumulative_share": round(n / total, 4)}
+            for label, n in cumulative.most_common(limit)
+        ]
+
+
+class MemoryTracer:
+    """Snapshots de tracemalloc y diferencias frente a una línea base."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 25) -> None:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, int(frames)))
+            self._baseline = None
+
+    def stop(self) -> None:
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc no está activo (usar /debug/tracemalloc/start)")
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def snapshot(self, top: int = 20, key_type: str = "lineno", set_baseline: bool = True) -> Dict:
+        with self._lock:
+            snap = self._snapshot()
+            if set_baseline:
+                self._baseline = snap
+            current, peak = tracemalloc.get_traced_memory()
+            return {
+                "traced_current_bytes": current,
+                "traced_peak_bytes": peak,
+                "top": [
+                    {"trace": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                    for stat in snap.statistics(key_type)[:top]
+                ],
+            }
+
+    def diff(self, top: int = 20, key_type: str = "lineno", reset: bool = False) -> Dict:
+        """Crecimiento desde la línea base (la primera llamada fija la base)."""
+        with self._lock:
+            snap = self._snapshot()
+            if self._baseline is None:
+                self._baseline = snap
+                return {"baseline_set": True, "top": []}
+            stats = snap.compare_to(self._baseline, key_type)
+            if reset:
+                self._baseline = snap
+            return {
+                "baseline_set": False,
+                "total_diff_bytes": sum(s.size_diff for s in stats),
+                "top": [
+                    {"trace": str(s.traceback), "size_diff_bytes": s.size_diff, "size_bytes": s.size,
+                     "count_diff": s.count_diff}
+                    for s in stats[:top]
+                ],
+            }
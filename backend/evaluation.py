@@ -0,0 +1,272 @@
+"""
+Discriminación y calibración de las escalas en una cohorte con resultados
+
+Una sola pasada sobre las salidas por lotes (percent de score_columns /
+score_cohort_parallel) construye, por escala, una tabla de recuentos
+{riesgo %: [sin evento, con evento]}. Las escalas redondean a 0.1 pp, así
+que la tabla tiene como mucho unos miles de celdas aunque la cohorte tenga
+millones de filas. Todas las métricas se calculan sobre la tabla:
+- estadístico C por suma de rangos (Mann–Whitney, empates a 1/2);
+- calibración global: O/E y CITL (intercepto con offset logit(p));
+- pendiente de calibración: regresión logística de y sobre logit(p) (Newton);
+- O/E por deciles de riesgo predicho (los empates no se parten);
+- NRI categórico (umbrales comunes) y continuo entre pares de escalas.
+
+Intervalos de confianza por bootstrap de Poisson: cada fila recibe un peso
+Poisson(1), de modo que el recuento de cada celda se remuestrea exactamente
+como Poisson(recuento). Cada réplica cuesta O(celdas) y las réplicas se
+reparten entre procesos con una semilla por réplica (mismo resultado con
+cualquier número de workers).
+"""
+
+import math
+import random
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_THRESHOLDS = (7.5, 20.0)  # umbrales comunes (%) del NRI categórico
+P_FLOOR = 0.0005  # medio décimo de punto: un 0.0 % redondeado no es riesgo nulo
+MAX_ITER = 50
+TOLERANCE = 1e-10
+Cells = List[Tuple[float, int, int]]  # (riesgo %, sin evento, con evento) ordenadas por riesgo
+
+
+def risk_table(percent: Sequence[float], outcomes: Sequence[int]) -> Cells:
+    """Tabla de recuentos por riesgo predicho; las filas con percent NaN se omiten."""
+    counts = Counter(zip(percent, outcomes))
+    table: Dict[float, List[int]] = {}
+    for (pct, y), n in counts.items():
+        if pct == pct:
+            table.setdefault(pct, [0, 0])[1 if y else 0] += n
+    return [(pct, n0, n1) for pct, (n0, n1) in sorted(table.items())]
+
+
+def c_statistic(cells: Cells) -> Optional[float]:
+    """Área bajo la curva ROC: P(riesgo evento > riesgo no evento) + P(empate) / 2."""
+    below = 0
+    concordant = 0.0
+    events = nonevents = 0
+    for _pct, n0, n1 in cells:
+        concordant += n1 * (below + n0 / 2.0)
+        below += n0
+        events += n1
+        nonevents += n0
+    if not events or not nonevents:
+        return None
+    return concordant / (events * nonevents)
+
+
+def _logit(pct: float) -> float:
+    p = min(max(pct / 100.0, P_FLOOR), 1.0 - P_FLOOR)
+    return math.log(p / (1.0 - p))
+
+
+def _logistic_fit(cells: Cells, slope: bool) -> Optional[Tuple[float, float]]:
+    """
+    (a, b) de logit P(y) = a + b·logit(p) por Newton. Con slope=False, b = 1
+    (solo intercepto con offset). None si no converge (p. ej. separación).
+    """
+    z = [_logit(pct) for pct, _n0, _n1 in cells]
+    a, b = 0.0, 1.0
+    for _ in range(MAX_ITER):
+        ga = gb = haa = hab = hbb = 0.0
+        for zi, (_pct, n0, n1) in zip(z, cells):
+            eta = a + b * zi
+            mu = 1.0 / (1.0 + math.exp(-eta)) if eta > -700 else 0.0
+            n = n0 + n1
+            r = n1 - n * mu
+            w = n * mu * (1.0 - mu)
+            ga += r
+            haa += w
+            if slope:
+                gb += r * zi
+                hab += w * zi
+                hbb += w * zi * zi
+        if slope:
+            det = haa * hbb - hab * hab
+            if det <= 0:
+                return None
+            da = (hbb * ga - hab * gb) / det
+            db = (haa * gb - hab * ga) / det
+        else:
+            if haa <= 0:
+                return None
+            da, db = ga / haa, 0.0
+        a += da
+        b += db
+        if abs(da) < TOLERANCE and abs(db) < TOLERANCE:
+            return a, b
+    return None
+
+
+def calibration(cells: Cells) -> Dict:
+    """Eventos observados y esperados, O/E, CITL y pendiente de calibración."""
+    n = sum(n0 + n1 for _pct, n0, n1 in cells)
+    observed = sum(n1 for _pct, _n0, n1 in cells)
+    expected = math.fsum(pct / 100.0 * (n0 + n1) for pct, n0, n1 in cells)
+    citl = _logistic_fit(cells, slope=False) if 0 < observed < n else None
+    fit = _logistic_fit(cells, slope=True) if 0 < observed < n else None
+    return {
+        "n": n,
+        "observed": observed,
+        "expected": round(expected, 2),
+        "observed_pct": round(100.0 * observed / n, 3) if n else None,
+        "expected_pct": round(100.0 * expected / n, 3) if n else None,
+        "oe": observed / expected if expected else None,
+        "citl": citl[0] if citl else None,
+        "slope": fit[1] if fit else None,
+        "intercept": fit[0] if fit else None,
+    }
+
+
+def deciles(cells: Cells, groups: int = 10) -> List[Dict]:
+    """O/E por grupos de riesgo predicho de igual tamaño (celdas empatadas, en un solo grupo)."""
+    n = sum(n0 + n1 for _pct, n0, n1 in cells)
+    out = [{"n": 0, "observed": 0, "expected": 0.0, "min_pct": None, "max_pct": None} for _ in range(groups)]
+    seen = 0
+    for pct, n0, n1 in cells:
+        size = n0 + n1
+        g = out[min(groups - 1, int(groups * (seen + size / 2.0) / n))]
+        seen += size
+        g["n"] += size
+        g["observed"] += n1
+        g["expected"] += pct / 100.0 * size
+        g["min_pct"] = pct if g["min_pct"] is None else g["min_pct"]
+        g["max_pct"] = pct
+    for g in out:
+        g["observed_pct"] = round(100.0 * g["observed"] / g["n"], 3) if g["n"] else None
+        g["expected_pct"] = round(100.0 * g["expected"] / g["n"], 3) if g["n"] else None
+        g["oe"] = round(g["observed"] / g["expected"], 4) if g["expected"] else None
+        g["expected"] = round(g["expected"], 2)
+    return [g for g in out if g["n"]]
+
+
+def nri_table(percent_a: Sequence[float], percent_b: Sequence[float], outcomes: Sequence[int],
+              thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> Counter:
+    """
+    Recuentos {(movimiento categórico, movimiento continuo, y): n} de la escala
+    a a la b; movimiento = −1 baja, 0 igual, 1 sube. Omite filas con NaN.
+    """
+    table: Counter = Counter()
+    for pa, pb, y in zip(percent_a, percent_b, outcomes):
+        if pa != pa or pb != pb:
+            continue
+        ca, cb = bisect_right(thresholds, pa), bisect_right(thresholds, pb)
+        table[((cb > ca) - (cb < ca), (pb > pa) - (pb < pa), 1 if y else 0)] += 1
+    return table
+
+
+def nri(table: Mapping[Tuple[int, int, int], int]) -> Dict:
+    """NRI categórico y continuo (> 0): componente de eventos, de no eventos y total."""
+    out = {}
+    for kind, axis in (("categorical", 0), ("continuous", 1)):
+        moves = {(m, y): 0 for m in (-1, 0, 1) for y in (0, 1)}
+        for key, n in table.items():
+            moves[(key[axis], key[2])] += n
+        events = sum(moves[(m, 1)] for m in (-1, 0, 1))
+        nonevents = sum(moves[(m, 0)] for m in (-1, 0, 1))
+        ev = (moves[(1, 1)] - moves[(-1, 1)]) / events if events else None
+        ne = (moves[(-1, 0)] - moves[(1, 0)]) / nonevents if nonevents else None
+        out[kind] = {"events": ev, "nonevents": ne, "total": ev + ne if ev is not None and ne is not None else None}
+    return out
+
+
+def _poisson(rand, lam: float) -> int:
+    """Muestra Poisson(lam): producto de uniformes si lam < 10, PTRS (Hörmann, 1993) si no."""
+    if lam < 10:
+        limit, k, prod = math.exp(-lam), 0, rand()
+        while prod > limit:
+            k += 1
+            prod *= rand()
+        return k
+    slam, loglam = math.sqrt(lam), math.log(lam)
+    b = 0.931 + 2.53 * slam
+    a = -0.059 + 0.02483 * b
+    log_inv_alpha = math.log(1.1239 + 1.1328 / (b - 3.4))
+    vr = 0.9277 - 3.6224 / (b - 2)
+    while True:
+        u = rand() - 0.5
+        v = rand()
+        us = 0.5 - abs(u)
+        k = math.floor((2 * a / us + b) * u + lam + 0.43)
+        if us >= 0.07 and v <= vr:
+            return k
+        if k < 0 or (us < 0.013 and v > us):
+            continue
+        if math.log(v) + log_inv_alpha - math.log(a / (us * us) + b) <= -lam + k * loglam - math.lgamma(k + 1):
+            return k
+
+
+def _replicate(tables: Mapping[str, Cells], pairs: Mapping[str, Counter], seed, r: int) -> Dict[str, Optional[float]]:
+    rand = random.Random(f"{seed}:{r}").random
+    stats: Dict[str, Optional[float]] = {}
+    for scale, cells in tables.items():
+        sample = [(pct, _poisson(rand, n0) if n0 else 0, _poisson(rand, n1) if n1 else 0) for pct, n0, n1 in cells]
+        cal = calibration(sample)
+        stats[f"{scale}:c_statistic"] = c_statistic(sample)
+        for key in ("oe", "citl", "slope"):
+            stats[f"{scale}:{key}"] = cal[key]
+    for name, table in pairs.items():
+        result = nri(Counter({key: _poisson(rand, n) for key, n in table.items()}))
+        stats[f"{name}:nri_categorical"] = result["categorical"]["total"]
+        stats[f"{name}:nri_continuous"] = result["continuous"]["total"]
+    return stats
+
+
+def _replicate_chunk(args) -> List[Dict[str, Optional[float]]]:
+    tables, pairs, seed, start, stop = args
+    return [_replicate(tables, pairs, seed, r) for r in range(start, stop)]
+
+
+def bootstrap(tables: Mapping[str, Cells], pairs: Mapping[str, Counter], replicates: int, seed=0,
+              workers: int = 1, level: float = 0.95) -> Dict[str, Optional[List[float]]]:
+    """Intervalos percentil {"escala:métrica" | "a|b:nri_*": [inferior, superior]}."""
+    step = max(1, -(-replicates // max(1, workers)))
+    tasks = [(dict(tables), dict(pairs), seed, s, min(s + step, replicates)) for s in range(0, replicates, step)]
+    if workers <= 1 or len(tasks) <= 1:
+        results = [stats for task in tasks for stats in _replicate_chunk(task)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = [stats for chunk in pool.map(_replicate_chunk, tasks) for stats in chunk]
+    tail = (1.0 - level) / 2.0
+    out: Dict[str, Optional[List[float]]] = {}
+    for key in (results[0] if results else {}):
+        values = sorted(v for v in (stats[key] for stats in results) if v is not None)
+        if not values:
+            out[key] = None
+            continue
+        lo = values[min(len(values) - 1, int(tail * len(values)))]
+        hi = values[max(0, math.ceil((1.0 - tail) * len(values)) - 1)]
+        out[key] = [lo, hi]
+    return out
+
+
+def evaluate(predictions: Mapping[str, Sequence[float]], outcomes: Mapping[str, Sequence[int]],
+             thresholds: Sequence[float] = DEFAULT_THRESHOLDS, groups: int = 10, replicates: int = 0,
+             seed=0, workers: int = 1, level: float = 0.95) -> Dict:
+    """
+    Métricas por escala ({escala: percent por fila}, {escala: 0/1 por fila}) y
+    NRI entre cada par de escalas con el mismo resultado. Con replicates > 0
+    añade intervalos bootstrap en "ci".
+    """
+    tables = {scale: risk_table(pct, outcomes[scale]) for scale, pct in predictions.items()}
+    pairs: Dict[str, Counter] = {}
+    names = list(predictions)
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            if outcomes[a] is outcomes[b] or outcomes[a] == outcomes[b]:
+                pairs[f"{a}|{b}"] = nri_table(predictions[a], predictions[b], outcomes[a], thresholds)
+    out = {
+        "thresholds": list(thresholds),
+        "scales": {
+            scale: {"c_statistic": c_statistic(cells), "calibration": calibration(cells), "deciles": deciles(cells, groups)}
+            for scale, cells in tables.items()
+        },
+        "nri": {name: nri(table) for name, table in pairs.items()},
+    }
+    if replicates > 0:
+        out["bootstrap"] = {"replicates": replicates, "level": level, "seed": seed, "method": "poisson"}
+        out["ci"] = bootstrap(tables, pairs, replicates, seed, workers, level)
+    return out
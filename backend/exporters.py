@@ -0,0 +1,188 @@
+"""
+Exportación ligera de resultados (CSV, HTML estático, JSON Lines)
+
+Alternativa al PDF de report_generator para consumidores que solo necesitan
+los datos. Cada formato es un generador de fragmentos de texto que se puede
+pasar directamente a la respuesta HTTP: las exportaciones por lotes se
+escriben fila a fila sin construir el documento completo en memoria.
+
+Un registro es {"patient": {...}, "result": {...}, "warnings": [...]} con,
+opcionalmente, "index" y "errors" (lotes).
+"""
+
+import csv
+import html
+import io
+import itertools
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+FORMATS = {
+    "pdf": "application/pdf",
+    "csv": "text/csv; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+EXTENSIONS = {"pdf": "pdf", "csv": "csv", "html": "html", "jsonl": "jsonl"}
+
+# Tipos aceptados en Accept. text/html no se negocia por Accept porque los
+# navegadores lo envían al abrir el enlace del PDF; se pide con ?format=html.
+_ACCEPT_TYPES = (
+    ("application/pdf", "pdf"),
+    ("text/csv", "csv"),
+    ("application/x-ndjson", "jsonl"),
+    ("application/jsonl", "jsonl"),
+)
+
+PATIENT_FIELDS = (
+    "edad", "sexo", "colesterol_total", "hdl", "presion_sistolica",
+    "tratamiento_hipertension", "fumador", "diabetes", "region_riesgo",
+)
+SCALES = ("framingham", "score", "acc_aha")
+SCALE_LABELS = {"framingham": "Framingham", "score": "SCORE2", "acc_aha": "ACC/AHA"}
+
+DISCLAIMER = ("Esta calculadora es una herramienta de apoyo educativo. "
+              "Los resultados no sustituyen el criterio médico profesional. "
+              "Consulte siempre con un profesional de la salud para decisiones médicas.")
+
+
+def negotiate(explicit: Optional[str], accept=None, default: str = "pdf") -> str:
+    """Formato pedido: `?format=` tiene prioridad; si no, Accept (werkzeug MIMEAccept).
+    ValueError si `explicit` no es un formato conocido.
+    """
+    if explicit:
+        fmt = explicit.strip().lower()
+        if fmt == "ndjson":
+            fmt = "jsonl"
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato desconocido: {explicit} (válidos: {', '.join(FORMATS)})")
+        return fmt
+    if accept is not None:
+        best = accept.best_match([mime for mime, _ in _ACCEPT_TYPES])
+        if best:
+            return dict(_ACCEPT_TYPES)[best]
+    return default
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "" if value is None else str(value)
+
+
+def _parts(rec: Dict):
+    patient, result = rec.get("patient"), rec.get("result")
+    return (patient if isinstance(patient, dict) else {}), (result if isinstance(result, dict) else {})
+
+
+def iter_csv(records: Iterable[Dict], delimiter: str = ",") -> Iterator[str]:
+    """Cabecera y una línea por registro (porcentaje y categoría de cada escala)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, lineterminator="\n")
+
+    def flush() -> str:
+        text = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return text
+
+    header = ["index", *PATIENT_FIELDS]
+    for scale in SCALES:
+        header += [f"{scale}_percent", f"{scale}_category"]
+    writer.writerow(header + ["warnings", "errors"])
+    yield flush()
+    for i, rec in enumerate(records):
+        patient, result = _parts(rec)
+        row = [rec.get("index", i), *(_format_value(patient.get(f)) for f in PATIENT_FIELDS)]
+        for scale in SCALES:
+            entry = result.get(scale) or {}
+            row += [_format_value(entry.get("percent")), _format_value(entry.get("category"))]
+        row += [" | ".join(rec.get("warnings") or []), " | ".join(rec.get("errors") or [])]
+        writer.writerow(row)
+        yield flush()
+
+
+def iter_jsonl(records: Iterable[Dict]) -> Iterator[str]:
+    """Un objeto JSON por línea, tal cual el registro."""
+    for i, rec in enumerate(records):
+        yield json.dumps({"index": i, **rec}, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body{{font-family:system-ui,sans-serif;margin:2rem;color:#222}}
+table{{border-collapse:collapse;margin:1rem 0}}
+th,td{{border:1px solid #999;padding:.25rem .5rem;text-align:left}}
+th{{background:#eee}}
+.err{{color:#b00}}
+</style></head><body>
+<h1>{title}</h1>
+<p>Generado: {generated}</p>
+"""
+
+
+def iter_html(records: Iterable[Dict], title: str = "Calculadora de Riesgo Cardiovascular") -> Iterator[str]:
+    """Página HTML autocontenida (sin scripts). Un registro: ficha del paciente;
+    varios: tabla con una fila por paciente.
+    """
+    esc = html.escape
+    yield _HTML_HEAD.format(title=esc(title), generated=datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC"))
+    it = iter(records)
+    first = next(it, None)
+    second = next(it, None)
+    if first is not None and second is None:
+        patient, result = _parts(first)
+        yield "<h2>Datos del Paciente</h2>\n<table>\n"
+        for key, value in patient.items():
+            yield f"<tr><th>{esc(key.capitalize().replace('_', ' '))}</th><td>{esc(_format_value(value))}</td></tr>\n"
+        yield "</table>\n"
+        if result:
+            yield "<h2>Resultados</h2>\n<table>\n"
+            for scale, entry in result.items():
+                yield (f"<tr><th>{esc(SCALE_LABELS.get(scale, scale))}</th>"
+                       f"<td>{esc(_format_value(entry.get('percent')))} % ({esc(_format_value(entry.get('category')))})</td></tr>\n")
+            yield "</table>\n"
+        if first.get("errors"):
+            yield "<h2>Errores</h2>\n<ul>\n"
+            for e in first["errors"]:
+                yield f'<li class="err">{esc(e)}</li>\n'
+            yield "</ul>\n"
+        if first.get("warnings"):
+            yield "<h2>Advertencias</h2>\n<ul>\n"
+            for w in first["warnings"]:
+                yield f"<li>{esc(w)}</li>\n"
+            yield "</ul>\n"
+    elif first is not None:
+        head = "".join(f"<th>{esc(f)}</th>" for f in ("#",) + PATIENT_FIELDS)
+        head += "".join(f"<th>{esc(SCALE_LABELS[s])}</th>" for s in SCALES)
+        yield f"<table>\n<tr>{head}<th>Advertencias</th></tr>\n"
+        for i, rec in enumerate(itertools.chain((first, second), it)):
+            patient, result = _parts(rec)
+            cells = [esc(_format_value(rec.get("index", i)))]
+            cells += [esc(_format_value(patient.get(f))) for f in PATIENT_FIELDS]
+            for scale in SCALES:
+                entry = result.get(scale)
+                cells.append(f"{esc(_format_value(entry['percent']))} % ({esc(entry['category'])})" if entry else "")
+            notes = esc("; ".join(rec.get("warnings") or []))
+            if rec.get("errors"):
+                notes += f'<span class="err">{esc("; ".join(rec["errors"]))}</span>'
+            yield "<tr>" + "".join(f"<td>{c}</td>" for c in cells) + f"<td>{notes}</td></tr>\n"
+        yield "</table>\n"
+    yield f"<p><em>{esc(DISCLAIMER)}</em></p>\n</body></html>\n"
+
+
+RENDERERS = {"csv": iter_csv, "html": iter_html, "jsonl": iter_jsonl}
+
+
+def render(fmt: str, records: Iterable[Dict]) -> Iterator[str]:
+    """Generador del formato `fmt` (csv | html | jsonl); el PDF va por report_generator."""
+    try:
+        return RENDERERS[fmt](records)
+    except KeyError:
+        raise ValueError(f"Formato sin renderizador en streaming: {fmt}") from None
+
+
+def attachment_name(stem: str, fmt: str) -> str:
+    return f"{stem}.{EXTENSIONS[fmt]}"
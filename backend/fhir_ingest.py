@@ -0,0 +1,614 @@
+"""
+Ingesta en streaming de exportaciones FHIR R4 para puntuación por lotes
+
+Lee Bundles (JSON, opcionalmente .gz) sin cargarlos enteros: se avanza por el
+objeto de nivel superior con JSONDecoder.raw_decode sobre un buffer que se
+rellena por bloques, y cada elemento de "entry" se decodifica y se descarta
+en cuanto se ha incorporado. También acepta NDJSON (exportación bulk
+$export: un recurso o un Bundle por línea).
+
+De cada paciente solo se guarda un estado compacto:
+- Patient: sexo y fecha de nacimiento (edad a la fecha de referencia).
+- Observation (LOINC): última PAS 8480-6 (también como componente de los
+  paneles de presión arterial), colesterol total 2093-3, HDL 2085-9 y
+  tabaquismo 72166-2; unidades convertidas a mg/dL / mmHg.
+- Condition: diabetes (SNOMED o CIE-10 E10-E14) activa.
+- MedicationStatement / MedicationRequest: antihipertensivo activo (ATC
+  C02, C03, C07, C08, C09), también vía referencia a Medication.
+
+Los pacientes completos se entregan en bloques con el formato de /calculate;
+la región SCORE2 no existe en FHIR y se toma de un parámetro.
+
+Como un recurso puede aparecer en cualquier fichero del $export, el estado
+de un paciente solo es definitivo al final de la entrada. La memoria se
+acota igualmente: por encima de MAX_IN_MEMORY pacientes el estado se vuelca
+a una base SQLite temporal en disco y se fusiona al final.
+"""
+
+import gzip
+import json
+import sqlite3
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from .calculators import MG_DL_PER_MMOL_L  # type: ignore
+    from .columnar import CATEGORY_LABELS, SCALES, patients_to_columns  # type: ignore
+    from .parallel import score_cohort_parallel  # type: ignore
+    from .validators import validate_patient_data  # type: ignore
+except ImportError:
+    from calculators import MG_DL_PER_MMOL_L
+    from columnar import CATEGORY_LABELS, SCALES, patients_to_columns
+    from parallel import score_cohort_parallel
+    from validators import validate_patient_data
+
+READ_SIZE = 1 << 20
+DEFAULT_CHUNK = 50_000
+MAX_IN_MEMORY = 100_000
+
+LOINC = "http://loinc.org"
+SNOMED = "http://snomed.info/sct"
+ATC = "http://www.whocc.no/atc"
+
+LOINC_SBP = "8480-6"
+LOINC_BP_PANELS = {"85354-9", "55284-4", "35094-2"}
+LOINC_TC = "2093-3"
+LOINC_HDL = "2085-9"
+LOINC_SMOKING = "72166-2"
+
+# Tabaquismo actual (SNOMED) según el value set de US Core
+SMOKER_CODES = {"449868002", "428041000124106", "77176002", "65568007", "428071000124103",
+                "428061000124105", "81703003"}
+DIABETES_SNOMED = {"44054006", "46635009", "73211009", "11530004", "190330002"}
+DIABETES_ICD10_PREFIXES = ("E10", "E11", "E12", "E13", "E14")
+ANTIHYPERTENSIVE_ATC_PREFIXES = ("C02", "C03", "C07", "C08", "C09")
+
+# Factor a mg/dL por unidad UCUM (lípidos)
+LIPID_UNITS = {
+    "mg/dl": 1.0,
+    "mmol/l": MG_DL_PER_MMOL_L,
+    "g/l": 100.0,
+}
+PRESSURE_UNITS = {"mm[hg]": 1.0, "mmhg": 1.0, "kpa": 7.50062}
+
+_INACTIVE_STATUS = {"entered-in-error", "cancelled", "preliminary", "registered"}
+_ACTIVE_CLINICAL = {"active", "recurrence", "relapse"}
+# Estados de MedicationStatement/MedicationRequest que cuentan como tratamiento actual
+ACTIVE_MED_STATUS = ("active", "on-hold")
+
+
+class FhirFormatError(ValueError):
+    """El fichero no es un Bundle/NDJSON FHIR legible."""
+
+
+# ­Lectura incremental
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+class _Stream:
+    """Buffer de texto con relleno por bloques para raw_decode."""
+
+    def __init__(self, fh, read_size: int = READ_SIZE):
+        self.fh = fh
+        self.read_size = read_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.fh.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Siguiente carácter no blanco (sin consumirlo); "" al final."""
+        while True:
+            buf, n = self.buf, len(self.buf)
+            pos = self.pos
+            while pos < n and buf[pos] in " \t\r\n":
+                pos += 1
+            self.pos = pos
+            if pos < n:
+                return buf[pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise FhirFormatError(f"Se esperaba {char!r} en la posición {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decodifica el siguiente valor JSON completo."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise FhirFormatError("JSON truncado o inválido") from None
+                continue
+            # Un escalar al final del buffer podría continuar en el siguiente bloque
+            if end >= len(self.buf) and not self.eof and not isinstance(obj, (dict, list)):
+                if self._fill():
+                    continue
+            self.pos = end
+            return obj
+
+
+def iter_bundle_entries(fh) -> Iterator[Tuple[Optional[str], Dict]]:
+    """(fullUrl, recurso) de cada entry de un Bundle, leyendo por bloques."""
+    stream = _Stream(fh)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "entry":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.pos += 1
+            else:
+                while True:
+                    entry = stream.value()
+                    if isinstance(entry, dict) and isinstance(entry.get("resource"), dict):
+                        yield entry.get("fullUrl"), entry["resource"]
+                    sep = stream.peek()
+                    stream.pos += 1
+                    if sep == "]":
+                        break
+                    if sep != ",":
+                        raise FhirFormatError(f"Separador inesperado {sep!r} en entry")
+        else:
+            stream.value()  # resourceType, meta, type, total... (pequeños)
+        sep = stream.peek()
+        stream.pos += 1
+        if sep == "}":
+            return
+        if sep != ",":
+            raise FhirFormatError(f"Separador inesperado {sep!r} en el Bundle")
+
+
+def iter_ndjson_resources(fh) -> Iterator[Tuple[Optional[str], Dict]]:
+    """Recursos de un NDJSON; una línea que sea un Bundle se expande."""
+    for lineno, line in enumerate(fh, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as err:
+            raise FhirFormatError(f"Línea {lineno}: {err}") from None
+        if obj.get("resourceType") == "Bundle":
+            for entry in obj.get("entry") or ():
+                if isinstance(entry, dict) and isinstance(entry.get("resource"), dict):
+                    yield entry.get("fullUrl"), entry["resource"]
+            yield None, {"resourceType": "_BundleEnd"}
+        else:
+            yield None, obj
+
+
+def iter_resources(path: str) -> Iterator[Tuple[Optional[str], Dict]]:
+    """Recursos de un fichero Bundle JSON o NDJSON (según extensión; .gz admitido)."""
+    stem = path[:-3] if path.endswith(".gz") else path
+    with _open_text(path) as fh:
+        if stem.endswith((".ndjson", ".jsonl")):
+            yield from iter_ndjson_resources(fh)
+        else:
+            yield from iter_bundle_entries(fh)
+
+
+# ­Extracción de campos
+
+def _codings(concept) -> Iterator[Tuple[str, str]]:
+    if not isinstance(concept, dict):
+        return
+    for coding in concept.get("coding") or ():
+        if isinstance(coding, dict):
+            yield str(coding.get("system", "")), str(coding.get("code", ""))
+
+
+def _has_code(concept, system: str, codes) -> bool:
+    return any(s == system and c in codes for s, c in _codings(concept))
+
+
+def _timestamp(resource: Dict) -> float:
+    """Instante clínico del recurso (effective*/issued) como epoch; 0 si no consta."""
+    raw = resource.get("effectiveDateTime") or (resource.get("effectivePeriod") or {}).get("start") \
+        or resource.get("effectiveInstant") or resource.get("issued") or resource.get("recordedDate") \
+        or resource.get("onsetDateTime") or resource.get("dateAsserted") or resource.get("authoredOn")
+    if not raw:
+        return 0.0
+    raw = str(raw).replace("Z", "+00:00")
+    if "T" not in raw:
+        raw = raw[:10] + {4: "-01-01", 7: "-01"}.get(len(raw[:10]), "")  # fechas parciales
+    try:
+        dt = datetime.fromisoformat(raw)
+    except ValueError:
+        return 0.0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _quantity(value, units: Dict[str, float]) -> Optional[float]:
+    if not isinstance(value, dict) or value.get("value") is None:
+        return None
+    unit = str(value.get("code") or value.get("unit") or "").strip().lower()
+    factor = units.get(unit)
+    if factor is None:
+        return None
+    try:
+        return float(value["value"]) * factor
+    except (TypeError, ValueError):
+        return None
+
+
+def _reference_key(ref) -> Optional[str]:
+    if isinstance(ref, dict):
+        ref = ref.get("reference")
+    return str(ref) if ref else None
+
+
+def _parse_birth(raw) -> Optional[date]:
+    if not raw:
+        return None
+    parts = str(raw)[:10].split("-")
+    try:
+        year = int(parts[0])
+        month = int(parts[1]) if len(parts) > 1 else 7  # solo año: mitad del año
+        day = int(parts[2]) if len(parts) > 2 else 1
+        return date(year, month, day)
+    except (ValueError, IndexError):
+        return None
+
+
+class _PatientState:
+    """Estado mínimo acumulado por paciente (último valor de cada medida)."""
+
+    __slots__ = ("id", "sex", "birth", "sbp", "sbp_t", "tc", "tc_t", "hdl", "hdl_t",
+                 "smoker", "smoker_t", "diabetes", "treated", "med_refs")
+
+    def __init__(self):
+        self.id = None
+        self.sex = None
+        self.birth = None
+        self.sbp = self.tc = self.hdl = None
+        self.sbp_t = self.tc_t = self.hdl_t = self.smoker_t = -1.0
+        self.smoker = None
+        self.diabetes = False
+        self.treated = False
+        self.med_refs: Optional[List[str]] = None
+
+    def merge(self, other: "_PatientState") -> None:
+        self.id = self.id or other.id
+        self.sex = self.sex or other.sex
+        self.birth = self.birth or other.birth
+        for name in ("sbp", "tc", "hdl", "smoker"):
+            if getattr(other, name + "_t") > getattr(self, name + "_t") and getattr(other, name) is not None:
+                setattr(self, name, getattr(other, name))
+                setattr(self, name + "_t", getattr(other, name + "_t"))
+        self.diabetes = self.diabetes or other.diabetes
+        self.treated = self.treated or other.treated
+        if other.med_refs:
+            self.med_refs = (self.med_refs or []) + other.med_refs
+
+    def dumps(self) -> str:
+        values = [getattr(self, name) for name in self.__slots__]
+        values[2] = self.birth.isoformat() if self.birth else None
+        return json.dumps(values, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, text: str) -> "_PatientState":
+        state = cls()
+        for name, value in zip(cls.__slots__, json.loads(text)):
+            setattr(state, name, value)
+        state.birth = date.fromisoformat(state.birth) if state.birth else None
+        return state
+
+
+class _SpillStore:
+    """Estados de paciente volcados a disco (SQLite temporal, se borra al cerrar)."""
+
+    def __init__(self):
+        self.db = sqlite3.connect("")  # "" = base privada en un fichero temporal
+        self.db.execute("CREATE TABLE states (key TEXT PRIMARY KEY, state TEXT NOT NULL)")
+
+    def _get(self, key: str) -> Optional[_PatientState]:
+        row = self.db.execute("SELECT state FROM states WHERE key = ?", (key,)).fetchone()
+        return _PatientState.loads(row[0]) if row else None
+
+    def put(self, states: Dict[str, _PatientState]) -> None:
+        """Fusiona `states` con lo ya volcado."""
+        for key, state in states.items():
+            old = self._get(key)
+            if old is not None:
+                state.merge(old)
+            self.db.execute("INSERT OR REPLACE INTO states VALUES (?, ?)", (key, state.dumps()))
+        self.db.commit()
+
+    def alias(self, aliases: Dict[str, str]) -> None:
+        """Fusiona los estados guardados con la clave fullUrl en los de "Patient/<id>"."""
+        for alias, key in aliases.items():
+            other = self._get(alias)
+            if other is not None:
+                self.db.execute("DELETE FROM states WHERE key = ?", (alias,))
+                self.put({key: other})
+
+    def __iter__(self) -> Iterator[Tuple[str, _PatientState]]:
+        for key, text in self.db.execute("SELECT key, state FROM states ORDER BY rowid"):
+            yield key, _PatientState.loads(text)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class FhirAccumulator:
+    """Incorpora recursos FHIR uno a uno y produce pacientes en formato /calculate."""
+
+    def __init__(self, as_of: Optional[date] = None, region: str = "moderado",
+                 med_status: Sequence[str] = ACTIVE_MED_STATUS, max_in_memory: int = MAX_IN_MEMORY):
+        self.as_of = as_of or datetime.utcnow().date()
+        self.region = region
+        self.med_status = frozenset(med_status)
+        self.max_in_memory = max_in_memory
+        self._states: Dict[str, _PatientState] = {}
+        self._spill: Optional[_SpillStore] = None
+        self._aliases: Dict[str, str] = {}  # fullUrl urn:uuid → "Patient/<id>"
+        self._antihypertensive_meds: Dict[str, bool] = {}
+        self.resources = 0
+        self.skipped = 0
+
+    def _state(self, key: str) -> _PatientState:
+        key = self._aliases.get(key, key)
+        state = self._states.get(key)
+        if state is None:
+            if len(self._states) >= self.max_in_memory:
+                self._spill_states()
+            state = self._states[key] = _PatientState()
+        return state
+
+    def _spill_states(self) -> None:
+        if self._spill is None:
+            self._spill = _SpillStore()
+        states, self._states = self._states, {}
+        self._spill.put(states)
+
+    def _subject(self, resource: Dict) -> Optional[_PatientState]:
+        key = _reference_key(resource.get("subject") or resource.get("patient"))
+        if key is None:
+            self.skipped += 1
+            return None
+        return self._state(key)
+
+    def add(self, resource: Dict, full_url: Optional[str] = None) -> None:
+        self.resources += 1
+        rtype = resource.get("resourceType")
+        if rtype == "Patient":
+            self._add_patient(resource, full_url)
+        elif rtype == "Observation":
+            self._add_observation(resource)
+        elif rtype == "Condition":
+            self._add_condition(resource)
+        elif rtype in ("MedicationStatement", "MedicationRequest"):
+            self._add_medication(resource)
+        elif rtype == "Medication":
+            if resource.get("id"):
+                self._antihypertensive_meds[f"Medication/{resource['id']}"] = _is_antihypertensive(resource.get("code"))
+                if full_url:
+                    self._antihypertensive_meds[full_url] = self._antihypertensive_meds[f"Medication/{resource['id']}"]
+        else:
+            self.skipped += 1
+
+    def _add_patient(self, resource: Dict, full_url: Optional[str]) -> None:
+        key = f"Patient/{resource.get('id')}"
+        state = self._state(key)
+        if full_url and full_url != key:
+            other = self._states.pop(full_url, None)
+            self._aliases[full_url] = key
+            if other is not None:
+                state.merge(other)
+        state.id = resource.get("id")
+        gender = str(resource.get("gender", "")).lower()
+        state.sex = {"male": "hombre", "female": "mujer"}.get(gender)
+        state.birth = _parse_birth(resource.get("birthDate"))
+
+    def _add_observation(self, resource: Dict) -> None:
+        if resource.get("status") in _INACTIVE_STATUS:
+            self.skipped += 1
+            return
+        code = resource.get("code")
+        ts = _timestamp(resource)
+        sbp = None
+        if _has_code(code, LOINC, {LOINC_SBP}):
+            sbp = _quantity(resource.get("valueQuantity"), PRESSURE_UNITS)
+        elif _has_code(code, LOINC, LOINC_BP_PANELS):
+            for comp in resource.get("component") or ():
+                if _has_code(comp.get("code"), LOINC, {LOINC_SBP}):
+                    sbp = _quantity(comp.get("valueQuantity"), PRESSURE_UNITS)
+                    break
+        if sbp is not None:
+            self._update(resource, "sbp", sbp, ts)
+        elif _has_code(code, LOINC, {LOINC_TC}):
+            self._update(resource, "tc", _quantity(resource.get("valueQuantity"), LIPID_UNITS), ts)
+        elif _has_code(code, LOINC, {LOINC_HDL}):
+            self._update(resource, "hdl", _quantity(resource.get("valueQuantity"), LIPID_UNITS), ts)
+        elif _has_code(code, LOINC, {LOINC_SMOKING}):
+            concept = resource.get("valueCodeableConcept")
+            if concept is None:
+                self.skipped += 1
+                return
+            self._update(resource, "smoker", _has_code(concept, SNOMED, SMOKER_CODES), ts)
+        else:
+            self.skipped += 1
+
+    def _update(self, resource: Dict, name: str, value, ts: float) -> None:
+        if value is None:
+            self.skipped += 1  # unidad no reconocida o valor ausente
+            return
+        state = self._subject(resource)
+        if state is not None and ts >= getattr(state, name + "_t"):
+            setattr(state, name, value)
+            setattr(state, name + "_t", ts)
+
+    def _add_condition(self, resource: Dict) -> None:
+        clinical = {c for _s, c in _codings(resource.get("clinicalStatus"))}
+        verification = {c for _s, c in _codings(resource.get("verificationStatus"))}
+        if (clinical and not clinical & _ACTIVE_CLINICAL) or verification & {"refuted", "entered-in-error"}:
+            return
+        code = resource.get("code")
+        is_diabetes = _has_code(code, SNOMED, DIABETES_SNOMED) or any(
+            "icd-10" in s and c.upper().startswith(DIABETES_ICD10_PREFIXES) for s, c in _codings(code))
+        if is_diabetes:
+            state = self._subject(resource)
+            if state is not None:
+                state.diabetes = True
+
+    def _add_medication(self, resource: Dict) -> None:
+        if resource.get("status") not in self.med_status:
+            return
+        state = self._subject(resource)
+        if state is None:
+            return
+        if _is_antihypertensive(resource.get("medicationCodeableConcept")):
+            state.treated = True
+        else:
+            ref = _reference_key(resource.get("medicationReference"))
+            if ref:
+                state.med_refs = (state.med_refs or []) + [ref]
+
+    def _finish(self, key: str, state: _PatientState) -> Tuple[str, Dict, List[str]]:
+        if not state.treated and state.med_refs:
+            state.treated = any(self._antihypertensive_meds.get(r, False) for r in state.med_refs)
+        missing = []
+        if state.birth is None:
+            missing.append("fecha de nacimiento")
+        if state.sex is None:
+            missing.append("sexo")
+        for name, label in (("sbp", "PAS"), ("tc", "colesterol total"), ("hdl", "HDL")):
+            if getattr(state, name) is None:
+                missing.append(label)
+        patient = {}
+        if state.birth is not None:
+            b, ref = state.birth, self.as_of
+            patient["edad"] = ref.year - b.year - ((ref.month, ref.day) < (b.month, b.day))
+        if state.sex is not None:
+            patient["sexo"] = state.sex
+        for name, field in (("sbp", "presion_sistolica"), ("tc", "colesterol_total"), ("hdl", "hdl")):
+            value = getattr(state, name)
+            if value is not None:
+                patient[field] = round(value, 1)
+        patient.update(
+            tratamiento_hipertension=state.treated,
+            fumador=bool(state.smoker),
+            diabetes=state.diabetes,
+            region_riesgo=self.region,
+        )
+        return state.id or key, patient, [f"Falta {m}" for m in missing]
+
+    def end_bundle(self) -> None:
+        """Las referencias urn:uuid de un Bundle no salen de él: se resuelven y se olvidan."""
+        if self._spill is not None:
+            self._spill.alias(self._aliases)
+        self._aliases = {}
+
+    def drain(self) -> Iterator[Tuple[str, Dict, List[str]]]:
+        """(id, paciente, errores de extracción) de todos los pacientes acumulados; vacía el estado."""
+        if self._spill is None:
+            states, self._states = self._states, {}
+            self._aliases = {}
+            for key, state in states.items():
+                yield self._finish(key, state)
+            return
+        self._spill_states()
+        self.end_bundle()
+        spill, self._spill = self._spill, None
+        try:
+            for key, state in spill:
+                yield self._finish(key, state)
+        finally:
+            spill.close()
+
+    def __len__(self) -> int:
+        """Pacientes en memoria (sin contar los volcados a disco)."""
+        return len(self._states)
+
+
+def _is_antihypertensive(concept) -> bool:
+    return any(s == ATC and c.upper().startswith(ANTIHYPERTENSIVE_ATC_PREFIXES) for s, c in _codings(concept))
+
+
+def iter_fhir_patients(paths: Sequence[str], as_of: Optional[date] = None, region: str = "moderado",
+                       flush_each_bundle: bool = False, med_status: Sequence[str] = ACTIVE_MED_STATUS,
+                       max_in_memory: int = MAX_IN_MEMORY) -> Iterator[Tuple[str, Dict, List[str]]]:
+    """
+    Pacientes extraídos de uno o varios ficheros (p. ej. Patient.ndjson +
+    Observation.ndjson de un $export). Por defecto se entregan al final, ya
+    que un recurso puede aparecer en cualquier fichero; en memoria quedan a
+    lo sumo `max_in_memory` pacientes y el resto se vuelca a disco. Con
+    `flush_each_bundle` (NDJSON de Bundles por paciente, $everything) se
+    entregan al cerrar cada Bundle y la memoria queda acotada a uno.
+    """
+    acc = FhirAccumulator(as_of, region, med_status, max_in_memory)
+    for path in paths:
+        for full_url, resource in iter_resources(path):
+            if resource.get("resourceType") == "_BundleEnd":
+                if flush_each_bundle:
+                    yield from acc.drain()
+                else:
+                    acc.end_bundle()
+                continue
+            acc.add(resource, full_url)
+    yield from acc.drain()
+
+
+def iter_scored_chunks(paths: Sequence[str], chunk_rows: int = DEFAULT_CHUNK, workers: Optional[int] = 1,
+                       scales: Optional[Sequence[str]] = None, **kwargs) -> Iterator[List[Dict]]:
+    """
+    Registros de exportación ({"index": id, "patient", "result", "warnings",
+    "errors"}) en bloques de hasta `chunk_rows`; cada bloque se puntúa en
+    formato columnar (en paralelo si workers != 1).
+    """
+    scales = tuple(scales or SCALES)
+
+    def score(block: List[Dict]) -> List[Dict]:
+        valid = [rec for rec in block if not rec["errors"]]
+        if valid:
+            res = score_cohort_parallel(patients_to_columns(rec["patient"] for rec in valid),
+                                        workers=workers, scales=scales)
+            for i, rec in enumerate(valid):
+                for scale in scales:
+                    pct = res.percent[scale][i]
+                    if pct != pct:  # NaN: shard fallido
+                        rec["errors"].append(f"{scale}: error de cálculo")
+                    else:
+                        rec["result"][scale] = {"percent": pct, "category": CATEGORY_LABELS[res.category[scale][i]]}
+        return block
+
+    block: List[Dict] = []
+    for pid, patient, errors in iter_fhir_patients(paths, **kwargs):
+        warnings: List[str] = []
+        if not errors:
+            ok, messages = validate_patient_data(patient)
+            if ok:
+                warnings = messages
+            else:
+                errors = messages
+        block.append({"index": pid, "patient": patient, "result": {}, "warnings": warnings, "errors": errors})
+        if len(block) >= chunk_rows:
+            yield score(block)
+            block = []
+    if block:
+        yield score(block)
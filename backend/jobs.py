@@ -0,0 +1,357 @@
+"""
+Trabajos asíncronos de cohortes: subida, proceso por bloques y progreso
+
+Una subida grande (CSV o JSON) se guarda y se encola como trabajo; la
+petición responde enseguida con el id. Un número acotado de hilos de trabajo
+(`max_running`) procesa los trabajos en bloques de `chunk_rows` pacientes;
+el cálculo de cada bloque se hace en un pool de procesos compartido
+(`processes`, 0 = en el propio hilo), así el trabajo de CPU no compite por el
+GIL con las peticiones interactivas. Cada bloque terminado se añade en orden
+a un fichero JSON Lines, de modo que los resultados parciales se pueden
+descargar mientras el trabajo sigue en marcha.
+
+Estados: queued → running → done | failed | cancelled. Los trabajos
+terminados se borran (con sus ficheros) pasado `ttl` segundos.
+
+Configuración por entorno (ver jobs_from_env):
+    CARDIORISK_JOBS      "en_marcha,procesos,filas_por_bloque,en_cola" (por defecto "2,1,2000,16")
+    CARDIORISK_JOBS_DIR  directorio de subidas y resultados (por defecto uno temporal)
+"""
+
+import csv
+import json
+import os
+import queue
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from .cohort_store import iter_csv_patients  # type: ignore
+except ImportError:
+    from cohort_store import iter_csv_patients
+
+STATES = ("queued", "running", "done", "failed", "cancelled")
+TERMINAL = ("done", "failed", "cancelled")
+
+# score_chunk(method, índice inicial, pacientes) -> (registros, extras por registro).
+# Debe ser una función de módulo (se envía por pickle a los procesos del pool).
+ChunkScorer = Callable[[str, int, Sequence], Tuple[List[Dict], List]]
+
+
+class JobQueueFull(Exception):
+    """Hay demasiados trabajos en cola; reintentar más tarde."""
+
+
+class Job:
+    __slots__ = ("id", "method", "source", "source_kind", "delimiter", "results_path", "state", "error",
+                 "rows_total", "rows_done", "rows_invalid", "chunks_done", "bytes_done",
+                 "created", "started", "finished", "cancel_requested", "seq", "_cond")
+
+    def __init__(self, job_id: str, method: str, source, source_kind: str, results_path: str,
+                 delimiter: str = ","):
+        self.id = job_id
+        self.method = method
+        self.source = source  # ruta del CSV subido o lista de pacientes (JSON)
+        self.source_kind = source_kind  # "csv" | "json"
+        self.delimiter = delimiter
+        self.results_path = results_path
+        self.state = "queued"
+        self.error: Optional[str] = None
+        self.rows_total: Optional[int] = None
+        self.rows_done = 0
+        self.rows_invalid = 0
+        self.chunks_done = 0
+        self.bytes_done = 0  # bytes de resultados completos (descargables)
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancel_requested = False
+        self.seq = 0  # cambia con cada actualización (SSE)
+        self._cond = threading.Condition()
+
+    def _touch(self, **changes) -> None:
+        with self._cond:
+            for key, value in changes.items():
+                setattr(self, key, value)
+            self.seq += 1
+            self._cond.notify_all()
+
+    def _start(self) -> bool:
+        """queued → running (False si se canceló mientras esperaba)."""
+        with self._cond:
+            if self.state != "queued":
+                return False
+            self.state, self.started = "running", time.time()
+            self.seq += 1
+            self._cond.notify_all()
+            return True
+
+    def _request_cancel(self) -> None:
+        with self._cond:
+            if self.state in TERMINAL:
+                return
+            self.cancel_requested = True
+            if self.state == "queued":
+                self.state, self.finished = "cancelled", time.time()
+            self.seq += 1
+            self._cond.notify_all()
+
+    def wait_change(self, seq: int, timeout: float) -> int:
+        """Espera a que cambie el estado (o timeout); devuelve el seq actual."""
+        with self._cond:
+            if self.seq == seq and self.state not in TERMINAL:
+                self._cond.wait(timeout)
+            return self.seq
+
+    def status(self) -> Dict:
+        with self._cond:
+            now = self.finished or time.time()
+            elapsed = now - self.started if self.started else 0.0
+            rate = self.rows_done / elapsed if elapsed > 0 and self.rows_done else None
+            eta = None
+            if self.state == "running" and rate and self.rows_total is not None:
+                eta = round(max(0, self.rows_total - self.rows_done) / rate, 1)
+            return {
+                "id": self.id,
+                "method": self.method,
+                "state": self.state,
+                "error": self.error,
+                "rows_total": self.rows_total,
+                "rows_done": self.rows_done,
+                "rows_invalid": self.rows_invalid,
+                "progress": (round(self.rows_done / self.rows_total, 4)
+                             if self.rows_total else (1.0 if self.state == "done" else 0.0)),
+                "elapsed_s": round(elapsed, 2),
+                "rows_per_s": round(rate, 1) if rate else None,
+                "eta_s": eta,
+                "created": self.created,
+                "seq": self.seq,
+            }
+
+
+def _count_csv_rows(path: str, delimiter: str) -> int:
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        return max(0, sum(1 for _ in csv.reader(fh, delimiter=delimiter)) - 1)
+
+
+class JobManager:
+    """Cola acotada de trabajos + `max_running` hilos + pool de procesos compartido."""
+
+    def __init__(self, score_chunk: ChunkScorer, on_chunk: Optional[Callable] = None, max_running: int = 2,
+                 processes: int = 1, chunk_rows: int = 2000, max_queued: int = 16,
+                 directory: Optional[str] = None, ttl: float = 3600.0):
+        self.score_chunk = score_chunk
+        self.on_chunk = on_chunk  # on_chunk(job, registros, extras) en el proceso principal (auditoría)
+        self.max_running = max(1, max_running)
+        self.processes = max(0, processes)
+        self.chunk_rows = max(1, chunk_rows)
+        self.ttl = ttl
+        self.directory = directory or tempfile.mkdtemp(prefix="cardiorisk-jobs-")
+        os.makedirs(self.directory, exist_ok=True)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue(max(1, max_queued))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                         for i in range(self.max_running)]
+        for thread in self._threads:
+            thread.start()
+
+    # ­Alta y consulta
+
+    def _new_id(self) -> str:
+        # El id es la única credencial del trabajo: solo lo recibe quien lo envía
+        return secrets.token_urlsafe(24)
+
+    def submit_csv(self, method: str, stream, delimiter: str = ",") -> Job:
+        """Copia el CSV (objeto de fichero binario) al directorio de trabajos y lo encola."""
+        job_id = self._new_id()
+        path = os.path.join(self.directory, f"{job_id}.csv")
+        with open(path, "wb") as fh:
+            shutil.copyfileobj(stream, fh, 1 << 20)
+        return self._enqueue(Job(job_id, method, path, "csv", self._results_path(job_id), delimiter))
+
+    def submit_patients(self, method: str, patients: List) -> Job:
+        job_id = self._new_id()
+        job = Job(job_id, method, patients, "json", self._results_path(job_id))
+        job.rows_total = len(patients)
+        return self._enqueue(job)
+
+    def _results_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.jsonl")
+
+    def _enqueue(self, job: Job) -> Job:
+        self.purge_expired()
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._forget(job)
+            raise JobQueueFull(f"Demasiados trabajos en cola (máximo {self._queue.maxsize})") from None
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.status() for job in sorted(jobs, key=lambda j: j.created)]
+
+    def cancel(self, job: Job) -> None:
+        """Pide la cancelación; los bloques ya terminados siguen descargables."""
+        job._request_cancel()
+
+    def delete(self, job: Job) -> None:
+        """Olvida un trabajo terminado y borra sus ficheros."""
+        self._forget(job)
+
+    def _forget(self, job: Job) -> None:
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        paths = [job.results_path] + ([job.source] if job.source_kind == "csv" else [])
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def purge_expired(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [j for j in self._jobs.values()
+                       if j.state in TERMINAL and j.finished and now - j.finished > self.ttl]
+        for job in expired:
+            self._forget(job)
+
+    def iter_results(self, job: Job) -> Iterator[Dict]:
+        """Registros ya completados (en orden), hasta el último bloque terminado."""
+        limit = job.bytes_done
+        if not limit:
+            return
+        with open(job.results_path, "rb") as fh:
+            read = 0
+            for line in fh:
+                read += len(line)
+                if read > limit:
+                    break
+                yield json.loads(line)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            states = [j.state for j in self._jobs.values()]
+        return {
+            "max_running": self.max_running,
+            "processes": self.processes,
+            "chunk_rows": self.chunk_rows,
+            "max_queued": self._queue.maxsize,
+            "queued": self._queue.qsize(),
+            "jobs": {state: states.count(state) for state in STATES},
+        }
+
+    # ­Proceso
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if not self.processes:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            return self._pool
+
+    def _source_chunks(self, job: Job) -> Iterator[Tuple[int, List]]:
+        if job.source_kind == "csv":
+            rows = iter_csv_patients(job.source, job.delimiter)
+        else:
+            rows = iter(job.source)
+        start = 0
+        while True:
+            chunk = list(islice(rows, self.chunk_rows))
+            if not chunk:
+                return
+            yield start, chunk
+            start += len(chunk)
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if not job._start():  # cancelado mientras esperaba
+                continue
+            try:
+                self._run(job)
+            except Exception as err:
+                job._touch(state="failed", error=f"{type(err).__name__}: {err}", finished=time.time())
+            else:
+                job._touch(state="cancelled" if job.cancel_requested else "done", finished=time.time())
+            finally:
+                if job.source_kind == "json":
+                    job.source = []  # libera la memoria de la subida
+
+    def _run(self, job: Job) -> None:
+        if job.rows_total is None:
+            job._touch(rows_total=_count_csv_rows(job.source, job.delimiter))
+        pool = self._executor()
+        in_flight: deque = deque()
+        chunks = self._source_chunks(job)
+        with open(job.results_path, "ab") as out:
+            while True:
+                # Mantiene hasta `processes` bloques en curso por trabajo
+                while not job.cancel_requested and len(in_flight) < max(1, self.processes):
+                    nxt = next(chunks, None)
+                    if nxt is None:
+                        break
+                    start, patients = nxt
+                    if pool is None:
+                        in_flight.append(self.score_chunk(job.method, start, patients))
+                    else:
+                        in_flight.append(pool.submit(self.score_chunk, job.method, start, patients))
+                if not in_flight:
+                    return
+                item = in_flight.popleft()
+                if job.cancel_requested:
+                    if pool is not None:
+                        item.cancel()
+                    continue
+                records, extras = item if pool is None else item.result()
+                if self.on_chunk is not None:
+                    self.on_chunk(job, records, extras)
+                out.write(b"".join(
+                    json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                    for rec in records
+                ))
+                out.flush()
+                job._touch(
+                    rows_done=job.rows_done + len(records),
+                    rows_invalid=job.rows_invalid + sum(1 for rec in records if rec.get("errors")),
+                    chunks_done=job.chunks_done + 1,
+                    bytes_done=out.tell(),
+                )
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def jobs_from_env(score_chunk: ChunkScorer, on_chunk: Optional[Callable] = None) -> JobManager:
+    """JobManager según CARDIORISK_JOBS="en_marcha,procesos,filas_por_bloque,en_cola" y CARDIORISK_JOBS_DIR."""
+    values = [2, 1, 2000, 16]
+    raw = os.environ.get("CARDIORISK_JOBS", "")
+    for i, part in enumerate(p.strip() for p in raw.split(",")):
+        if i < len(values) and part:
+            values[i] = int(part)
+    max_running, processes, chunk_rows, max_queued = values
+    return JobManager(score_chunk, on_chunk, max_running=max_running, processes=processes,
+                      chunk_rows=chunk_rows, max_queued=max_queued,
+                      directory=os.environ.get("CARDIORISK_JOBS_DIR") or None)
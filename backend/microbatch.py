@@ -0,0 +1,176 @@
+"""
+Micro-batching adaptativo de cálculos de un solo paciente
+
+Las peticiones concurrentes se encolan y una de ellas (la "líder") evalúa el
+lote completo mientras las demás esperan su resultado. El lote se recorre
+paciente a paciente (no hay un núcleo vectorizado): lo que se ahorra es la
+contención del GIL entre hilos y el cálculo repetido de pacientes idénticos
+del mismo lote. Con ~25 µs por paciente la ganancia es pequeña y por eso
+está desactivado por defecto.
+
+La ventana es adaptativa: el lote objetivo es el tamaño medio de los lotes
+recientes, y la líder solo espera (como mucho `max_wait`) a que se complete
+si el intervalo medio entre llegadas es menor que la ventana. Con tráfico
+bajo o secuencial el objetivo es 1 y se evalúa de inmediato, sin latencia
+añadida. Tras cada lote el liderazgo pasa a la primera petición pendiente,
+de modo que ninguna espera más de un lote extra.
+
+Se activa con CARDIORISK_MICROBATCH="espera_ms,lote_max" (p. ej. "1,256").
+"""
+
+import copy
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+_EWMA_ALPHA = 0.2
+
+
+class _Pending:
+    __slots__ = ("item", "result", "error", "event", "lead")
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.event = threading.Event()
+        self.lead = False
+
+
+class MicroBatcher:
+    """Agrupa llamadas concurrentes a `evaluate_batch(items) -> [resultado | excepción]`."""
+
+    def __init__(self, evaluate_batch: Callable[[Sequence[Any]], List[Any]],
+                 max_wait: float = 0.001, max_batch: int = 256):
+        self.evaluate_batch = evaluate_batch
+        self.max_wait = max(0.0, max_wait)
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._pending: List[_Pending] = []
+        self._leader = False
+        self._arrived = threading.Condition(self._lock)
+        self._last_arrival: Optional[float] = None
+        self._gap_ewma: Optional[float] = None
+        self._batch_ewma = 1.0
+        self.batches = 0
+        self.items = 0
+        self.waited_batches = 0
+        self.max_seen = 0
+
+    def submit(self, item) -> Any:
+        req = _Pending(item)
+        with self._lock:
+            now = time.monotonic()
+            if self._last_arrival is not None:
+                gap = now - self._last_arrival
+                self._gap_ewma = gap if self._gap_ewma is None else (
+                    (1 - _EWMA_ALPHA) * self._gap_ewma + _EWMA_ALPHA * gap)
+            self._last_arrival = now
+            self._pending.append(req)
+            if not self._leader:
+                self._leader = req.lead = True
+            else:
+                self._arrived.notify()
+        if not req.lead:
+            req.event.wait()
+        if req.lead:
+            self._run_batch(req)
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _run_batch(self, leader: _Pending) -> None:
+        with self._lock:
+            target = min(self.max_batch, int(round(self._batch_ewma)))
+            busy = (target > 1 and len(self._pending) < target
+                    and self._gap_ewma is not None and self._gap_ewma < self.max_wait)
+            if busy:
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < target:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._arrived.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+        try:
+            outcomes = self.evaluate_batch([r.item for r in batch])
+        except Exception as err:  # fallo global del lote: se propaga a todos
+            outcomes = [err] * len(batch)
+        for req, outcome in zip(batch, outcomes):
+            if isinstance(outcome, Exception):
+                req.error = outcome
+            else:
+                req.result = outcome
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.waited_batches += bool(busy)
+            self.max_seen = max(self.max_seen, len(batch))
+            self._batch_ewma = (1 - _EWMA_ALPHA) * self._batch_ewma + _EWMA_ALPHA * len(batch)
+            # Traspaso del liderazgo: la siguiente pendiente evaluará el próximo lote
+            if self._pending:
+                nxt = self._pending[0]
+                nxt.lead = True
+                nxt.event.set()
+            else:
+                self._leader = False
+        for req in batch:
+            if req is not leader:
+                req.event.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_wait_ms": self.max_wait * 1000,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch": round(self.items / self.batches, 2) if self.batches else None,
+                "max_batch_seen": self.max_seen,
+                "waited_batches": self.waited_batches,
+                "pending": len(self._pending),
+                "arrival_gap_ms": round(self._gap_ewma * 1000, 3) if self._gap_ewma is not None else None,
+            }
+
+
+def dedup_evaluate(evaluate_one: Callable[[Dict], Any]) -> Callable[[Sequence[Dict]], List[Any]]:
+    """Adapta una función por paciente a lotes: los pacientes idénticos del lote
+    se evalúan una vez; las excepciones se devuelven en su posición. Cada
+    repetición recibe su propia copia del resultado, que el llamador puede
+    modificar (percentiles, respuesta) sin afectar a las demás.
+    """
+    def evaluate_batch(patients: Sequence[Dict]) -> List[Any]:
+        seen: Dict[Any, Any] = {}
+        out = []
+        for patient in patients:
+            try:
+                key = tuple(sorted(patient.items()))
+                hash(key)
+            except TypeError:
+                key = None
+            if key is not None and key in seen:
+                cached = seen[key]
+                out.append(cached if isinstance(cached, Exception) else copy.deepcopy(cached))
+                continue
+            try:
+                value = evaluate_one(patient)
+            except Exception as err:
+                value = err
+            if key is not None:
+                seen[key] = value
+            out.append(value)
+        return out
+    return evaluate_batch
+
+
+def batcher_from_env(evaluate_batch: Callable[[Sequence[Any]], List[Any]]) -> Optional[MicroBatcher]:
+    """MicroBatcher según CARDIORISK_MICROBATCH="espera_ms,lote_max", o None si no está definido."""
+    raw = os.environ.get("CARDIORISK_MICROBATCH")
+    if not raw:
+        return None
+    parts = [p.strip() for p in raw.split(",")]
+    wait_ms = float(parts[0]) if parts and parts[0] else 1.0
+    max_batch = int(parts[1]) if len(parts) > 1 and parts[1] else 256
+    return MicroBatcher(evaluate_batch, wait_ms / 1000.0, max_batch)
@@ -0,0 +1,70 @@
+"""
+Paquete de especificación de modelos (coeficientes, clamps y categorías)
+para evaluar las escalas en el cliente con el mismo resultado que el servidor
+"""
+
+from functools import lru_cache
+from typing import Dict
+
+try:
+    from . import calculators  # type: ignore
+    from .score2_tables import get_score2_tables  # type: ignore
+    from .score2_official import official_coefficients_spec  # type: ignore
+    from .validators import RANGES  # type: ignore
+except ImportError:
+    import calculators
+    from score2_tables import get_score2_tables
+    from score2_official import official_coefficients_spec
+    from validators import RANGES
+
+SPEC_FORMAT = 2
+
+
+@lru_cache(maxsize=1)
+def build_model_spec() -> Dict:
+    """
+    Serializa todas las escalas en un único dict JSON, versionado con
+    MODEL_VERSION. SCORE2 declara en "paths" las rutas activas en este
+    proceso, en orden de prioridad, para que el cliente siga la misma cadena
+    (tablas → coeficientes oficiales → modelo continuo).
+    """
+    has_tables = callable(calculators.score2_lookup_from_tables)
+    has_official = callable(calculators.score2_risk_official)
+    paths = (["tables"] if has_tables else []) + (["official"] if has_official else []) + ["surrogate"]
+
+    return {
+        "format": SPEC_FORMAT,
+        "version": calculators.MODEL_VERSION,
+        "framingham": {
+            "men": calculators.FR_MEN,
+            "women": calculators.FR_WOMEN,
+            "ln_floor": 1e-6,
+            "max_pct": 100.0,
+        },
+        "acc_aha": {
+            "men": calculators.ACC_AHA_WHITE_M,
+            "women": calculators.ACC_AHA_WHITE_F,
+            "clamps": calculators.ACC_AHA_CLAMPS,
+            "max_pct": 100.0,
+        },
+        "score2": {
+            "paths": paths,
+            "region_map": calculators.SCORE2_REGION_MAP,
+            "mg_per_mmol": calculators.MG_DL_PER_MMOL_L,
+            "surrogate": {
+                "coefficients": calculators.SCORE2_SURROGATE,
+                "region_scale": calculators.SCORE2_REGION_SCALE,
+                "clamps": calculators.SCORE2_CLAMPS,
+                "max_pct": 50.0,
+            },
+            "tables": get_score2_tables() if has_tables else None,
+            "official": official_coefficients_spec() if has_official else None,
+        },
+        "categories": calculators.CATEGORY_RULES,
+        # Mismas reglas que validators.validate_patient_data
+        "validation": {
+            "ranges": RANGES,
+            "sexes": ["hombre", "mujer"],
+            "flags": ["fumador", "diabetes", "tratamiento_hipertension"],
+        },
+    }
@@ -0,0 +1,166 @@
+"""
+Puntuación de cohortes en paralelo por shards (multiprocessing, sin numpy)
+
+Las columnas de entrada se copian una vez a memoria compartida
+(multiprocessing.shared_memory); cada worker se adjunta por nombre y lee su
+rango de filas sin copiarlo. Los resultados se escriben directamente en
+arrays de salida compartidos y preasignados, por lo que la salida queda en el
+orden original sin paso de ensamblado. Un fallo en un shard no afecta a los
+demás: sus filas quedan en NaN y el error se informa por shard.
+"""
+
+import math
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .columnar import SCALES, SCHEMA, column_length, score_columns  # type: ignore
+except ImportError:
+    from columnar import SCALES, SCHEMA, column_length, score_columns
+
+DEFAULT_SHARD_ROWS = 20_000
+NO_CATEGORY = 255  # código de categoría de filas sin resultado
+
+
+@dataclass
+class ShardError:
+    start: int
+    stop: int
+    error: str
+
+
+@dataclass
+class ParallelResult:
+    """Salida en el orden de entrada: percent (float64, NaN si falló) y código de categoría."""
+    percent: Dict[str, array]
+    category: Dict[str, array]
+    errors: List[ShardError] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+# Estado por proceso worker (inicializado una vez por proceso)
+_WORKER: Dict = {}
+
+
+def _layout(n: int, scales: Sequence[str]) -> Tuple[List[Tuple[str, str, int]], int]:
+    """Offsets en el segmento compartido: columnas de entrada y luego salidas."""
+    entries, offset = [], 0
+    specs = [(f"in:{name}", code) for name, code in SCHEMA]
+    specs += [(f"pct:{s}", "d") for s in scales] + [(f"cat:{s}", "B") for s in scales]
+    for name, code in specs:
+        size = array(code).itemsize
+        offset = (offset + 7) // 8 * 8  # alineación a 8 bytes para cast()
+        entries.append((name, code, offset))
+        offset += size * n
+    return entries, max(offset, 1)
+
+
+def _views(buf, layout: List[Tuple[str, str, int]], n: int) -> Dict[str, memoryview]:
+    views = {}
+    for name, code, offset in layout:
+        size = array(code).itemsize
+        views[name] = buf[offset:offset + size * n].cast(code)
+    return views
+
+
+def _init_worker(shm_name: str, n: int, scales: Tuple[str, ...]) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    layout, _size = _layout(n, scales)
+    _WORKER.update(shm=shm, n=n, scales=scales, views=_views(shm.buf, layout, n))
+
+
+def _score_shard(start: int, stop: int) -> Tuple[int, int, Optional[str]]:
+    views, scales = _WORKER["views"], _WORKER["scales"]
+    columns = {name: views[f"in:{name}"] for name, _code in SCHEMA}
+    try:
+        scored = score_columns(columns, start, stop, scales)
+    except Exception as err:  # aislamiento: el shard se informa y el resto sigue
+        return start, stop, f"{type(err).__name__}: {err}"
+    for scale in scales:
+        pct, cat = scored[scale]
+        views[f"pct:{scale}"][start:stop] = pct
+        views[f"cat:{scale}"][start:stop] = cat
+    return start, stop, None
+
+
+def score_cohort_parallel(columns: Mapping[str, Sequence], workers: Optional[int] = None,
+                          shard_rows: int = DEFAULT_SHARD_ROWS,
+                          scales: Sequence[str] = SCALES) -> ParallelResult:
+    """
+    Puntúa una cohorte columnar (ver columnar.SCHEMA) con un pool de procesos.
+    `workers` por defecto = número de CPUs; con workers=1 se evalúa en el
+    proceso actual (misma salida, sin memoria compartida).
+    """
+    n = column_length(columns)
+    scales = tuple(scales)
+    workers = max(1, workers or os.cpu_count() or 1)
+    shards = [(start, min(start + shard_rows, n)) for start in range(0, n, shard_rows)]
+
+    if workers == 1 or len(shards) <= 1:
+        return _score_in_process(columns, shards, scales)
+
+    layout, size = _layout(n, scales)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    views: Dict[str, memoryview] = {}
+    try:
+        views = _views(shm.buf, layout, n)
+        for name, code in SCHEMA:
+            views[f"in:{name}"][:] = array(code, columns[name])
+        for scale in scales:
+            views[f"pct:{scale}"][:] = array("d", [math.nan]) * n
+            views[f"cat:{scale}"][:] = array("B", [NO_CATEGORY]) * n
+
+        errors: List[ShardError] = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, n, scales)) as pool:
+            futures = {pool.submit(_score_shard, start, stop): (start, stop) for start, stop in shards}
+            for fut in as_completed(futures):
+                start, stop = futures[fut]
+                try:
+                    _s, _e, error = fut.result()
+                except Exception as err:  # p. ej. el worker murió
+                    error = f"{type(err).__name__}: {err}"
+                if error:
+                    errors.append(ShardError(start, stop, error))
+
+        return ParallelResult(
+            percent={s: array("d", views[f"pct:{s}"]) for s in scales},
+            category={s: array("B", views[f"cat:{s}"]) for s in scales},
+            errors=sorted(errors, key=lambda e: e.start),
+        )
+    finally:
+        # Sin vistas vivas close() no falla; si aun así lo hiciera, no debe
+        # ocultar la excepción original ni impedir el unlink del segmento
+        for view in views.values():
+            view.release()
+        try:
+            shm.close()
+        except BufferError:
+            pass
+        shm.unlink()
+
+
+def _score_in_process(columns: Mapping[str, Sequence], shards: List[Tuple[int, int]],
+                      scales: Tuple[str, ...]) -> ParallelResult:
+    n = column_length(columns)
+    result = ParallelResult(
+        percent={s: array("d", [math.nan]) * n for s in scales},
+        category={s: array("B", [NO_CATEGORY]) * n for s in scales},
+    )
+    for start, stop in shards:
+        try:
+            scored = score_columns(columns, start, stop, scales)
+        except Exception as err:
+            result.errors.append(ShardError(start, stop, f"{type(err).__name__}: {err}"))
+            continue
+        for scale in scales:
+            result.percent[scale][start:stop] = scored[scale][0]
+            result.category[scale][start:stop] = scored[scale][1]
+    return result
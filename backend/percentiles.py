@@ -0,0 +1,178 @@
+"""
+Índice de percentiles de riesgo respecto a una población de referencia
+
+Para cada escala, sexo y banda de edad de 10 años (y región en SCORE2) se
+guarda la distribución de porcentajes de una cohorte de referencia como
+pares (valor, recuento acumulado). Todas las escalas redondean a 0.1 pp,
+así que la distribución se guarda exacta y en poco espacio. El percentil
+de un paciente es su rango medio dentro de su grupo: (n_menores + n_iguales
+/ 2) / n. Se obtiene con una búsqueda binaria (bisect) sobre los valores
+del grupo.
+
+El índice se construye fuera de línea (scripts/build_percentiles.py) y se
+carga una sola vez. Lleva el MODEL_VERSION con el que se construyó; si no
+coincide con el de los coeficientes actuales se ignora y los resultados
+salen sin percentil.
+
+Fichero: CARDIORISK_PERCENTILES_PATH, o backend/risk_percentiles.json solo si
+se construyó con una cohorte real: un índice sintético no se carga por
+defecto (los pacientes no deben compararse con una población inventada).
+"""
+
+import hashlib
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .calculators import MODEL_VERSION  # type: ignore
+    from .cohort_stats import age_band  # type: ignore
+    from .columnar import REGION_CODES, SEX_CODES, column_length, encode_region, encode_sex  # type: ignore
+except ImportError:
+    from calculators import MODEL_VERSION
+    from cohort_stats import age_band
+    from columnar import REGION_CODES, SEX_CODES, column_length, encode_region, encode_sex
+
+FORMAT_VERSION = 1
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_percentiles.json")
+MIN_GROUP = 200  # grupos más pequeños no dan percentil
+REGIONAL_SCALES = ("score",)  # escalas cuyo grupo de referencia incluye la región
+
+
+def group_key(scale: str, sex: str, age: float, region: str) -> str:
+    key = f"{scale}|{sex}|{age_band(age)}"
+    return f"{key}|{region}" if scale in REGIONAL_SCALES else key
+
+
+def build_index(columns: Mapping[str, Sequence], scored: Mapping[str, Tuple[Sequence, Sequence]],
+                source: Optional[str] = None, model_version: str = MODEL_VERSION,
+                synthetic: bool = False) -> Dict:
+    """
+    Índice serializable a partir de columnas (columnar.SCHEMA) y de la salida
+    {escala: (percent, categoría)} de score_columns / score_cohort_parallel.
+    Las filas con percent NaN (shards fallidos) se omiten.
+    """
+    counts: Dict[str, Counter] = {}
+    n = column_length(columns)
+    ages, sexes, regions = columns["edad"], columns["sexo"], columns["region_riesgo"]
+    for scale, (pct, _cat) in scored.items():
+        for i in range(n):
+            value = pct[i]
+            if value != value:
+                continue
+            key = group_key(scale, SEX_CODES[sexes[i]], ages[i], REGION_CODES[regions[i]])
+            counts.setdefault(key, Counter())[int(round(value * 10))] += 1
+    groups = {}
+    for key in sorted(counts):
+        tenths = sorted(counts[key])
+        cum, total = [], 0
+        for t in tenths:
+            total += counts[key][t]
+            cum.append(total)
+        groups[key] = {"n": total, "tenths": tenths, "cum": cum}
+    return {
+        "format": FORMAT_VERSION,
+        "model_version": model_version,
+        "rows": n,
+        "source": source,
+        "synthetic": synthetic,
+        "created": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "age_bands": "10 años",
+        "regional_scales": list(REGIONAL_SCALES),
+        "groups": groups,
+    }
+
+
+def write_index(index: Mapping, path: str = DEFAULT_PATH) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(index, fh, ensure_ascii=False, separators=(",", ":"))
+
+
+class PercentileIndex:
+    """Índice cargado: por grupo, valores en décimas (ordenados) y recuentos acumulados."""
+
+    def __init__(self, data: Mapping):
+        self.model_version = data.get("model_version")
+        self.source = data.get("source")
+        self.synthetic = bool(data.get("synthetic")) or str(self.source or "").startswith("synthetic:")
+        self.rows = data.get("rows")
+        self._groups: Dict[str, Tuple[array, array, int]] = {}
+        for key, g in data.get("groups", {}).items():
+            self._groups[key] = (array("l", g["tenths"]), array("q", g["cum"]), int(g["n"]))
+        canonical = json.dumps(data.get("groups", {}), sort_keys=True, separators=(",", ":"))
+        # Versión del índice: cambia el ETag de /risk si se reconstruye con otra referencia
+        self.version = hashlib.sha256(f"{self.model_version}\n{canonical}".encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH, model_version: str = MODEL_VERSION) -> Optional["PercentileIndex"]:
+        """Índice del fichero, o None si falta, es inválido o es de otra versión de coeficientes."""
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("format") != FORMAT_VERSION:
+            return None
+        if data.get("model_version") != model_version:
+            return None
+        return cls(data)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def percentile_of(self, key: str, percent: float) -> Optional[float]:
+        """Rango medio (0–100, una décima) de `percent` en el grupo `key`."""
+        group = self._groups.get(key)
+        if group is None:
+            return None
+        tenths, cum, n = group
+        if n < MIN_GROUP:
+            return None
+        t = int(round(percent * 10))
+        idx = bisect_left(tenths, t)
+        below = cum[idx - 1] if idx else 0
+        equal = cum[idx] - below if idx < len(tenths) and tenths[idx] == t else 0
+        return round(100.0 * (below + equal / 2) / n, 1)
+
+    def percentile(self, scale: str, patient: Mapping, percent: float) -> Optional[float]:
+        """Percentil de un paciente (dict de /calculate) entre los de su sexo, edad y región."""
+        try:
+            sex = SEX_CODES[encode_sex(patient.get("sexo", "hombre"))]
+            region = REGION_CODES[encode_region(patient.get("region_riesgo", "moderado"))]
+            key = group_key(scale, sex, float(patient["edad"]), region)
+        except (KeyError, TypeError, ValueError):
+            return None
+        return self.percentile_of(key, percent)
+
+    def annotate(self, result: Dict, patient: Mapping) -> Dict:
+        """Añade "percentile" a cada escala del resultado (None si no hay grupo de referencia)."""
+        for scale, entry in result.items():
+            if isinstance(entry, dict) and "percent" in entry:
+                entry["percentile"] = self.percentile(scale, patient, entry["percent"])
+        return result
+
+
+_LOCK = threading.Lock()
+_LOADED: Dict[str, Optional[PercentileIndex]] = {}
+
+
+def get_percentile_index(path: Optional[str] = None) -> Optional[PercentileIndex]:
+    """
+    Índice cargado una sola vez por ruta. Sin `path` se usa
+    CARDIORISK_PERCENTILES_PATH; si no está definida, DEFAULT_PATH solo si el
+    índice no es sintético.
+    """
+    explicit = path or os.environ.get("CARDIORISK_PERCENTILES_PATH")
+    path = explicit or DEFAULT_PATH
+    with _LOCK:
+        if path not in _LOADED:
+            _LOADED[path] = PercentileIndex.load(path)
+        index = _LOADED[path]
+    if index is not None and index.synthetic and not explicit:
+        return None
+    return index
@@ -0,0 +1,259 @@
+"""
+Recalibración de la línea base a una cohorte local con resultados observados
+
+Las tres escalas tienen la forma riesgo = 1 − S0^exp(L − media), con L el
+índice lineal del paciente. Se conservan los coeficientes (la
+discriminación) y, por escala y sexo, se reajustan:
+- la media del índice lineal: media de L en la cohorte local;
+- S0: máxima verosimilitud del resultado binario a 10 años. Con
+  θ = ln(−ln S0) el modelo es un GLM binomial con enlace cloglog, offset
+  L − media y solo el intercepto θ. Se resuelve por Newton. Las filas sin
+  evento contribuyen solo con e^θ·Σexp(x), que se acumula una vez, así que
+  cada iteración recorre únicamente las filas con evento.
+
+En SCORE2 (modelo continuo) S0 se ajusta con la región de referencia
+(moderada, escala 1.0). La escala de cada región presente se estima después
+como O/E (observados / esperados sin escala). Los grupos con menos de
+MIN_EVENTS eventos conservan los valores actuales (S0 se re-ancla a la nueva
+media sin cambiar el riesgo).
+
+Entrada: columnas (columnar.SCHEMA) y un array 0/1 de resultados por escala.
+Salida: dict serializable que calculators.py carga como recalibration.json.
+"""
+
+import json
+import math
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .calculators import (  # type: ignore
+        BASELINE_PARAMS, RECALIBRATION_FORMAT, SCORE2_REGION_SCALE, acc_aha_linear_predictor,
+        framingham_linear_predictor, score2_linear_predictor,
+    )
+    from .columnar import REGION_CODES, SCALES, SCHEMA, column_length, iter_patients  # type: ignore
+except ImportError:
+    from calculators import (
+        BASELINE_PARAMS, RECALIBRATION_FORMAT, SCORE2_REGION_SCALE, acc_aha_linear_predictor,
+        framingham_linear_predictor, score2_linear_predictor,
+    )
+    from columnar import REGION_CODES, SCALES, SCHEMA, column_length, iter_patients
+
+MIN_EVENTS = 20
+MAX_ITER = 50
+TOLERANCE = 1e-10
+SHARD_ROWS = 100_000
+REFERENCE_REGION = "moderate"
+SCORE2_CAP = 0.5  # el modelo continuo SCORE2 limita el riesgo al 50 %
+SEXES = ("men", "women")  # índice = código de columnar.SEX_CODES
+
+_PREDICTORS = {
+    "framingham": lambda patient: framingham_linear_predictor(patient)[0],
+    "score": lambda patient: score2_linear_predictor(patient)[0],
+    "acc_aha": lambda patient: acc_aha_linear_predictor(patient)[0],
+}
+
+
+def linear_predictors(columns: Mapping[str, Sequence], scales: Sequence[str] = SCALES, start: int = 0,
+                      stop: Optional[int] = None) -> Dict[str, array]:
+    """Índice lineal L (sin restar la media) por escala para las filas [start, stop)."""
+    out = {scale: array("d") for scale in scales}
+    funcs = [(_PREDICTORS[scale], out[scale].append) for scale in scales]
+    for patient in iter_patients(columns, start, stop):
+        for func, put in funcs:
+            put(func(patient))
+    return out
+
+
+def _shard_predictors(args) -> Dict[str, bytes]:
+    blobs, scales = args
+    columns = {}
+    for name, code in SCHEMA:
+        columns[name] = array(code)
+        columns[name].frombytes(blobs[name])
+    return {scale: arr.tobytes() for scale, arr in linear_predictors(columns, scales).items()}
+
+
+def compute_predictors(columns: Mapping[str, Sequence], scales: Sequence[str] = SCALES,
+                       workers: int = 1) -> Dict[str, array]:
+    """linear_predictors sobre toda la cohorte; con workers > 1, por shards en procesos aparte."""
+    n = column_length(columns)
+    shards = [(start, min(start + SHARD_ROWS, n)) for start in range(0, n, SHARD_ROWS)]
+    if workers <= 1 or len(shards) <= 1:
+        return linear_predictors(columns, scales)
+    tasks = [({name: array(code, columns[name][a:b]).tobytes() for name, code in SCHEMA}, tuple(scales))
+             for a, b in shards]
+    out = {scale: array("d") for scale in scales}
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        for blobs in pool.map(_shard_predictors, tasks):
+            for scale in scales:
+                out[scale].frombytes(blobs[scale])
+    return out
+
+
+def fit_baseline(x: Sequence[float], y: Sequence[int], theta: float) -> Tuple[float, float, int]:
+    """
+    θ de máxima verosimilitud para P(evento) = 1 − exp(−exp(θ + x)).
+    Devuelve (θ, error estándar, iteraciones). `theta` es el valor inicial.
+    """
+    events = [xi for xi, yi in zip(x, y) if yi]
+    censored_mass = math.fsum(math.exp(xi) for xi, yi in zip(x, y) if not yi)
+    if not events or not censored_mass:
+        raise ValueError("Se necesitan filas con y sin evento")
+    exp = math.exp
+    expm1 = math.expm1
+    hessian = -1.0
+    for iteration in range(1, MAX_ITER + 1):
+        e_theta = exp(theta)
+        score = -e_theta * censored_mass
+        hessian = score
+        for xi in events:
+            mu = e_theta * exp(xi)
+            if mu > 700.0:
+                continue
+            d = expm1(mu)
+            g = mu / d  # d/dθ ln(1 − e^−μ)
+            score += g
+            hessian += mu * (d - mu * (d + 1.0)) / (d * d)
+        step = score / hessian
+        theta -= step
+        if abs(step) < TOLERANCE:
+            return theta, 1.0 / math.sqrt(-hessian), iteration
+    raise ValueError(f"Newton no convergió en {MAX_ITER} iteraciones")
+
+
+def _theta(s0: float) -> float:
+    return math.log(-math.log(s0))
+
+
+def _s0(theta: float) -> float:
+    return math.exp(-math.exp(theta))
+
+
+def _risks(x: Sequence[float], theta: float) -> List[float]:
+    e_theta = math.exp(theta)
+    return [-math.expm1(-e_theta * math.exp(xi)) for xi in x]
+
+
+def _fit_group(scale: str, sex: str, lp: Sequence[float], y: Sequence[int],
+               fit_rows: Optional[Sequence[int]] = None) -> Tuple[Dict, Dict]:
+    """Parámetros nuevos y diagnóstico de una escala y sexo."""
+    params, mean_key = BASELINE_PARAMS[scale]
+    current = params[sex]
+    mean = math.fsum(lp) / len(lp)
+    # θ actual expresado respecto a la nueva media (mismo riesgo que hoy)
+    theta = _theta(current["S0"]) + mean - current[mean_key]
+    x = [v - mean for v in lp]
+    fx, fy = (x, y) if fit_rows is None else ([x[i] for i in fit_rows], [y[i] for i in fit_rows])
+    events = sum(fy)
+    info = {"n": len(lp), "events": sum(y), "fit_rows": len(fx), "fit_events": events}
+    if events >= MIN_EVENTS and events < len(fy):
+        theta, se, iterations = fit_baseline(fx, fy, theta)
+        info.update({
+            "status": "fitted",
+            "iterations": iterations,
+            # θ mayor → S0 menor
+            "S0_ci95": [round(_s0(theta + 1.96 * se), 6), round(_s0(theta - 1.96 * se), 6)],
+        })
+    else:
+        info["status"] = "insufficient_events"
+    return {"S0": round(_s0(theta), 8), mean_key: round(mean, 8)}, dict(info, theta=theta, x=x)
+
+
+def _region_scales(sex_fits: Mapping[str, Dict], regions: Sequence[int], y: Sequence[int],
+                   sex_rows: Mapping[str, Sequence[int]]) -> Tuple[Dict[str, float], Dict]:
+    """Escala regional SCORE2 = O/E con el S0 ya ajustado (riesgo sin escalar)."""
+    observed = [0] * len(REGION_CODES)
+    expected = [0.0] * len(REGION_CODES)
+    for sex, fit in sex_fits.items():
+        for i, risk in zip(sex_rows[sex], _risks(fit["x"], fit["theta"])):
+            observed[regions[i]] += y[i]
+            expected[regions[i]] += risk
+    scales, info = {}, {}
+    for code, region in enumerate(REGION_CODES):
+        if region == REFERENCE_REGION or not expected[code]:
+            continue
+        info[region] = {"observed": observed[code], "expected": round(expected[code], 2)}
+        if observed[code] >= MIN_EVENTS:
+            scales[region] = round(observed[code] / expected[code], 4)
+            info[region]["status"] = "fitted"
+        else:
+            info[region]["status"] = "insufficient_events"
+    return scales, info
+
+
+def _expected(scale: str, x: Sequence[float], theta: float, regions: Sequence[int], rows: Sequence[int],
+              region_scale: Mapping[str, float]) -> float:
+    risks = _risks(x, theta)
+    if scale != "score":
+        return math.fsum(risks)
+    return math.fsum(min(r * region_scale[REGION_CODES[regions[i]]], SCORE2_CAP) for r, i in zip(risks, rows))
+
+
+def recalibrate(columns: Mapping[str, Sequence], outcomes: Mapping[str, Sequence[int]],
+                workers: int = 1, source: Optional[str] = None) -> Dict:
+    """
+    Recalibra las escalas de `outcomes` ({escala: 0/1 por fila}). Devuelve el
+    contenido de recalibration.json, con el diagnóstico en "fit".
+    """
+    n = column_length(columns)
+    for scale, y in outcomes.items():
+        if scale not in BASELINE_PARAMS:
+            raise ValueError(f"Escala desconocida: {scale}")
+        if len(y) != n:
+            raise ValueError(f"{scale}: {len(y)} resultados para {n} filas")
+    lps = compute_predictors(columns, list(outcomes), workers)
+    sexes, regions = columns["sexo"], columns["region_riesgo"]
+    sex_rows = {sex: [i for i in range(n) if sexes[i] == code] for code, sex in enumerate(SEXES)}
+    reference = REGION_CODES.index(REFERENCE_REGION)
+
+    fitted: Dict[str, Dict] = {}
+    report: Dict[str, Dict] = {}
+    for scale, y_all in outcomes.items():
+        _params, mean_key = BASELINE_PARAMS[scale]
+        fitted[scale], report[scale] = {}, {}
+        fits = {}
+        for sex, rows in sex_rows.items():
+            if not rows:
+                continue
+            lp = [lps[scale][i] for i in rows]
+            y = [y_all[i] for i in rows]
+            fit_rows = [j for j, i in enumerate(rows) if regions[i] == reference] if scale == "score" else None
+            fitted[scale][sex], fits[sex] = _fit_group(scale, sex, lp, y, fit_rows)
+        region_scale = dict(SCORE2_REGION_SCALE)
+        if scale == "score":
+            new_scales, report[scale]["regions"] = _region_scales(fits, regions, y_all, sex_rows)
+            region_scale.update(new_scales)
+            fitted[scale]["region_scale"] = region_scale
+        for sex, fit in fits.items():
+            rows = sex_rows[sex]
+            current = BASELINE_PARAMS[scale][0][sex]
+            x_now = [lps[scale][i] - current[mean_key] for i in rows]
+            before = _expected(scale, x_now, _theta(current["S0"]), regions, rows, SCORE2_REGION_SCALE)
+            after = _expected(scale, fit.pop("x"), fit.pop("theta"), regions, rows, region_scale)
+            observed = fit["events"]
+            report[scale][sex] = dict(
+                fit,
+                observed_pct=round(100.0 * observed / fit["n"], 3),
+                expected_pct_before=round(100.0 * before / fit["n"], 3),
+                expected_pct_after=round(100.0 * after / fit["n"], 3),
+                oe_before=round(observed / before, 4) if before else None,
+                oe_after=round(observed / after, 4) if after else None,
+                before={"S0": current["S0"], mean_key: current[mean_key]},
+            )
+    return {
+        "format": RECALIBRATION_FORMAT,
+        "created": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "source": source,
+        "rows": n,
+        "min_events": MIN_EVENTS,
+        "scales": fitted,
+        "fit": report,
+    }
+
+
+def write_recalibration(data: Mapping, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2)
@@ -19,13 +19,13 @@ from reportlab.platypus import (
 from reportlab.lib import colors
 
 OUTPUT_DIR = "backend/reports"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
 def build_pdf_report(patient: Dict, result: Dict, warnings: List[str]) -> str:
     """
     Crea un PDF, devuelve la ruta al archivo.
     """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     filename = f"reporte_{datetime.utcnow().timestamp()}.pdf"
     path = os.path.join(OUTPUT_DIR, filename)
     doc = SimpleDocTemplate(path, pagesize=LETTER, rightMargin=72,
@@ -50,7 +50,9 @@ def build_pdf_report(patient: Dict, result: Dict, warnings: List[str]) -> str:
 
     # ­Resultados
     elements.append(Paragraph("Resultados", styles["Heading2"]))
-    res_data = [[k.upper(), f'{v["percent"]} % ({v["category"]})'] for k, v in result.items()]
+    res_data = [[k.upper(), f'{v["percent"]} % ({v["category"]})'
+                 + (f' · percentil {v["percentile"]:.0f}' if v.get("percentile") is not None else '')]
+                for k, v in result.items()]
     tbl2 = Table(res_data, colWidths=[200, 200])
     tbl2.setStyle(TableStyle([
         ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
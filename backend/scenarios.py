@@ -0,0 +1,270 @@
+"""
+Escenarios de intervención sobre cohortes (¿qué pasaría si...?)
+
+Un escenario es una lista declarativa de acciones sobre las entradas de la
+cohorte, aplicadas en orden y cada una con un filtro opcional "where":
+    {"op": "shift", "field": "presion_sistolica", "by": -10, "where": {"tratamiento_hipertension": true}}
+    {"op": "scale", "field": "colesterol_total", "factor": 0.8}
+    {"op": "set",   "field": "tratamiento_hipertension", "value": true, "where": {"presion_sistolica": {"min": 160}}}
+    {"op": "flip",  "field": "fumador", "p": 0.3, "where": {"fumador": true}}   # 30 % deja de fumar
+Los valores numéricos se recortan a RANGES. "flip" invierte un booleano con
+probabilidad p (semilla fija por escenario: resultados reproducibles).
+
+La línea base se puntúa una vez; en cada escenario solo se vuelven a puntuar
+las filas cuyas entradas cambiaron y solo las escalas que leen los campos
+cambiados (SCALE_INPUTS). Las demás filas reutilizan el resultado base. Por
+escala se devuelven la matriz de transición entre categorías, los cambios
+de nivel y la variación de eventos esperados a 10 años (suma de riesgos).
+"""
+
+import math
+import random
+from array import array
+from collections import Counter
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .calculators import SCORE2_REGION_MAP, affected_scales  # type: ignore
+    from .cohort_stats import category_level  # type: ignore
+    from .columnar import (  # type: ignore
+        CATEGORY_CODE, CATEGORY_LABELS, FLAG_COLUMNS, NUMERIC_COLUMNS, SCALES, SCHEMA, SEX_CODES, column_length,
+        encode_region, score_columns,
+    )
+    from .validators import RANGES  # type: ignore
+except ImportError:
+    from calculators import SCORE2_REGION_MAP, affected_scales
+    from cohort_stats import category_level
+    from columnar import (
+        CATEGORY_CODE, CATEGORY_LABELS, FLAG_COLUMNS, NUMERIC_COLUMNS, SCALES, SCHEMA, SEX_CODES, column_length,
+        encode_region, score_columns,
+    )
+    from validators import RANGES
+
+OPS = ("shift", "scale", "set", "flip")
+MAX_SCENARIOS = 32
+_CODES = dict(SCHEMA)
+_ERROR = CATEGORY_CODE["error"]
+_LEVEL_BY_CODE = tuple(category_level(label) for label in CATEGORY_LABELS)
+
+
+def _order(code: int) -> Tuple[bool, int, int]:
+    """Orden de presentación: de menor a mayor riesgo, "error" al final."""
+    return code == _ERROR, _LEVEL_BY_CODE[code], code
+
+
+def _number(name: str, value) -> float:
+    """Número finito; "nan"/"inf" o texto no numérico son un error."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name}: se esperaba un número, no {value!r}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name}: el valor debe ser finito, no {value!r}")
+    return number
+
+
+def _field_value(field: str, value):
+    """Valor de filtro o de "set" en la codificación de las columnas."""
+    if field == "sexo":
+        key = str(value).strip().lower()
+        if key not in SEX_CODES:
+            raise ValueError(f"sexo: valor desconocido {value!r} (válidos: {', '.join(SEX_CODES)})")
+        return SEX_CODES.index(key)
+    if field == "region_riesgo":
+        if str(value).strip().lower().replace(" ", "_").replace("-", "_") not in SCORE2_REGION_MAP:
+            raise ValueError(f"region_riesgo: región desconocida {value!r}")
+        return encode_region(value)
+    if field in FLAG_COLUMNS:
+        if isinstance(value, str):
+            return 1 if value.strip().lower() in ("true", "1", "si", "sí") else 0
+        return 1 if value else 0
+    return _number(field, value)
+
+
+def _row_filter(columns: Mapping[str, Sequence], where: Optional[Mapping]):
+    """Predicado por fila a partir de {campo: valor | {"min": a, "max": b}}."""
+    if where is None:
+        return None
+    if not isinstance(where, Mapping):
+        raise ValueError("'where' debe ser un objeto")
+    if not where:
+        return None
+    checks = []
+    for field, cond in where.items():
+        if field not in _CODES:
+            raise ValueError(f"Campo de filtro desconocido: {field}")
+        col = columns[field]
+        if isinstance(cond, Mapping):
+            unknown = set(cond) - {"min", "max"}
+            if unknown:
+                raise ValueError(f"{field}: condición desconocida {', '.join(sorted(map(str, unknown)))} "
+                                 f"(válidas: min, max)")
+            low = _number(f"{field}.min", cond["min"]) if "min" in cond else -math.inf
+            high = _number(f"{field}.max", cond["max"]) if "max" in cond else math.inf
+            checks.append(lambda i, col=col, low=low, high=high: low <= col[i] <= high)
+        else:
+            target = _field_value(field, cond)
+            checks.append(lambda i, col=col, target=target: col[i] == target)
+    return lambda i: all(check(i) for check in checks)
+
+
+def apply_actions(columns: Mapping[str, Sequence], actions: Sequence[Mapping],
+                  rng: random.Random) -> Tuple[Dict[str, Sequence], set]:
+    """
+    Columnas del escenario (las no modificadas se comparten con la base, las
+    modificadas son copias) y conjunto de campos modificados.
+    """
+    current: Dict[str, Sequence] = dict(columns)
+    copied: set = set()
+    n = column_length(columns)
+    for number, action in enumerate(actions, start=1):
+        if not isinstance(action, Mapping):
+            raise ValueError(f"Acción {number}: se esperaba un objeto")
+        op, field = action.get("op"), action.get("field")
+        if op not in OPS:
+            raise ValueError(f"Acción {number}: operación desconocida {op!r} (válidas: {', '.join(OPS)})")
+        if field not in _CODES:
+            raise ValueError(f"Acción {number}: campo desconocido {field!r}")
+        numeric = field in NUMERIC_COLUMNS
+        if op in ("shift", "scale") and not numeric:
+            raise ValueError(f"Acción {number}: {op} solo se aplica a campos numéricos")
+        if op == "flip" and field not in FLAG_COLUMNS:
+            raise ValueError(f"Acción {number}: flip solo se aplica a campos booleanos")
+        try:
+            match = _row_filter(current, action.get("where"))
+        except ValueError as err:
+            raise ValueError(f"Acción {number}: {err}") from None
+        if field not in copied:
+            current[field] = array(_CODES[field], current[field])
+            copied.add(field)
+        col = current[field]
+        low, high = RANGES.get(field, (-math.inf, math.inf))
+        rows = range(n) if match is None else [i for i in range(n) if match(i)]
+        try:
+            if op == "shift":
+                by = _number("by", action["by"])
+                for i in rows:
+                    col[i] = min(high, max(low, col[i] + by))
+            elif op == "scale":
+                factor = _number("factor", action["factor"])
+                for i in rows:
+                    col[i] = min(high, max(low, col[i] * factor))
+            elif op == "set":
+                value = _field_value(field, action["value"])
+                if numeric:
+                    value = min(high, max(low, value))
+                for i in rows:
+                    col[i] = value
+            else:
+                p = _number("p", action.get("p", 1.0))
+                rand = rng.random
+                for i in rows:
+                    if rand() < p:
+                        col[i] = 1 - col[i]
+        except KeyError as err:
+            raise ValueError(f"Acción {number}: falta el parámetro {err.args[0]}") from None
+        except ValueError as err:
+            raise ValueError(f"Acción {number}: {err}") from None
+    return current, copied
+
+
+def _changed_rows(base: Mapping[str, Sequence], scenario: Mapping[str, Sequence], fields: set) -> List[int]:
+    cols = [(base[f], scenario[f]) for f in fields]
+    return [i for i in range(column_length(base)) if any(b[i] != s[i] for b, s in cols)]
+
+
+def _subset(columns: Mapping[str, Sequence], rows: Sequence[int]) -> Dict[str, array]:
+    return {name: array(code, [columns[name][i] for i in rows]) for name, code in SCHEMA}
+
+
+def _score(columns: Mapping[str, Sequence], scales: Sequence[str], workers: int) -> Dict[str, Tuple[Sequence, Sequence]]:
+    if workers > 1 and column_length(columns) > 1:
+        try:
+            from .parallel import score_cohort_parallel  # type: ignore
+        except ImportError:
+            from parallel import score_cohort_parallel
+        result = score_cohort_parallel(columns, workers=workers, scales=scales)
+        if result.errors:
+            raise ValueError(f"Fallo al puntuar: {result.errors[0].error}")
+        return {s: (result.percent[s], result.category[s]) for s in scales}
+    return score_columns(columns, scales=scales)
+
+
+def _category_counts(cats: Sequence[int]) -> Dict[str, int]:
+    counts = Counter(cats)
+    ordered = sorted(counts, key=_order)
+    return {CATEGORY_LABELS[c]: counts[c] for c in ordered}
+
+
+def run_scenarios(columns: Mapping[str, Sequence], scenarios: Sequence[Mapping], scales: Sequence[str] = SCALES,
+                  seed: int = 0, workers: int = 1) -> Dict:
+    """Evalúa la línea base y cada escenario ({"name", "actions"}) sobre la cohorte."""
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"Demasiados escenarios (máximo {MAX_SCENARIOS})")
+    scales = tuple(scales)
+    n = column_length(columns)
+    base = _score(columns, scales, workers)
+    base_events = {s: math.fsum(base[s][0]) / 100.0 for s in scales}
+    # Filas fuera del dominio de la escala (p. ej. SCORE2 < 40 años): 0 % y categoría "error"
+    scored = {s: n - base[s][1].count(_ERROR) for s in scales}
+    out = {
+        "rows": n,
+        "scales": list(scales),
+        "baseline": {s: {"expected_events": round(base_events[s], 2),
+                         "mean_percent": round(base_events[s] * 100.0 / scored[s], 3) if scored[s] else None,
+                         "unscored": n - scored[s],
+                         "categories": _category_counts(base[s][1])} for s in scales},
+        "scenarios": [],
+    }
+    for idx, scenario in enumerate(scenarios):
+        if not isinstance(scenario, Mapping):
+            raise ValueError(f"Escenario {idx + 1}: se esperaba un objeto {{'name', 'actions'}}")
+        name = scenario.get("name") or f"escenario_{idx + 1}"
+        actions = scenario.get("actions")
+        if not isinstance(actions, list):
+            raise ValueError(f"{name}: 'actions' debe ser una lista")
+        modified, fields = apply_actions(columns, actions, random.Random(f"{seed}:{idx}"))
+        rows = _changed_rows(columns, modified, fields)
+        stale = [s for s in scales if s in affected_scales(fields, scales)]
+        rescored = _score(_subset(modified, rows), stale, workers) if rows and stale else {}
+        entry = {"name": name, "changed_rows": len(rows), "scales": {}}
+        for scale in scales:
+            base_pct, base_cat = base[scale]
+            transitions: Counter = Counter()
+            delta = 0.0
+            down = up = 0
+            if scale in rescored:
+                new_pct, new_cat = rescored[scale]
+                for j, i in enumerate(rows):
+                    delta += new_pct[j] - base_pct[i]
+                    a, b = base_cat[i], new_cat[j]
+                    if a != b:
+                        transitions[(a, b)] += 1
+                        if _ERROR in (a, b):
+                            continue
+                        if _LEVEL_BY_CODE[b] < _LEVEL_BY_CODE[a]:
+                            down += 1
+                        elif _LEVEL_BY_CODE[b] > _LEVEL_BY_CODE[a]:
+                            up += 1
+            # Matriz completa: diagonal = filas que conservan su categoría
+            stay = Counter(base_cat)
+            for (a, _b), count in transitions.items():
+                stay[a] -= count
+            matrix: Dict[str, Dict[str, int]] = {}
+            for a in sorted(stay, key=_order):
+                row = {CATEGORY_LABELS[a]: stay[a]} if stay[a] else {}
+                for (src, dst), count in sorted(transitions.items(), key=lambda kv: _order(kv[0][1])):
+                    if src == a:
+                        row[CATEGORY_LABELS[dst]] = count
+                matrix[CATEGORY_LABELS[a]] = row
+            events = base_events[scale] + delta / 100.0
+            entry["scales"][scale] = {
+                "expected_events": round(events, 2),
+                "delta_events": round(delta / 100.0, 2),
+                "delta_relative": round(delta / 100.0 / base_events[scale], 4) if base_events[scale] else None,
+                "moved_down": down,
+                "moved_up": up,
+                "transitions": matrix,
+            }
+        out["scenarios"].append(entry)
+    return out
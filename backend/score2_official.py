@@ -103,6 +103,9 @@ SCORE2_OP_COEFFICIENTS_PLACEHOLDER = {
     # ... otros niveles de riesgo para 70+
 }
 
+# Clamps según SCORE2 (colesterol total en mmol/L)
+SCORE2_OFFICIAL_CLAMPS = {"edad": (40, 89), "presion_sistolica": (90, 200), "colesterol_mmol": (2.5, 8.0)}
+
 def _validate_score2_inputs(patient: Dict) -> Tuple[bool, list]:
     """Valida las entradas para SCORE2."""
     errors = []
@@ -140,11 +143,12 @@ def _get_region_key(region: str) -> str:
     
     return mapping.get(region, "moderate_risk")
 
-def _load_coeffs_from_json() -> Optional[Dict]:
-    """Carga coeficientes desde backend/score2_coeffs.json si existen y no son placeholders.
+def _load_coeffs_from_json(directory: Optional[str] = None) -> Optional[Dict]:
+    """Carga coeficientes desde backend/score2_coeffs.json (u otro directorio)
+    si existen y no son placeholders.
     Devuelve None si el archivo no existe o contiene valores nulos.
     """
-    here = os.path.dirname(__file__)
+    here = directory or os.path.dirname(__file__)
     path = os.path.join(here, "score2_coeffs.json")
     if not os.path.exists(path):
         return None
@@ -164,14 +168,15 @@ def _load_coeffs_from_json() -> Optional[Dict]:
     except Exception:
         return None
 
-def _get_score2_coefficients(age: float, sex: str, region: str) -> Tuple[Dict, str]:
+def _get_score2_coefficients(age: float, sex: str, region: str, data: Optional[Dict] = None) -> Tuple[Dict, str]:
     """Obtiene coeficientes según edad, sexo y región.
-    1) Intenta cargar oficiales desde JSON.
+    1) Intenta cargar oficiales desde JSON (o usa `data` si se pasa).
     2) Si no existen, usa placeholders internos.
     """
     region_key = _get_region_key(region)
     is_male = str(sex).lower() == "hombre"
-    data = _load_coeffs_from_json()
+    if data is None:
+        data = _load_coeffs_from_json()
 
     if age >= 70:
         # SCORE2-OP para 70+ años
@@ -201,7 +206,7 @@ def _get_score2_coefficients(age: float, sex: str, region: str) -> Tuple[Dict, s
     # Fallback por defecto si nada se encontró
     return SCORE2_COEFFICIENTS_PLACEHOLDER["moderate_risk"]["men_40_69"], "SCORE2"
 
-def calculate_score2_official(patient: Dict) -> SCORE2Result:
+def calculate_score2_official(patient: Dict, coeffs_data: Optional[Dict] = None) -> SCORE2Result:
     """
     Calcula SCORE2 usando estructura oficial pero coeficientes aproximados.
     
@@ -228,12 +233,15 @@ def calculate_score2_official(patient: Dict) -> SCORE2Result:
     region = str(patient.get("region_riesgo", "moderado"))
     
     # Obtener coeficientes apropiados
-    coeffs, method_used = _get_score2_coefficients(age, sex, region)
+    coeffs, method_used = _get_score2_coefficients(age, sex, region, coeffs_data)
     
     # Clamps según SCORE2
-    age_clamped = max(40, min(89, age))
-    sbp_clamped = max(90, min(200, sbp))
-    chol_clamped = max(2.5, min(8.0, chol_total / 38.67))  # Convertir a mmol/L
+    age_lo, age_hi = SCORE2_OFFICIAL_CLAMPS["edad"]
+    sbp_lo, sbp_hi = SCORE2_OFFICIAL_CLAMPS["presion_sistolica"]
+    chol_lo, chol_hi = SCORE2_OFFICIAL_CLAMPS["colesterol_mmol"]
+    age_clamped = max(age_lo, min(age_hi, age))
+    sbp_clamped = max(sbp_lo, min(sbp_hi, sbp))
+    chol_clamped = max(chol_lo, min(chol_hi, chol_total / 38.67))  # Convertir a mmol/L
     
     if age != age_clamped:
         warnings.append(f"Edad ajustada de {age} a {age_clamped}")
@@ -287,6 +295,22 @@ def calculate_score2_official(patient: Dict) -> SCORE2Result:
             [f"Error de cálculo: {str(e)}"]
         )
 
+def load_score2_coefficients(directory: Optional[str] = None) -> Optional[Dict]:
+    """score2_coeffs.json de `directory` (por defecto el del backend) o None."""
+    return _load_coeffs_from_json(directory)
+
+def official_coefficients_spec() -> Dict:
+    """Coeficientes y clamps que usa calculate_score2_official, serializables.
+    "json" son los oficiales cargados (o None); los placeholders son el respaldo.
+    """
+    return {
+        "json": _load_coeffs_from_json(),
+        "SCORE2": SCORE2_COEFFICIENTS_PLACEHOLDER,
+        "SCORE2_OP": SCORE2_OP_COEFFICIENTS_PLACEHOLDER,
+        "clamps": SCORE2_OFFICIAL_CLAMPS,
+        "max_pct": 50.0,
+    }
+
 def get_score2_implementation_status() -> Dict:
     """Retorna el estado de implementación de SCORE2."""
     return {
@@ -309,9 +333,11 @@ def get_score2_implementation_status() -> Dict:
     }
 
 # Función de compatibilidad con la interfaz existente
-def score2_risk_official(patient: Dict) -> Dict:
-    """Interfaz compatible con el sistema existente."""
-    result = calculate_score2_official(patient)
+def score2_risk_official(patient: Dict, coeffs_data: Optional[Dict] = None) -> Dict:
+    """Interfaz compatible con el sistema existente.
+    `coeffs_data` sustituye a score2_coeffs.json (evaluación de candidatos).
+    """
+    result = calculate_score2_official(patient, coeffs_data)
     
     return {
         "percent": result.percent,
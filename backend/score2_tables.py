@@ -26,8 +26,8 @@ import os
 _JSON_NAME = "score2_risk_tables.json"
 
 
-def _load_tables_json() -> Optional[Dict]:
-    here = os.path.dirname(__file__)
+def _load_tables_json(directory: Optional[str] = None) -> Optional[Dict]:
+    here = directory or os.path.dirname(__file__)
     path = os.path.join(here, _JSON_NAME)
     if not os.path.exists(path):
         return None
@@ -42,6 +42,13 @@ def _load_tables_json() -> Optional[Dict]:
         return None
 
 
+def get_score2_tables(directory: Optional[str] = None) -> Optional[Dict]:
+    """Tablas SCORE2 cargadas (o None si no hay JSON válido).
+    `directory` permite leer otra versión (p. ej. un candidato en evaluación).
+    """
+    return _load_tables_json(directory)
+
+
 def _find_band_index(value: float, bands: list) -> int:
     """Devuelve el índice de banda para un valor dado.
     - Para bandas de edad y PAS: se definen como [low, high].
@@ -62,11 +69,12 @@ def _find_band_index(value: float, bands: list) -> int:
     return len(bands) - 1
 
 
-def score2_lookup_from_tables(patient: Dict) -> Optional[Tuple[float, str, Dict]]:
+def score2_lookup_from_tables(patient: Dict, tables: Optional[Dict] = None) -> Optional[Tuple[float, str, Dict]]:
     """Devuelve (percent, category, meta) desde tablas oficiales si existen.
     Retorna None si no hay tablas o si no se encuentra coincidencia.
+    `tables` sustituye al JSON del directorio (ver get_score2_tables).
     """
-    data = _load_tables_json()
+    data = tables if tables is not None else _load_tables_json()
     if not data:
         return None
 
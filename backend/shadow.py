@@ -0,0 +1,256 @@
+"""
+Evaluación en sombra de una versión candidata de coeficientes y tablas
+
+Un directorio candidato puede traer cualquiera de score2_risk_tables.json,
+score2_coeffs.json y accaha_pce_coeffs.json; los ficheros ausentes, vacíos o
+inválidos se toman de la versión en producción. Los ficheros SCORE2 solo se
+evalúan si la ruta correspondiente (tablas u oficial) está activa en el
+proceso: con los imports planos de app.py SCORE2 usa siempre el modelo
+continuo y su sombra queda inactiva (se indica en "inactive_files"). Una fracción muestreada del
+tráfico real de /calculate se encola sin bloquear (si la cola está llena la
+muestra se descarta) y un hilo en segundo plano la recalcula con el
+candidato, acumulando la distribución de diferencias de porcentaje y las
+transiciones de categoría por escala. La respuesta al cliente siempre sale
+de la versión en producción.
+
+Configuración por entorno (ver shadow_from_env):
+    CARDIORISK_SHADOW_DIR    directorio del candidato (desactivado si no se define)
+    CARDIORISK_SHADOW_RATE   fracción de peticiones evaluadas (por defecto 0.1)
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import queue
+import random
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from .calculators import (  # type: ignore
+        MODEL_VERSION, acc_aha_risk, score2_lookup_from_tables, score2_risk_official, score2_risk_with_path,
+    )
+    from .score2_official import load_score2_coefficients  # type: ignore
+    from .score2_tables import get_score2_tables  # type: ignore
+except ImportError:
+    from calculators import (
+        MODEL_VERSION, acc_aha_risk, score2_lookup_from_tables, score2_risk_official, score2_risk_with_path,
+    )
+    from score2_official import load_score2_coefficients
+    from score2_tables import get_score2_tables
+
+CANDIDATE_FILES = ("score2_risk_tables.json", "score2_coeffs.json", "accaha_pce_coeffs.json")
+_TOP_EXAMPLES = 10
+
+
+def load_acc_aha_coefficients(directory: str) -> Optional[Dict]:
+    """accaha_pce_coeffs.json ({"men": {...}, "women": {...}}) o None si falta o está vacío."""
+    path = os.path.join(directory, "accaha_pce_coeffs.json")
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            raw = fh.read().strip()
+        data = json.loads(raw) if raw else None
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not all(isinstance(data.get(k), dict) for k in ("men", "women")):
+        return None
+    for coeffs in (data["men"], data["women"]):
+        if "S0" not in coeffs or "meanXB" not in coeffs:
+            return None
+    return data
+
+
+class CandidateModel:
+    """Versión candidata cargada en memoria junto a la de producción."""
+
+    def __init__(self, directory: str):
+        if not os.path.isdir(directory):
+            raise ValueError(f"No existe el directorio candidato: {directory}")
+        self.directory = directory
+        self.inactive: Dict[str, str] = {}
+        self.tables = self._score2_file("score2_risk_tables.json", score2_lookup_from_tables, get_score2_tables)
+        self.official_coeffs = self._score2_file("score2_coeffs.json", score2_risk_official, load_score2_coefficients)
+        self.acc_aha_coeffs = load_acc_aha_coefficients(directory)
+        self.loaded = {
+            "score2_risk_tables.json": self.tables is not None,
+            "score2_coeffs.json": self.official_coeffs is not None,
+            "accaha_pce_coeffs.json": self.acc_aha_coeffs is not None,
+        }
+        # Solo se comparan las escalas con algún fichero candidato en uso
+        self.scales = tuple(
+            scale for scale, used in (("score", self.tables is not None or self.official_coeffs is not None),
+                                      ("acc_aha", self.acc_aha_coeffs is not None))
+            if used
+        )
+        digest = hashlib.sha256(MODEL_VERSION.encode("utf-8"))
+        for name in CANDIDATE_FILES:
+            path = os.path.join(directory, name)
+            if self.loaded[name]:
+                with open(path, "rb") as fh:
+                    digest.update(name.encode("utf-8") + b"\0" + fh.read())
+        self.version = digest.hexdigest()[:16]
+
+    def _score2_file(self, name: str, live_path, loader) -> Optional[Dict]:
+        """Datos SCORE2 del candidato, o None si faltan o su ruta no está activa en este proceso."""
+        if not os.path.exists(os.path.join(self.directory, name)):
+            return None
+        if not callable(live_path):
+            self.inactive[name] = "ruta SCORE2 no activa en este proceso (se usa el modelo continuo)"
+            return None
+        return loader(self.directory)
+
+    def evaluate(self, patient: Dict, scales: Optional[Sequence[str]] = None) -> Dict:
+        scales = self.scales if scales is None else scales
+        out = {}
+        if "score" in scales:
+            out["score"], out["score2_path"] = score2_risk_with_path(patient, self.tables, self.official_coeffs)
+        if "acc_aha" in scales:
+            out["acc_aha"] = acc_aha_risk(patient, self.acc_aha_coeffs)
+        return out
+
+
+class _ScaleDiff:
+    """Diferencias candidato − producción de una escala."""
+
+    __slots__ = ("n", "changed", "sum_diff", "sum_abs", "diffs", "transitions", "top")
+
+    def __init__(self):
+        self.n = 0
+        self.changed = 0
+        self.sum_diff = 0.0
+        self.sum_abs = 0.0
+        self.diffs: Counter = Counter()  # diferencia en décimas de punto → recuento
+        self.transitions: Counter = Counter()
+        self.top: List = []  # montículo de (|Δ|, n, ejemplo)
+
+    def add(self, live: Dict, cand: Dict, patient: Dict) -> None:
+        diff = round(cand["percent"] - live["percent"], 1)
+        self.n += 1
+        self.sum_diff += diff
+        self.sum_abs += abs(diff)
+        self.diffs[int(round(diff * 10))] += 1
+        if live["category"] != cand["category"]:
+            self.changed += 1
+            self.transitions[(live["category"], cand["category"])] += 1
+        if diff:
+            item = (abs(diff), self.n, {"patient": patient, "live": live, "candidate": cand})
+            if len(self.top) < _TOP_EXAMPLES:
+                heapq.heappush(self.top, item)
+            elif item[0] > self.top[0][0]:
+                heapq.heapreplace(self.top, item)
+
+    def _quantile(self, q: float) -> float:
+        target = q * (self.n - 1)
+        seen = 0
+        for key in sorted(self.diffs):
+            seen += self.diffs[key]
+            if seen > target:
+                return key / 10
+        return 0.0
+
+    def summary(self) -> Dict:
+        if not self.n:
+            return {"n": 0}
+        return {
+            "n": self.n,
+            "mean_diff_pp": round(self.sum_diff / self.n, 3),
+            "mean_abs_diff_pp": round(self.sum_abs / self.n, 3),
+            "max_abs_diff_pp": max(abs(k) for k in self.diffs) / 10,
+            "diff_quantiles_pp": {f"p{int(q * 100)}": self._quantile(q) for q in (0.01, 0.05, 0.5, 0.95, 0.99)},
+            "unchanged_share": round(self.diffs.get(0, 0) / self.n, 4),
+            "category_changed_share": round(self.changed / self.n, 4),
+            "category_transitions": {f"{a}→{b}": c for (a, b), c in self.transitions.most_common()},
+            "largest_diffs": [ex for _d, _i, ex in sorted(self.top, reverse=True)],
+        }
+
+
+class ShadowEvaluator:
+    """Cola acotada + hilo en segundo plano que compara candidato y producción."""
+
+    def __init__(self, candidate: CandidateModel, sample_rate: float = 0.1, max_queue: int = 1024,
+                 seed: Optional[int] = None):
+        self.candidate = candidate
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self._queue: "queue.Queue" = queue.Queue(max_queue)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._scales: Dict[str, _ScaleDiff] = {}
+        self._paths: Counter = Counter()
+        self.offered = 0
+        self.sampled = 0
+        self.dropped = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="shadow-eval", daemon=True)
+        self._thread.start()
+
+    def offer(self, patient: Dict, live_result: Dict) -> None:
+        """Desde la petición: decide la muestra y encola sin bloquear."""
+        self.offered += 1
+        if self._rng.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((patient, live_result))
+            self.sampled += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            patient, live = item
+            scales = [s for s in self.candidate.scales if s in live]
+            if not scales:
+                continue
+            try:
+                cand = self.candidate.evaluate(patient, scales)
+            except Exception:
+                self.errors += 1
+                continue
+            with self._lock:
+                for scale in scales:
+                    self._scales.setdefault(scale, _ScaleDiff()).add(live[scale], cand[scale], patient)
+                if "score2_path" in cand:
+                    self._paths[cand["score2_path"]] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._scales = {}
+            self._paths = Counter()
+
+    def report(self) -> Dict:
+        with self._lock:
+            scales = {name: diff.summary() for name, diff in self._scales.items()}
+            paths = dict(self._paths)
+        return {
+            "live_version": MODEL_VERSION,
+            "candidate_version": self.candidate.version,
+            "candidate_dir": self.candidate.directory,
+            "candidate_files": self.candidate.loaded,
+            "inactive_files": self.candidate.inactive,
+            "active_scales": list(self.candidate.scales),
+            "sample_rate": self.sample_rate,
+            "offered": self.offered,
+            "sampled": self.sampled,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending": self._queue.qsize(),
+            "candidate_score2_paths": paths,
+            "scales": scales,
+        }
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(5)
+
+
+def shadow_from_env() -> Optional[ShadowEvaluator]:
+    """ShadowEvaluator según CARDIORISK_SHADOW_DIR / _RATE, o None si no está configurado."""
+    directory = os.environ.get("CARDIORISK_SHADOW_DIR")
+    if not directory:
+        return None
+    rate = float(os.environ.get("CARDIORISK_SHADOW_RATE", "0.1"))
+    return ShadowEvaluator(CandidateModel(directory), rate)
@@ -0,0 +1,323 @@
+"""
+Generador de poblaciones sintéticas con factores de riesgo correlacionados
+
+Produce cohortes en formato columnar (ver columnar.SCHEMA) a partir de una
+semilla: pirámide de edad adulta, proporción de sexos, PAS, colesterol total
+y HDL con medias dependientes de edad y sexo y residuos correlacionados
+(factor de Cholesky), prevalencia de tabaquismo y diabetes por región de
+SCORE2 y tratamiento antihipertensivo más probable cuanto mayor es la PAS.
+Todos los valores se recortan a RANGES de validators.py.
+
+Los parámetros son aproximaciones plausibles para pruebas de carga y
+benchmarks, no estimaciones epidemiológicas. La generación es por bloques
+con semilla propia ("semilla:bloque"), por lo que el resultado no depende
+del número de procesos; cada bloque se genera columna a columna con
+comprensiones sobre arrays tipados (sin numpy).
+"""
+
+import json
+import math
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from operator import mul
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .columnar import REGION_CODES, SCHEMA, SEX_CODES, column_length, empty_columns, encode_region  # type: ignore
+    from .validators import RANGES  # type: ignore
+except ImportError:
+    from columnar import REGION_CODES, SCHEMA, SEX_CODES, column_length, empty_columns, encode_region
+    from validators import RANGES
+
+GENERATOR_VERSION = 1  # subir si cambia la forma de muestrear
+CHUNK_ROWS = 50_000
+
+# Pirámide de edad adulta: (edad mínima, edad máxima, peso)
+AGE_BANDS = ((20, 29, 0.08), (30, 39, 0.12), (40, 49, 0.20), (50, 59, 0.24), (60, 69, 0.21), (70, 79, 0.15))
+FEMALE_SHARE = 0.51
+
+# Media = a + b·edad y desviación típica, por sexo (hombre, mujer)
+SBP_MODEL = ((104.0, 0.50, 15.0), (96.0, 0.62, 16.0))
+TC_MODEL = ((185.0, 0.45, 36.0), (168.0, 0.75, 36.0))
+HDL_MODEL = ((47.0, 0.0, 11.0), (58.0, 0.0, 13.0))
+HDL_SMOKER_SHIFT = -3.0
+HDL_DIABETES_SHIFT = -3.0
+
+# Correlación de los residuos (PAS, CT, HDL)
+RESIDUAL_CORRELATION = ((1.00, 0.15, -0.05),
+                        (0.15, 1.00, 0.20),
+                        (-0.05, 0.20, 1.00))
+
+# Prevalencia de tabaquismo (hombre, mujer) y de diabetes a los 55 años, por región
+SMOKING_PREVALENCE = {
+    "low": (0.20, 0.15), "moderate": (0.26, 0.19),
+    "high": (0.33, 0.22), "very_high": (0.40, 0.18),
+}
+DIABETES_PREVALENCE = {"low": 0.05, "moderate": 0.07, "high": 0.09, "very_high": 0.10}
+DIABETES_AGE_SLOPE = 0.045  # log-odds por año respecto a los 55
+SMOKING_AGE_FACTOR = ((50, 1.15), (65, 0.85), (200, 0.50))  # (edad límite exclusiva, factor)
+
+# Tratamiento antihipertensivo: logística en la PAS (+ diabetes)
+TREATMENT_BASE = 0.04
+TREATMENT_MAX = 0.75
+TREATMENT_SBP_MID = 145.0
+TREATMENT_SBP_SCALE = 7.0
+TREATMENT_DIABETES_BONUS = 0.10
+
+REGION_NAMES = ("bajo", "moderado", "alto", "muy_alto")  # nombres de /calculate por código
+
+
+def _cholesky(matrix: Sequence[Sequence[float]]) -> List[List[float]]:
+    n = len(matrix)
+    lower = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            s = matrix[i][j] - sum(lower[i][k] * lower[j][k] for k in range(j))
+            lower[i][j] = math.sqrt(s) if i == j else s / lower[j][j]
+    return lower
+
+
+_CHOL = _cholesky(RESIDUAL_CORRELATION)
+
+
+def _region_weights(region=None, region_weights: Optional[Mapping] = None) -> List[float]:
+    """Pesos por código de región: una región fija, un reparto explícito o uniforme."""
+    if region is not None:
+        weights = [0.0] * len(REGION_CODES)
+        weights[encode_region(region)] = 1.0
+        return weights
+    if region_weights:
+        weights = [0.0] * len(REGION_CODES)
+        for key, w in region_weights.items():
+            weights[encode_region(key)] += float(w)
+        return weights
+    return [1.0] * len(REGION_CODES)
+
+
+def _normals(rand, n: int) -> List[float]:
+    """n normales estándar por Box-Muller (dos por cada par de uniformes)."""
+    log, sqrt, tau = math.log, math.sqrt, math.tau
+    half = (n + 1) // 2
+    radius = [sqrt(-2.0 * log(1.0 - rand())) for _ in range(half)]
+    theta = [tau * rand() for _ in range(half)]
+    out = list(map(mul, radius, map(math.cos, theta)))
+    out += map(mul, radius, map(math.sin, theta))
+    del out[n:]
+    return out
+
+
+def _round_clamp(values: Sequence[float], low: float, high: float) -> List[float]:
+    """Redondea a entero y recorta a [low, high] (como float)."""
+    return [float(v if low <= v <= high else (low if v < low else high)) for v in map(round, values)]
+
+
+def _smoking_age_factor(age: int) -> float:
+    for limit, factor in SMOKING_AGE_FACTOR:
+        if age < limit:
+            return factor
+    return SMOKING_AGE_FACTOR[-1][1]
+
+
+def _build_tables() -> Dict[str, list]:
+    """Tablas de consulta por edad entera (0..AGE_SLOTS-1) para evitar cálculo por fila."""
+    ages = range(_AGE_SLOTS)
+    smoke = []  # índice (región·2 + sexo)·AGE_SLOTS + edad
+    for code in REGION_CODES:
+        for sex in (0, 1):
+            smoke += [SMOKING_PREVALENCE[code][sex] * _smoking_age_factor(a) for a in ages]
+    diabetes = []  # índice región·AGE_SLOTS + edad
+    for code in REGION_CODES:
+        p = DIABETES_PREVALENCE[code]
+        logit = math.log(p / (1 - p))
+        diabetes += [1.0 / (1.0 + math.exp(-(logit + DIABETES_AGE_SLOPE * (a - 55)))) for a in ages]
+    sbp_high = RANGES["presion_sistolica"][1]
+    treatment = [TREATMENT_BASE + TREATMENT_MAX / (1.0 + math.exp((TREATMENT_SBP_MID - v) / TREATMENT_SBP_SCALE))
+                 for v in range(int(sbp_high) + 1)]
+    return {
+        "smoke": smoke,
+        "diabetes": diabetes,
+        "treatment": treatment,
+        # Medias por sexo·AGE_SLOTS + edad
+        "sbp_mean": [SBP_MODEL[s][0] + SBP_MODEL[s][1] * a for s in (0, 1) for a in ages],
+        "tc_mean": [TC_MODEL[s][0] + TC_MODEL[s][1] * a for s in (0, 1) for a in ages],
+        "age_values": [a for lo, hi, _w in AGE_BANDS for a in range(lo, hi + 1)],
+        "age_cum": list(accumulate(w / (hi - lo + 1) for lo, hi, w in AGE_BANDS for _a in range(lo, hi + 1))),
+    }
+
+
+_AGE_SLOTS = max(hi for _lo, hi, _w in AGE_BANDS) + 1
+_TABLES = _build_tables()
+
+
+def generate_chunk(seed, chunk: int, rows: int, region=None,
+                   region_weights: Optional[Mapping] = None) -> Dict[str, array]:
+    """Bloque determinista de `rows` pacientes (independiente de los demás bloques)."""
+    rng = random.Random(f"{seed}:{chunk}")
+    rand = rng.random
+    n = rows
+    t = _TABLES
+    slots = _AGE_SLOTS
+
+    # Sexo, región y edad (entera, según la pirámide)
+    sex = [1 if rand() < FEMALE_SHARE else 0 for _ in range(n)]
+    weights = _region_weights(region, region_weights)
+    if sum(1 for w in weights if w) == 1:
+        reg = [weights.index(max(weights))] * n
+    else:
+        reg = rng.choices(range(len(REGION_CODES)), cum_weights=list(accumulate(weights)), k=n)
+    age = rng.choices(t["age_values"], cum_weights=t["age_cum"], k=n)
+
+    # Tabaquismo y diabetes por región, sexo y edad
+    smoke_p, dm_p = t["smoke"], t["diabetes"]
+    smoker = [1 if rand() < smoke_p[(r * 2 + s) * slots + a] else 0 for r, s, a in zip(reg, sex, age)]
+    diabetes = [1 if rand() < dm_p[r * slots + a] else 0 for r, a in zip(reg, age)]
+
+    # Residuos correlacionados (PAS, CT, HDL) = L · z
+    (l00, _, _), (l10, l11, _), (l20, l21, l22) = _CHOL
+    z0, z1, z2 = _normals(rand, n), _normals(rand, n), _normals(rand, n)
+    sbp_sd = (SBP_MODEL[0][2] * l00, SBP_MODEL[1][2] * l00)
+    tc_sd = (TC_MODEL[0][2], TC_MODEL[1][2])
+    hdl_mean = (HDL_MODEL[0][0], HDL_MODEL[1][0])
+    hdl_sd = (HDL_MODEL[0][2], HDL_MODEL[1][2])
+
+    sbp_mean, tc_mean = t["sbp_mean"], t["tc_mean"]
+    sbp = _round_clamp([sbp_mean[s * slots + a] + sbp_sd[s] * e0 for s, a, e0 in zip(sex, age, z0)],
+                       *RANGES["presion_sistolica"])
+    tc = _round_clamp([tc_mean[s * slots + a] + tc_sd[s] * (l10 * e0 + l11 * e1)
+                       for s, a, e0, e1 in zip(sex, age, z0, z1)], *RANGES["colesterol_total"])
+    hdl = _round_clamp([hdl_mean[s] + HDL_SMOKER_SHIFT * fs + HDL_DIABETES_SHIFT * fd
+                        + hdl_sd[s] * (l20 * e0 + l21 * e1 + l22 * e2)
+                        for s, fs, fd, e0, e1, e2 in zip(sex, smoker, diabetes, z0, z1, z2)], *RANGES["hdl"])
+
+    # Tratamiento antihipertensivo según la PAS (entera tras el redondeo)
+    tx_p = t["treatment"]
+    treated = [1 if rand() < tx_p[int(v)] + TREATMENT_DIABETES_BONUS * fd else 0 for v, fd in zip(sbp, diabetes)]
+
+    cols = empty_columns()
+    cols["edad"].extend(_round_clamp(age, *RANGES["edad"]))
+    cols["presion_sistolica"].extend(sbp)
+    cols["colesterol_total"].extend(tc)
+    cols["hdl"].extend(hdl)
+    cols["sexo"].extend(sex)
+    cols["region_riesgo"].extend(reg)
+    cols["fumador"].extend(smoker)
+    cols["diabetes"].extend(diabetes)
+    cols["tratamiento_hipertension"].extend(treated)
+    return cols
+
+
+def _chunks(rows: int, chunk_rows: int) -> List[Tuple[int, int]]:
+    return [(c, min(chunk_rows, rows - c * chunk_rows)) for c in range((rows + chunk_rows - 1) // chunk_rows)]
+
+
+def _chunk_bytes(args) -> Dict[str, bytes]:
+    seed, chunk, rows, region, region_weights = args
+    return {name: arr.tobytes() for name, arr in generate_chunk(seed, chunk, rows, region, region_weights).items()}
+
+
+def iter_population(rows: int, seed=0, region=None, region_weights: Optional[Mapping] = None,
+                    workers: int = 1, chunk_rows: int = CHUNK_ROWS) -> Iterator[Dict[str, array]]:
+    """Bloques de columnas en orden; con workers > 1 se generan en procesos aparte."""
+    tasks = [(seed, c, n, region, dict(region_weights) if region_weights else None)
+             for c, n in _chunks(rows, chunk_rows)]
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield generate_chunk(*task)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        for blobs in pool.map(_chunk_bytes, tasks):
+            cols = {}
+            for name, code in SCHEMA:
+                arr = array(code)
+                arr.frombytes(blobs[name])
+                cols[name] = arr
+            yield cols
+
+
+def generate_population(rows: int, seed=0, region=None, region_weights: Optional[Mapping] = None,
+                        workers: int = 1, chunk_rows: int = CHUNK_ROWS) -> Dict[str, array]:
+    """Cohorte completa en columnas (mismo resultado para cualquier número de workers)."""
+    out = empty_columns()
+    for cols in iter_population(rows, seed, region, region_weights, workers, chunk_rows):
+        for name, arr in cols.items():
+            out[name].extend(arr)
+    return out
+
+
+def simulate_outcomes(percent: Sequence[float], seed=0, factor: float = 1.0) -> array:
+    """
+    Resultados a 10 años (0/1) con probabilidad min(1, factor · percent / 100)
+    por fila. Con factor ≠ 1 la cohorte queda descalibrada a propósito
+    (O/E ≈ factor), útil para probar recalibración y métricas de evaluación.
+    """
+    rand = random.Random(f"{seed}:outcomes").random
+    scale = factor / 100.0
+    return array("B", [1 if rand() < pct * scale else 0 for pct in percent])
+
+
+CSV_FIELDS = ("edad", "sexo", "colesterol_total", "hdl", "presion_sistolica",
+              "tratamiento_hipertension", "fumador", "diabetes", "region_riesgo")
+
+
+def _row_values(columns: Mapping[str, Sequence], i: int) -> Tuple:
+    return (
+        int(columns["edad"][i]), SEX_CODES[columns["sexo"][i]], int(columns["colesterol_total"][i]),
+        int(columns["hdl"][i]), int(columns["presion_sistolica"][i]),
+        bool(columns["tratamiento_hipertension"][i]), bool(columns["fumador"][i]),
+        bool(columns["diabetes"][i]), REGION_NAMES[columns["region_riesgo"][i]],
+    )
+
+
+def iter_csv_lines(columns: Mapping[str, Sequence], header: bool = True) -> Iterator[str]:
+    """Líneas CSV con las columnas de /calculate (ingeribles con scripts/cohort.py)."""
+    if header:
+        yield ",".join(CSV_FIELDS) + "\n"
+    tf = ("false", "true")
+    for i in range(column_length(columns)):
+        e, s, tc, hdl, sbp, tx, smk, dm, reg = _row_values(columns, i)
+        yield f"{e},{s},{tc},{hdl},{sbp},{tf[tx]},{tf[smk]},{tf[dm]},{reg}\n"
+
+
+def row_body(columns: Mapping[str, Sequence], i: int) -> Dict:
+    """Cuerpo de /calculate de la fila i."""
+    return dict(zip(CSV_FIELDS, _row_values(columns, i)))
+
+
+def iter_ndjson_lines(columns: Mapping[str, Sequence]) -> Iterator[str]:
+    """Un cuerpo de /calculate por línea."""
+    for i in range(column_length(columns)):
+        yield json.dumps(row_body(columns, i), ensure_ascii=False) + "\n"
+
+
+def population_summary(columns: Mapping[str, Sequence]) -> Dict:
+    """Medias y prevalencias de la cohorte generada (comprobación rápida de plausibilidad)."""
+    n = column_length(columns)
+    if not n:
+        return {"rows": 0}
+
+    def mean(name):
+        return round(math.fsum(columns[name]) / n, 2)
+
+    def corr(a, b):
+        xa, xb = columns[a], columns[b]
+        ma, mb = math.fsum(xa) / n, math.fsum(xb) / n
+        cov = math.fsum((x - ma) * (y - mb) for x, y in zip(xa, xb))
+        va = math.fsum((x - ma) ** 2 for x in xa)
+        vb = math.fsum((y - mb) ** 2 for y in xb)
+        return round(cov / math.sqrt(va * vb), 3) if va and vb else None
+
+    return {
+        "rows": n,
+        "female_share": round(sum(columns["sexo"]) / n, 4),
+        "mean": {name: mean(name) for name in ("edad", "presion_sistolica", "colesterol_total", "hdl")},
+        "prevalence": {name: round(sum(columns[name]) / n, 4)
+                       for name in ("fumador", "diabetes", "tratamiento_hipertension")},
+        "region_share": {REGION_CODES[c]: round(columns["region_riesgo"].count(c) / n, 4)
+                         for c in range(len(REGION_CODES))},
+        "correlation": {"pas_ct": corr("presion_sistolica", "colesterol_total"),
+                        "ct_hdl": corr("colesterol_total", "hdl"),
+                        "pas_hdl": corr("presion_sistolica", "hdl"),
+                        "edad_pas": corr("edad", "presion_sistolica")},
+    }
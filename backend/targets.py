@@ -0,0 +1,248 @@
+"""
+Objetivos terapéuticos: qué valor de cada factor modificable lleva al paciente
+por debajo de un umbral de riesgo en cada escala
+
+Cada modelo tiene la forma riesgo = 1 − S0^exp(L − media), con L lineal en
+ln(x) para cada factor modificable (con la edad fija, también en las
+interacciones ln(edad)·ln(x) de las PCE). El valor necesario se despeja en
+forma cerrada: L* = media + ln(ln(1 − r*) / ln S0) y ln x* = ln x + (L* − L)/β.
+Los clamps de cada escala se respetan (fuera de ellos el factor deja de
+influir). El resultado se redondea a la unidad clínica y se verifica con la
+función real de la escala; si la ruta activa no es la ecuación (p. ej. tablas
+SCORE2) se usa una búsqueda binaria monótona sobre la función real.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    from .calculators import (  # type: ignore
+        ACC_AHA_CLAMPS,
+        CATEGORY_RULES,
+        MG_DL_PER_MMOL_L,
+        SCALE_FUNCTIONS,
+        SCORE2_CLAMPS,
+        acc_aha_linear_predictor,
+        framingham_linear_predictor,
+        score2_linear_predictor,
+    )
+    from .validators import RANGES  # type: ignore
+except ImportError:
+    from calculators import (
+        ACC_AHA_CLAMPS,
+        CATEGORY_RULES,
+        MG_DL_PER_MMOL_L,
+        SCALE_FUNCTIONS,
+        SCORE2_CLAMPS,
+        acc_aha_linear_predictor,
+        framingham_linear_predictor,
+        score2_linear_predictor,
+    )
+    from validators import RANGES
+
+# Factor → dirección favorable (−1 bajar, +1 subir); fumador es binario
+CONTINUOUS_FACTORS = {"presion_sistolica": -1, "colesterol_total": -1, "hdl": 1}
+FACTORS = tuple(CONTINUOUS_FACTORS) + ("fumador",)
+STEP = 1.0  # unidad clínica (mmHg, mg/dL)
+_MAX_ADJUST_STEPS = 5
+
+
+def default_threshold(scale: str, patient: Dict) -> float:
+    """Umbral por defecto: salir de la categoría de riesgo elevado.
+    Framingham <10 %, PCE <7.5 %, SCORE2 límite inferior de "alto" según edad.
+    """
+    if scale == "framingham":
+        return float(CATEGORY_RULES["framingham"]["cuts"][0][0])
+    if scale == "acc_aha":
+        return 7.5
+    age = float(patient.get("edad", 60))
+    for upper_age, rule in CATEGORY_RULES["score2"]:
+        if upper_age is None or age < upper_age:
+            return float(rule["cuts"][0][0])
+    raise ValueError(f"Escala desconocida: {scale}")
+
+
+def _evaluate(scale: str, patient: Dict) -> Dict:
+    return SCALE_FUNCTIONS[scale](patient)
+
+
+def _meets(scale: str, patient: Dict, threshold: float) -> bool:
+    return _evaluate(scale, patient)["percent"] < threshold
+
+
+def _solve_ln(L: float, beta: float, x: float, S0: float, mean: float, r_target: float) -> Optional[float]:
+    if beta == 0 or not 0.0 < r_target < 1.0:
+        return None
+    L_target = mean + math.log(math.log(1.0 - r_target) / math.log(S0))
+    return math.exp(math.log(x) + (L_target - L) / beta)
+
+
+def analytic_target(scale: str, patient: Dict, factor: str, threshold: float) -> Optional[float]:
+    """Valor continuo del factor que deja el riesgo justo bajo `threshold` (sin redondear).
+    None si el factor no influye o el valor cae fuera de los clamps de la escala.
+    """
+    r_target = (threshold - 0.05) / 100.0  # margen para el redondeo a 0.1
+    if scale == "framingham":
+        L, p = framingham_linear_predictor(patient)
+        treated = bool(patient.get("tratamiento_hipertension", False))
+        beta = {
+            "presion_sistolica": p["ln_sbp_treated"] if treated else p["ln_sbp_untreated"],
+            "colesterol_total": p["ln_tc"],
+            "hdl": p["ln_hdl"],
+        }[factor]
+        return _solve_ln(L, beta, max(float(patient[factor]), 1e-6), p["S0"], p["meanL"], r_target)
+
+    if scale == "acc_aha":
+        L, p = acc_aha_linear_predictor(patient)
+        ln_age = math.log(min(max(float(patient["edad"]), ACC_AHA_CLAMPS["edad"][0]), ACC_AHA_CLAMPS["edad"][1]))
+        treated = bool(patient.get("tratamiento_hipertension", False))
+        beta = {
+            "presion_sistolica": p.get("ln_sbp_tr" if treated else "ln_sbp_ut", 0.0),
+            "colesterol_total": p.get("ln_tc", 0.0) + p.get("ln_age_ln_tc", 0.0) * ln_age,
+            "hdl": p.get("ln_hdl", 0.0) + p.get("ln_age_ln_hdl", 0.0) * ln_age,
+        }[factor]
+        low, high = ACC_AHA_CLAMPS[factor]
+        x = min(max(float(patient[factor]), low), high)
+        target = _solve_ln(L, beta, x, p["S0"], p["meanXB"], r_target)
+        return target if target is not None and low <= target <= high else None
+
+    if scale == "score":
+        L, p, region_scale = score2_linear_predictor(patient)
+        r_target /= region_scale
+        if factor == "presion_sistolica":
+            low, high = SCORE2_CLAMPS["presion_sistolica"]
+            x = min(max(float(patient[factor]), low), high)
+            target = _solve_ln(L, p["ln_sbp"], x, p["S0"], p["mean"], r_target)
+            return target if target is not None and low <= target <= high else None
+        if "no_hdl" in patient:
+            return None  # TC y HDL no intervienen cuando se aporta no-HDL
+        low, high = SCORE2_CLAMPS["no_hdl_mmol"]
+        tc, hdl = float(patient["colesterol_total"]), float(patient["hdl"])
+        x = min(max(max(0.0, tc - hdl) / MG_DL_PER_MMOL_L, low), high)
+        non_hdl = _solve_ln(L, p["ln_chol"], x, p["S0"], p["mean"], r_target)
+        if non_hdl is None or not low <= non_hdl <= high:
+            return None
+        return non_hdl * MG_DL_PER_MMOL_L + hdl if factor == "colesterol_total" else tc - non_hdl * MG_DL_PER_MMOL_L
+
+    raise ValueError(f"Escala desconocida: {scale}")
+
+
+def _search_target(scale: str, patient: Dict, factor: str, threshold: float) -> Optional[float]:
+    """Búsqueda binaria sobre la función real (monótona en el factor) en la rejilla entera."""
+    direction = CONTINUOUS_FACTORS[factor]
+    current = float(patient[factor])
+    bound = float(RANGES[factor][0] if direction < 0 else RANGES[factor][1])
+    if not _meets(scale, {**patient, factor: bound}, threshold):
+        return None
+    # lo: no cumple (actual), hi: cumple (límite); en pasos enteros desde el actual
+    lo, hi = 0, int(math.ceil(abs(current - bound)))
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if _meets(scale, {**patient, factor: current + direction * mid}, threshold):
+            hi = mid
+        else:
+            lo = mid
+    return max(min(current + direction * hi, max(bound, current)), min(bound, current))
+
+
+def _round_clinical(value: float, direction: int) -> float:
+    return float(math.floor(value) if direction < 0 else math.ceil(value))
+
+
+def _solve_factor(scale: str, patient: Dict, factor: str, threshold: float) -> Dict:
+    current = patient.get(factor)
+    if factor == "fumador":
+        if not current:
+            return {"current": False, "target": None, "achievable": False, "reason": "no fumador"}
+        quit_result = _evaluate(scale, {**patient, "fumador": False})
+        return {
+            "current": True,
+            "target": False,
+            "achievable": quit_result["percent"] < threshold,
+            "result_at_target": quit_result,
+        }
+
+    direction = CONTINUOUS_FACTORS[factor]
+    low, high = RANGES[factor]
+    current = float(current)
+    target, method = None, "analytic"
+    guess = analytic_target(scale, patient, factor, threshold)
+    if guess is not None and (guess - current) * direction >= 0:
+        candidate = min(max(_round_clinical(guess, direction), low), high)
+        # Ajuste fino frente a redondeos y a la ruta real de la escala
+        for _ in range(_MAX_ADJUST_STEPS):
+            if _meets(scale, {**patient, factor: candidate}, threshold):
+                break
+            candidate += direction * STEP
+        else:
+            candidate = None
+        if candidate is not None and low <= candidate <= high:
+            while True:
+                back = candidate - direction * STEP
+                if (back - current) * direction < 0 or not _meets(scale, {**patient, factor: back}, threshold):
+                    break
+                candidate = back
+            target = candidate
+    if target is None:
+        method = "search"
+        target = _search_target(scale, patient, factor, threshold)
+
+    if target is None:
+        return {"current": current, "target": None, "achievable": False,
+                "reason": f"no alcanzable dentro de {low}-{high} ni de los clamps de la escala"}
+    return {
+        "current": current,
+        "target": target,
+        "change": round(target - current, 1),
+        "achievable": True,
+        "method": method,
+        "result_at_target": _evaluate(scale, {**patient, factor: target}),
+    }
+
+
+def _check_options(scales: Sequence[str], threshold, factors) -> Optional[float]:
+    """Valida escalas, umbral y factores una sola vez por petición (umbral como float o None)."""
+    unknown = [s for s in scales if s not in SCALE_FUNCTIONS]
+    if unknown:
+        raise ValueError(f"Escala desconocida: {unknown[0]}")
+    if isinstance(factors, str) or not isinstance(factors, (list, tuple)):
+        raise ValueError("'factors' debe ser una lista")
+    unknown = [f for f in factors if f not in FACTORS]
+    if unknown:
+        raise ValueError(f"Factores no modificables: {unknown}")
+    if threshold is None:
+        return None
+    try:
+        return float(threshold)
+    except (TypeError, ValueError):
+        raise ValueError(f"Umbral no numérico: {threshold!r}") from None
+
+
+def _solve_targets(patient: Dict, scale: str, threshold: Optional[float], factors: Sequence[str]) -> Dict:
+    threshold = default_threshold(scale, patient) if threshold is None else threshold
+    current = _evaluate(scale, patient)
+    out = {"scale": scale, "threshold": threshold, "current": current,
+           "already_met": current["percent"] < threshold, "factors": {}}
+    for factor in factors:
+        if out["already_met"]:
+            out["factors"][factor] = {"current": patient.get(factor), "target": patient.get(factor),
+                                      "change": 0, "achievable": True}
+        else:
+            out["factors"][factor] = _solve_factor(scale, patient, factor, threshold)
+    return out
+
+
+def solve_targets(patient: Dict, scale: str, threshold: Optional[float] = None,
+                  factors: Sequence[str] = FACTORS) -> Dict:
+    """Objetivo de cada factor modificable (por separado) para `scale`."""
+    return _solve_targets(patient, scale, _check_options((scale,), threshold, factors), factors)
+
+
+def solve_targets_batch(patients: Iterable[Dict], scales: Sequence[str] = tuple(SCALE_FUNCTIONS),
+                        threshold: Optional[float] = None, factors: Sequence[str] = FACTORS) -> List[Dict]:
+    """
+    Lote: {escala: resultado de solve_targets} por paciente. Las opciones se
+    validan una vez; cada paciente se resuelve en forma cerrada (sin vectorizar).
+    """
+    threshold = _check_options(scales, threshold, factors)
+    return [{scale: _solve_targets(p, scale, threshold, factors) for scale in scales} for p in patients]
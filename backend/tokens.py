@@ -0,0 +1,118 @@
+"""
+Tokens de resultado firmados con HMAC (sin estado en el servidor)
+
+Con CARDIORISK_TOKEN_SECRET definido, /calculate devuelve además un token
+compacto que contiene las entradas normalizadas, el resultado, las
+advertencias, la versión de coeficientes y la caducidad. Cualquier nodo con
+el mismo secreto puede verificar el token y generar el informe sin consultar
+SESSIONS, de modo que no hace falta enrutado "sticky" ni sesión compartida.
+
+Formato: base64url(zlib(JSON)) "." base64url(HMAC-SHA256(secreto, cuerpo)).
+El contenido va firmado, no cifrado: no debe usarse para datos que el
+cliente no pueda ver (es su propio resultado).
+
+Configuración por entorno (ver tokens_from_env):
+    CARDIORISK_TOKEN_SECRET  secreto (o varios separados por comas: firma el
+                             primero y se aceptan todos, para rotarlo)
+    CARDIORISK_TOKEN_TTL     validez en segundos (por defecto 3600)
+    CARDIORISK_STATELESS     "1" para no guardar sesiones en memoria
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import zlib
+from typing import Dict, Mapping, Optional, Sequence
+
+TOKEN_VERSION = 1
+DEFAULT_TTL = 3600
+MAX_TOKEN_LENGTH = 8192  # un token normal ocupa unos cientos de bytes
+
+
+class InvalidToken(ValueError):
+    """Token mal formado, con firma incorrecta o caducado."""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def looks_like_token(value: str) -> bool:
+    """Distingue un token de un session_id (UUID, sin punto)."""
+    return "." in value
+
+
+class TokenSigner:
+    def __init__(self, secrets: Sequence[bytes], ttl: int = DEFAULT_TTL):
+        if not secrets or not all(secrets):
+            raise ValueError("Se necesita al menos un secreto no vacío")
+        self._secrets = list(secrets)
+        self.ttl = ttl
+
+    def _sign(self, body: bytes, secret: bytes) -> bytes:
+        return hmac.new(secret, body, hashlib.sha256).digest()
+
+    def issue(self, patient: Mapping, result: Mapping, warnings: Sequence[str], model_version: str,
+              now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        claims = {
+            "v": TOKEN_VERSION,
+            "exp": int(now) + self.ttl,
+            "mv": model_version,
+            "p": patient,
+            "r": result,
+            "w": list(warnings),
+        }
+        raw = json.dumps(claims, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        body = _b64encode(zlib.compress(raw, 9)).encode("ascii")
+        return f"{body.decode('ascii')}.{_b64encode(self._sign(body, self._secrets[0]))}"
+
+    def verify(self, token: str, now: Optional[float] = None) -> Dict:
+        """Datos del token con la forma de una sesión (patient, result, warnings, model_version, expires)."""
+        if len(token) > MAX_TOKEN_LENGTH or token.count(".") != 1:
+            raise InvalidToken("Token mal formado")
+        body_text, sig_text = token.split(".")
+        body = body_text.encode("ascii", "replace")
+        try:
+            signature = _b64decode(sig_text)
+        except (ValueError, TypeError):
+            raise InvalidToken("Token mal formado") from None
+        if not any(hmac.compare_digest(signature, self._sign(body, secret)) for secret in self._secrets):
+            raise InvalidToken("Firma del token no válida")
+        try:
+            claims = json.loads(zlib.decompress(_b64decode(body_text)).decode("utf-8"))
+        except (ValueError, zlib.error):
+            raise InvalidToken("Token mal formado") from None
+        if claims.get("v") != TOKEN_VERSION:
+            raise InvalidToken("Versión de token no soportada")
+        now = time.time() if now is None else now
+        if now > claims.get("exp", 0):
+            raise InvalidToken("Token caducado")
+        return {
+            "patient": claims["p"],
+            "result": claims["r"],
+            "warnings": claims["w"],
+            "model_version": claims.get("mv"),
+            "expires": claims["exp"],
+        }
+
+
+def token_name(token: str) -> str:
+    """Identificador corto y estable del token (nombres de fichero de informes)."""
+    return hashlib.sha256(token.encode("ascii", "replace")).hexdigest()[:12]
+
+
+def tokens_from_env() -> Optional[TokenSigner]:
+    """TokenSigner según CARDIORISK_TOKEN_SECRET / _TTL, o None si no hay secreto."""
+    raw = os.environ.get("CARDIORISK_TOKEN_SECRET", "")
+    secrets = [s.strip().encode("utf-8") for s in raw.split(",") if s.strip()]
+    if not secrets:
+        return None
+    return TokenSigner(secrets, int(os.environ.get("CARDIORISK_TOKEN_TTL", str(DEFAULT_TTL))))
@@ -0,0 +1,276 @@
+"""
+Formato binario columnar para lotes por HTTP (alternativa a JSON)
+
+Evita codificar y decodificar un dict JSON por paciente: el cuerpo lleva
+una cabecera JSON pequeña que nombra las columnas y sus tipos, seguida de
+arrays little-endian contiguos. Al recibirlo, cada columna es una vista
+memoryview sobre el cuerpo de la petición (sin copia en hosts little-endian)
+que se pasa tal cual a columnar.score_columns.
+
+Formato:
+    b"CRWF" | u16 versión | u32 longitud de cabecera | cabecera JSON | columnas
+    cabecera: {"rows": n, "columns": [{"name", "dtype", "offset", "nbytes"}], ...}
+    dtype: "f8" (float64) | "u1" (uint8); offsets relativos al inicio del
+    cuerpo y alineados a 8 bytes.
+
+Petición: las columnas de columnar.SCHEMA (sexo y región como códigos, ver
+SEX_CODES / REGION_CODES; booleanos 0/1). Respuesta: "status" (0 correcto,
+1 fuera de rango, 2 error de cálculo) y, por escala, "pct:<escala>" (NaN si
+no hay resultado) y "cat:<escala>" (índice en "category_labels", 255 si no
+hay resultado).
+"""
+
+import json
+import struct
+import sys
+import urllib.request
+from array import array
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from .calculators import MODEL_VERSION, SCALE_FUNCTIONS  # type: ignore
+    from .columnar import (  # type: ignore
+        CATEGORY_CODE, CATEGORY_LABELS, FLAG_COLUMNS, REGION_CODES, SCALES, SCHEMA, SEX_CODES,
+        row_patient, score_columns,
+    )
+    from .validators import RANGES  # type: ignore
+except ImportError:
+    from calculators import MODEL_VERSION, SCALE_FUNCTIONS
+    from columnar import (
+        CATEGORY_CODE, CATEGORY_LABELS, FLAG_COLUMNS, REGION_CODES, SCALES, SCHEMA, SEX_CODES,
+        row_patient, score_columns,
+    )
+    from validators import RANGES
+
+MEDIA_TYPE = "application/vnd.cardiorisk.columns"
+MAGIC = b"CRWF"
+FORMAT_VERSION = 1
+ALIGN = 8
+_PREFIX = struct.Struct("<4sHI")
+
+_DTYPES = {"d": "f8", "B": "u1"}
+_TYPECODES = {dtype: code for code, dtype in _DTYPES.items()}
+
+STATUS_OK, STATUS_INVALID, STATUS_ERROR = 0, 1, 2
+STATUS_LABELS = ("ok", "invalid", "error")
+NO_CATEGORY = 255
+
+# Escalas por método de /calculate-batch/<método>
+METHOD_SCALES = {"framingham": ("framingham",), "score": ("score",), "acc-aha": ("acc_aha",), "all": SCALES}
+
+
+def _typecode(values: Sequence, default: str) -> str:
+    code = getattr(values, "typecode", None) or getattr(values, "format", None) or default
+    if code not in _DTYPES:
+        raise ValueError(f"Tipo de columna no soportado: {code}")
+    return code
+
+
+def encode(columns: Mapping[str, Sequence], meta: Optional[Mapping] = None) -> bytes:
+    """Serializa {columna: array | memoryview | lista}. Las listas se guardan como
+    float64 (o uint8 si la columna es de ese tipo en columnar.SCHEMA).
+    """
+    schema_codes = dict(SCHEMA)
+    blobs: List[Tuple[str, str, bytes]] = []
+    rows = None
+    for name, values in columns.items():
+        code = _typecode(values, schema_codes.get(name, "d"))
+        arr = values if isinstance(values, array) and values.typecode == code else array(code, values)
+        if sys.byteorder == "big":
+            arr = array(code, arr)
+            arr.byteswap()
+        if rows is None:
+            rows = len(arr)
+        elif len(arr) != rows:
+            raise ValueError(f"La columna {name} tiene {len(arr)} filas (esperadas {rows})")
+        blobs.append((name, _DTYPES[code], arr.tobytes()))
+
+    def build_header(base: int) -> bytes:
+        cols, offset = [], base
+        for name, dtype, blob in blobs:
+            offset = (offset + ALIGN - 1) // ALIGN * ALIGN
+            cols.append({"name": name, "dtype": dtype, "offset": offset, "nbytes": len(blob)})
+            offset += len(blob)
+        header = dict(meta or {})
+        header.update({"rows": rows or 0, "columns": cols})
+        return json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    # Los offsets dependen de la longitud de la cabecera: se reserva de sobra y se rellena
+    reserved = len(build_header(0)) + 32
+    header = build_header(_PREFIX.size + reserved).ljust(reserved)
+    parts = [_PREFIX.pack(MAGIC, FORMAT_VERSION, reserved), header]
+    pos = _PREFIX.size + reserved
+    for col, (_name, _dtype, blob) in zip(json.loads(header)["columns"], blobs):
+        parts.append(b"\0" * (col["offset"] - pos))
+        parts.append(blob)
+        pos = col["offset"] + len(blob)
+    return b"".join(parts)
+
+
+def decode(payload) -> Tuple[Dict, Dict[str, Sequence]]:
+    """(cabecera, {columna: vista}). Las vistas apuntan a `payload` (no copiar ni liberar antes de usarlas)."""
+    view = memoryview(payload)
+    if view.nbytes < _PREFIX.size:
+        raise ValueError("Cuerpo binario truncado")
+    magic, version, header_len = _PREFIX.unpack(view[:_PREFIX.size])
+    if magic != MAGIC:
+        raise ValueError("El cuerpo no está en formato CRWF")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versión de formato {version} no soportada")
+    end = _PREFIX.size + header_len
+    try:
+        header = json.loads(bytes(view[_PREFIX.size:end]).decode("utf-8"))
+        rows = int(header["rows"])
+        specs = list(header["columns"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cabecera binaria inválida") from None
+    if rows < 0:
+        raise ValueError("Número de filas negativo en la cabecera")
+    columns: Dict[str, Sequence] = {}
+    for spec in specs:
+        if not isinstance(spec, dict):
+            raise ValueError("Cada columna de la cabecera debe ser un objeto")
+        try:
+            name, dtype = str(spec["name"]), spec["dtype"]
+            offset, nbytes = int(spec["offset"]), int(spec["nbytes"])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"Columna inválida en la cabecera: {spec}") from None
+        code = _TYPECODES.get(dtype) if isinstance(dtype, str) else None
+        if code is None:
+            raise ValueError(f"Tipo {dtype} no soportado en la columna {name}")
+        if offset < 0 or nbytes < 0:
+            raise ValueError(f"La columna {name} sale del cuerpo")
+        if offset < end or offset + nbytes > view.nbytes:
+            raise ValueError(f"La columna {name} sale del cuerpo")
+        if nbytes != rows * array(code).itemsize:
+            raise ValueError(f"La columna {name} no tiene {rows} filas")
+        raw = view[offset:offset + nbytes]
+        if sys.byteorder == "little":
+            columns[name] = raw.cast(code)
+        else:
+            arr = array(code, raw.tobytes())
+            arr.byteswap()
+            columns[name] = arr
+    return header, columns
+
+
+def check_schema(header: Mapping, columns: Mapping[str, Sequence]) -> None:
+    """Exige las columnas de columnar.SCHEMA con su tipo y los códigos de sexo/región esperados."""
+    for name, code in SCHEMA:
+        col = columns.get(name)
+        if col is None:
+            raise ValueError(f"Falta la columna {name}")
+        if _typecode(col, code) != code:
+            raise ValueError(f"La columna {name} debe ser {_DTYPES[code]}")
+    for key, expected in (("sex_codes", SEX_CODES), ("region_codes", REGION_CODES)):
+        if key in header and tuple(header[key]) != tuple(expected):
+            raise ValueError(f"{key} no coincide con {list(expected)}")
+
+
+def row_status(columns: Mapping[str, Sequence], rows: int) -> bytearray:
+    """STATUS_INVALID en las filas con valores fuera de RANGES o códigos desconocidos."""
+    status = bytearray(rows)
+    limits = [(name, low, high) for name, (low, high) in RANGES.items()]
+    limits += [("sexo", 0, len(SEX_CODES) - 1), ("region_riesgo", 0, len(REGION_CODES) - 1)]
+    limits += [(name, 0, 1) for name in FLAG_COLUMNS]
+    for name, low, high in limits:
+        for i, value in enumerate(columns[name]):
+            if not low <= value <= high:  # NaN también es inválido
+                status[i] = STATUS_INVALID
+    return status
+
+
+def _valid_runs(status: bytearray) -> List[Tuple[int, int]]:
+    runs, start = [], None
+    for i, s in enumerate(status):
+        if s == STATUS_OK and start is None:
+            start = i
+        elif s != STATUS_OK and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(status)))
+    return runs
+
+
+def _score_rows(columns: Mapping[str, Sequence], start: int, stop: int, scales: Sequence[str],
+                out: Dict[str, Tuple[array, array]], status: bytearray) -> None:
+    """Fila a fila (solo tras un fallo del bloque): aísla las filas que lanzan error."""
+    for i in range(start, stop):
+        patient = row_patient(columns, i)
+        try:
+            res = {scale: SCALE_FUNCTIONS[scale](patient) for scale in scales}
+        except (ValueError, ArithmeticError):
+            status[i] = STATUS_ERROR
+            for scale in scales:
+                out[scale][0][i] = float("nan")
+                out[scale][1][i] = NO_CATEGORY
+            continue
+        for scale in scales:
+            out[scale][0][i] = res[scale]["percent"]
+            out[scale][1][i] = CATEGORY_CODE[res[scale]["category"]]
+
+
+def score_decoded(header: Mapping, columns: Mapping[str, Sequence], method: str = "all") -> Dict[str, Sequence]:
+    """Puntúa columnas ya decodificadas. Devuelve las columnas de respuesta."""
+    if method not in METHOD_SCALES:
+        raise ValueError(f"Método desconocido: {method}")
+    scales = METHOD_SCALES[method]
+    check_schema(header, columns)
+    rows = int(header["rows"])
+    status = row_status(columns, rows)
+    nan = float("nan")
+    out = {s: (array("d", [nan]) * rows, array("B", [NO_CATEGORY]) * rows) for s in scales}
+    for start, stop in _valid_runs(status):
+        try:
+            scored = score_columns(columns, start, stop, scales)
+        except (ValueError, ArithmeticError):
+            _score_rows(columns, start, stop, scales, out, status)
+            continue
+        for scale, (pct, cat) in scored.items():
+            out[scale][0][start:stop] = pct
+            out[scale][1][start:stop] = cat
+    result: Dict[str, Sequence] = {"status": array("B", status)}
+    for scale in scales:
+        result[f"pct:{scale}"], result[f"cat:{scale}"] = out[scale]
+    return result
+
+
+def response_meta(method: str) -> Dict:
+    return {
+        "model_version": MODEL_VERSION,
+        "method": method,
+        "scales": list(METHOD_SCALES[method]),
+        "category_labels": list(CATEGORY_LABELS),
+        "status_labels": list(STATUS_LABELS),
+    }
+
+
+def score_payload(payload, method: str = "all") -> bytes:
+    """Cuerpo de petición binario → cuerpo de respuesta binario (ValueError si es inválido)."""
+    header, columns = decode(payload)
+    try:
+        return encode(score_decoded(header, columns, method), response_meta(method))
+    finally:
+        for col in columns.values():
+            if isinstance(col, memoryview):
+                col.release()
+
+
+def request_meta() -> Dict:
+    return {"sex_codes": list(SEX_CODES), "region_codes": list(REGION_CODES)}
+
+
+def post_columns(url: str, columns: Mapping[str, Sequence], timeout: float = 300.0) -> Tuple[Dict, Dict[str, Sequence]]:
+    """
+    Cliente: envía columnas (p. ej. columnar.patients_to_columns(...)) a
+    http://host:puerto/calculate-batch/<método> y devuelve (cabecera, columnas)
+    de la respuesta. Los códigos de categoría se traducen con
+    cabecera["category_labels"].
+    """
+    body = encode({name: columns[name] for name, _code in SCHEMA}, request_meta())
+    req = urllib.request.Request(url, data=body, method="POST",
+                                 headers={"Content-Type": MEDIA_TYPE, "Accept": MEDIA_TYPE})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        payload = resp.read()
+    return decode(payload)
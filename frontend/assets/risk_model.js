@@ -0,0 +1,225 @@
+/* Evaluador local de las escalas a partir de /models/spec.
+   Réplica de backend/calculators.py (mismo orden de operaciones y mismo
+   redondeo que round(x, 1) de Python) para calcular sin ida y vuelta al servidor. */
+const RiskModel = (() => {
+
+  // Versión de /models/spec que sabe evaluar este fichero
+  const FORMAT = 2;
+
+  // round(x, 1) de Python: redondeo a la mitad-par sobre el valor decimal exacto del double
+  function pyRound1(x){
+    if (!Number.isFinite(x)) return x;
+    const neg = x < 0;
+    const [ip, fp] = Math.abs(x).toFixed(100).split(".");
+    const first = +fp[0];
+    const rest = fp.slice(1);
+    let up;
+    if (rest[0] > "5") up = true;
+    else if (rest[0] < "5") up = false;
+    else if (/[1-9]/.test(rest.slice(1))) up = true;
+    else up = first % 2 === 1;  // empate exacto → par
+    const tenths = (+ip) * 10 + first + (up ? 1 : 0);
+    const out = tenths / 10;
+    return neg ? -out : out;
+  }
+
+  const clamp = (v, [lo, hi]) => Math.max(lo, Math.min(hi, v));
+  const isMale = (p) => String(p.sexo ?? "hombre").toLowerCase() === "hombre";
+  const flag = (v) => (v ? 1 : 0);
+  const num = (v) => {
+    const n = Number(v);
+    if (v === null || v === undefined || v === "" || Number.isNaN(n)) throw new Error("valor no numérico");
+    return n;
+  };
+  const regionKey = (spec, p, fallback) => {
+    const s = String(p.region_riesgo ?? fallback).toLowerCase().replace(/ /g, "_").replace(/-/g, "_");
+    return spec.score2.region_map[s] || "moderate";
+  };
+
+  function categorize(pct, rule){
+    for (const [bound, op, label] of rule.cuts){
+      if (op === "lt" ? pct < bound : pct <= bound) return label;
+    }
+    return rule.else;
+  }
+
+  function categorizeScore2(spec, pct, age){
+    for (const [upper, rule] of spec.categories.score2){
+      if (upper === null || age < upper) return categorize(pct, rule);
+    }
+  }
+
+  // ---------- Framingham ----------
+  function framingham(spec, p){
+    const m = spec.framingham;
+    const c = isMale(p) ? m.men : m.women;
+    const ln = (v) => Math.log(Math.max(v, m.ln_floor));
+    const lnAge = ln(num(p.edad)), lnTc = ln(num(p.colesterol_total));
+    const lnHdl = ln(num(p.hdl)), lnSbp = ln(num(p.presion_sistolica));
+    const sbpTerm = p.tratamiento_hipertension ? c.ln_sbp_treated * lnSbp : c.ln_sbp_untreated * lnSbp;
+    const L = c.ln_age * lnAge + c.ln_tc * lnTc + c.ln_hdl * lnHdl + sbpTerm
+      + c.smoker * flag(p.fumador) + c.diabetes * flag(p.diabetes);
+    const risk = 1 - Math.pow(c.S0, Math.exp(L - c.meanL));
+    const pct = Math.max(0.0, Math.min(pyRound1(risk * 100.0), m.max_pct));
+    return {percent: pct, category: categorize(pct, spec.categories.framingham)};
+  }
+
+  // ---------- ACC/AHA PCE ----------
+  function accAha(spec, p){
+    const m = spec.acc_aha;
+    const male = isMale(p);
+    const c = male ? m.men : m.women;
+    const g = (k) => c[k] ?? 0.0;
+    const lnAge = Math.log(clamp(num(p.edad), m.clamps.edad));
+    const lnTc = Math.log(clamp(num(p.colesterol_total), m.clamps.colesterol_total));
+    const lnHdl = Math.log(clamp(num(p.hdl), m.clamps.hdl));
+    const lnSys = Math.log(clamp(num(p.presion_sistolica), m.clamps.presion_sistolica));
+    const smoker = flag(p.fumador);
+    const sbpTerm = p.tratamiento_hipertension ? g("ln_sbp_tr") * lnSys : g("ln_sbp_ut") * lnSys;
+    let L = g("ln_age") * lnAge + g("ln_tc") * lnTc + g("ln_hdl") * lnHdl + sbpTerm
+      + g("smoker") * smoker + g("diabetes") * flag(p.diabetes);
+    if (!male) L += g("ln_age2") * (lnAge * lnAge);
+    L += g("ln_age_ln_tc") * (lnAge * lnTc);
+    L += g("ln_age_ln_hdl") * (lnAge * lnHdl);
+    L += g("ln_age_smoker") * (lnAge * smoker);
+    const risk = 1 - Math.pow(c.S0, Math.exp(L - c.meanXB));
+    const pct = pyRound1(Math.max(0.0, Math.min(risk * 100.0, m.max_pct)));
+    return {percent: pct, category: categorize(pct, spec.categories.acc_aha)};
+  }
+
+  // ---------- SCORE2: ruta de tablas ----------
+  function bandIndex(value, bands){
+    if (!bands || !bands.length) return -1;
+    if (Array.isArray(bands[0]) && bands[0].length === 2){
+      return bands.findIndex(([lo, hi]) => value >= lo && value <= hi);
+    }
+    const idx = bands.findIndex((upper) => value <= upper);
+    return idx >= 0 ? idx : bands.length - 1;
+  }
+
+  function score2Tables(spec, p){
+    const s = spec.score2;
+    const region = regionKey(spec, p, "moderate");
+    const sexKey = String(p.sexo ?? "hombre").toLowerCase() === "hombre" ? "men" : "women";
+    const edad = num(p.edad), sbp = num(p.presion_sistolica);
+    const noHdl = ("no_hdl" in p)
+      ? num(p.no_hdl) / s.mg_per_mmol
+      : Math.max(0.0, num(p.colesterol_total ?? 200.0) - num(p.hdl ?? 50.0)) / s.mg_per_mmol;
+    const group = s.tables?.[edad >= 70 ? "SCORE2_OP" : "SCORE2"]?.[region]?.[sexKey];
+    if (!group) return null;
+    const ai = bandIndex(edad, group.ages), si = bandIndex(sbp, group.sbp_bands);
+    const ci = bandIndex(noHdl, group.non_hdl_bands);
+    if (Math.min(ai, si, ci) < 0) return null;
+    const value = group.values?.[p.fumador ? "smoker" : "non_smoker"]?.[ai]?.[si]?.[ci];
+    if (value === null || value === undefined) return null;
+    const pct = Number(value);
+    return {percent: pct, category: categorize(pct, spec.categories.score2_chart)};
+  }
+
+  // ---------- SCORE2: coeficientes oficiales (score2_official.py) ----------
+  function officialCoefficients(o, age, male, region){
+    const regionKey = {low: "low_risk", moderate: "moderate_risk", high: "high_risk", very_high: "very_high_risk"}[region] || "moderate_risk";
+    const short = regionKey.replace("_risk", "");
+    const sex = male ? "men" : "women";
+    const group = age >= 70 ? "SCORE2_OP" : "SCORE2";
+    const fromJson = o.json?.[group]?.[short]?.[sex];
+    if (fromJson) return fromJson;
+    const placeholderKey = age >= 70 ? (male ? "men_70_plus" : "women_70_plus") : (male ? "men_40_69" : "women_40_69");
+    return o[group]?.[regionKey]?.[placeholderKey] || o.SCORE2.moderate_risk.men_40_69;
+  }
+
+  function score2Official(spec, p){
+    const o = spec.score2.official;
+    const required = ["edad", "sexo", "presion_sistolica", "colesterol_total", "fumador", "region_riesgo"];
+    const age = Number(p.edad ?? 0);
+    if (required.some((k) => p[k] === undefined || p[k] === null) || !(age >= 40 && age <= 89)){
+      return {percent: 0.0, category: "error"};
+    }
+    const male = isMale(p);
+    const c = officialCoefficients(o, age, male, regionKey(spec, p, "moderado"));
+    const lnAge = Math.log(clamp(age, o.clamps.edad));
+    const X = [lnAge, lnAge * lnAge,
+      Math.log(clamp(num(p.presion_sistolica), o.clamps.presion_sistolica)),
+      Math.log(clamp(num(p.colesterol_total) / 38.67, o.clamps.colesterol_mmol)),
+      flag(p.fumador)];
+    let lp = 0;
+    c.beta.forEach((b, i) => { lp += b * X[i]; });
+    const risk = 1 - Math.pow(c.S0, Math.exp(lp - c.meanXB));
+    const raw = Math.max(0.0, Math.min(risk * 100.0, o.max_pct));
+    return {percent: pyRound1(raw), category: categorize(raw, spec.categories.score2_chart)};
+  }
+
+  // ---------- SCORE2: modelo continuo (fallback) ----------
+  function score2Surrogate(spec, p){
+    const s = spec.score2, m = s.surrogate;
+    const age = clamp(Number(p.edad ?? 40.0), m.clamps.edad);
+    const sbp = clamp(Number(p.presion_sistolica ?? 120.0), m.clamps.presion_sistolica);
+    const nonHdlMg = ("no_hdl" in p)
+      ? Number(p.no_hdl ?? 130.0)
+      : Math.max(0.0, Number(p.colesterol_total ?? 200.0) - Number(p.hdl ?? 50.0));
+    const nonHdl = clamp(nonHdlMg / s.mg_per_mmol, m.clamps.no_hdl_mmol);
+    const c = m.coefficients[isMale(p) ? "men" : "women"];
+    const lnAge = Math.log(age);
+    const L = c.ln_age * lnAge + c.ln_age2 * (lnAge * lnAge) + c.ln_sbp * Math.log(sbp)
+      + c.ln_chol * Math.log(nonHdl) + c.smoker * flag(p.fumador);
+    const risk = 1.0 - Math.pow(c.S0, Math.exp(L - c.mean));
+    const scale = m.region_scale[regionKey(spec, p, "moderado")] ?? 1.0;
+    return pyRound1(Math.max(0.0, Math.min(risk * 100.0 * scale, m.max_pct)));
+  }
+
+  function score2(spec, p){
+    const paths = spec.score2.paths;
+    if (paths.includes("tables")){
+      try {
+        const r = score2Tables(spec, p);
+        if (r) return r;
+      } catch (_) { /* igual que el servidor: se pasa a la siguiente ruta */ }
+    }
+    if (paths.includes("official")){
+      try {
+        const r = score2Official(spec, p);
+        if (r && r.percent !== null) return r;
+      } catch (_) { /* siguiente ruta */ }
+    }
+    const pct = score2Surrogate(spec, p);
+    return {percent: pct, category: categorizeScore2(spec, pct, Number(p.edad ?? 60))};
+  }
+
+  /** Errores de entrada con las reglas de validate_patient_data (lista vacía si es válida). */
+  function validate(spec, p){
+    const rules = spec.validation;
+    const errors = [];
+    for (const [key, [low, high]] of Object.entries(rules.ranges)){
+      if (!(key in p)){
+        errors.push(`Falta el parámetro ${key}`);
+        continue;
+      }
+      const n = Number(p[key]);
+      if (p[key] === null || String(p[key]).trim() === "" || Number.isNaN(n)){
+        errors.push(`${key} no es numérico`);
+        continue;
+      }
+      if (!(low <= n && n <= high)) errors.push(`${key} fuera de rango (${low}-${high})`);
+    }
+    if (p.sexo === undefined || p.sexo === null){
+      errors.push("Falta el parámetro sexo");
+    } else if (!rules.sexes.includes(String(p.sexo).toLowerCase())){
+      errors.push("sexo debe ser 'hombre' o 'mujer'");
+    }
+    for (const key of rules.flags){
+      if (!(key in p)) errors.push(`Falta el parámetro ${key}`);
+    }
+    return errors;
+  }
+
+  /** Evalúa `method` (framingham | score | acc-aha | all) con la misma forma de `result` que /calculate. */
+  function evaluate(spec, patient, method = "all"){
+    const result = {};
+    if (method === "framingham" || method === "all") result.framingham = framingham(spec, patient);
+    if (method === "score" || method === "all") result.score = score2(spec, patient);
+    if (method === "acc-aha" || method === "all") result.acc_aha = accAha(spec, patient);
+    return result;
+  }
+
+  return {FORMAT, evaluate, validate, pyRound1};
+})();
@@ -7,6 +7,44 @@ const interpretationDiv = document.getElementById("interpretation");
 const btnPdf = document.getElementById("btn-pdf");
 const profileSelect = document.getElementById("profile-select");
 let currentSessionId = null;
+let pendingPatient = null; // calculado en el navegador; la sesión se crea al pedir el PDF
+let modelSpec = null; // /models/spec: permite calcular en el navegador
+
+// Carga única del paquete de modelos (cacheable por HTTP vía ETag)
+fetch(`${API_URL}/models/spec`)
+  .then(res => res.ok ? res.json() : null)
+  .then(spec => { modelSpec = spec; })
+  .catch(err => console.warn("Sin especificación de modelos; se calculará en el servidor:", err));
+
+// Resultado local solo si equivale al del servidor: mismo formato de spec,
+// sin campos que solo calcula el servidor (percentile) y entrada válida.
+// En cualquier otro caso devuelve null y se usa /calculate.
+function evaluateLocally(data){
+  if (!modelSpec || typeof RiskModel === "undefined") return null;
+  if (modelSpec.format !== RiskModel.FORMAT || modelSpec.percentiles) return null;
+  try {
+    if (RiskModel.validate(modelSpec, data).length) return null; // el servidor devuelve los errores
+    return RiskModel.evaluate(modelSpec, data, "all");
+  } catch(err){
+    console.warn("Evaluación local fallida; se usa el servidor:", err);
+    return null;
+  }
+}
+
+async function calculateOnServer(data){
+  const res = await fetch(`${API_URL}/calculate/all`, {
+    method: "POST",
+    headers: {"Content-Type":"application/json"},
+    body: JSON.stringify(data)
+  });
+  if (!res.ok){
+    const text = await res.text();
+    throw new Error(`HTTP ${res.status} ${res.statusText}${text?` - ${text}`:""}`);
+  }
+  const json = await res.json();
+  if (json.status !== "ok") throw new Error((json.errors||[]).join(", ")||"Error desconocido");
+  return json;
+}
 
 form.addEventListener("submit", async (e) => {
   e.preventDefault();
@@ -16,6 +54,8 @@ form.addEventListener("submit", async (e) => {
   interpretationDiv.textContent = "";
   chartsDiv.innerHTML = "";
   resultsSection.classList.add("hidden");
+  currentSessionId = null;
+  pendingPatient = null;
 
   const data = Object.fromEntries(new FormData(form).entries());
 
@@ -25,20 +65,18 @@ form.addEventListener("submit", async (e) => {
   );
   data.region_riesgo = "alto"; // simplificación para SCORE
 
-  try {
-    const res = await fetch(`${API_URL}/calculate/all`, {
-      method: "POST",
-      headers: {"Content-Type":"application/json"},
-      body: JSON.stringify(data)
-    });
-    if (!res.ok){
-      const text = await res.text();
-      throw new Error(`HTTP ${res.status} ${res.statusText}${text?` - ${text}`:""}`);
-    }
-    const json = await res.json();
-    if (json.status !== "ok") throw new Error((json.errors||[]).join(", ")||"Error desconocido");
+  // Con el modelo cargado el cálculo no sale del navegador
+  const local = evaluateLocally(data);
+  if (local){
+    pendingPatient = data;
+    displayResults(local);
+    btnPdf.disabled = false;
+    return;
+  }
 
-    currentSessionId = json.session_id;
+  try {
+    const json = await calculateOnServer(data);
+    currentSessionId = json.session_id || json.token;
     displayResults(json.result);
     btnPdf.disabled = false;
   } catch(err){
@@ -48,9 +86,20 @@ form.addEventListener("submit", async (e) => {
 });
 
 btnPdf.addEventListener("click", async () => {
-  if (!currentSessionId) return;
-  const url = `${API_URL}/generate-report/${currentSessionId}`;
-  window.open(url,"_blank");
+  if (!currentSessionId && !pendingPatient) return;
+  // La ventana se abre dentro del clic (bloqueadores de pop-ups) y se dirige al informe después
+  const win = window.open("", "_blank");
+  try {
+    if (!currentSessionId){
+      const json = await calculateOnServer(pendingPatient);
+      currentSessionId = json.session_id || json.token;
+    }
+    win.location = `${API_URL}/generate-report/${currentSessionId}`;
+  } catch(err){
+    win?.close();
+    console.error("Fallo al crear la sesión del informe:", err);
+    alert("Error: " + (err?.message||err));
+  }
 });
 
 function validateForm(){
@@ -98,7 +147,10 @@ function displayResults(result){
   const globalLabel = labelMap[medianLevel];
   const dispersion = levels[levels.length-1] - levels[0];
 
-  const catsPretty = `Framingham: ${cats[0]} · SCORE2: ${cats[1]} · ACC/AHA: ${cats[2]}`;
+  // Percentil poblacional: solo lo añade el servidor cuando tiene índice
+  const pctl = (r) => Number.isFinite(r?.percentile) ? ` (percentil ${r.percentile})` : "";
+  const catsPretty = `Framingham: ${cats[0]}${pctl(result.framingham)} · SCORE2: ${cats[1]}${pctl(result.score)}`
+    + ` · ACC/AHA: ${cats[2]}${pctl(result.acc_aha)}`;
   const note = dispersion >= 2 ? " (discordancia alta entre escalas)" : "";
   interpretationDiv.innerHTML =
     `<p>Riesgo global (consenso): <strong>${globalLabel}</strong>${note}</p>
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Construye el índice de percentiles de riesgo (backend/risk_percentiles.json).
+
+Uso:
+    python scripts/build_percentiles.py --store referencia.crcs --workers 8
+    python scripts/build_percentiles.py --synthetic 1000000 --seed 7 --workers 8
+    python scripts/build_percentiles.py --store referencia.crcs --out /tmp/percentiles.json
+
+La cohorte de referencia puede ser un almacén de scripts/cohort.py o una
+población sintética de backend/synthetic.py. Un índice sintético queda
+marcado como tal y el servidor solo lo carga si se indica explícitamente con
+CARDIORISK_PERCENTILES_PATH (pruebas). El índice queda ligado al
+MODEL_VERSION actual: hay que reconstruirlo si cambian los coeficientes.
+
+Por defecto se puntúa con los módulos tal como los importa backend/app.py
+(mismas rutas SCORE2 disponibles y mismo MODEL_VERSION). Con
+--context package se usa el paquete backend, como el resto de scripts.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT = os.path.join(ROOT, "backend", "risk_percentiles.json")
+
+
+def load_modules(context: str):
+    """Módulos (cohort_store, parallel, percentiles, synthetic) del contexto pedido."""
+    if context == "app":
+        sys.path.insert(0, os.path.join(ROOT, "backend"))
+        prefix = ""
+    else:
+        sys.path.append(ROOT)
+        prefix = "backend."
+    return [importlib.import_module(prefix + name) for name in ("cohort_store", "parallel", "percentiles", "synthetic")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--store", help="almacén .crcs de la cohorte de referencia")
+    source.add_argument("--synthetic", type=int, metavar="FILAS", help="población sintética de FILAS pacientes")
+    parser.add_argument("--seed", default="0")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--context", choices=("app", "package"), default="app")
+    args = parser.parse_args()
+    cohort_store, parallel, percentiles, synthetic = load_modules(args.context)
+
+    start = time.perf_counter()
+    store = None
+    if args.store:
+        store = cohort_store.CohortStore.open(args.store)
+        columns, label = store.columns(), os.path.basename(args.store)
+    else:
+        columns = synthetic.generate_population(args.synthetic, args.seed, workers=args.workers)
+        label = f"synthetic:rows={args.synthetic},seed={args.seed}"
+    try:
+        result = parallel.score_cohort_parallel(columns, workers=args.workers)
+        for err in result.errors:
+            print(f"AVISO: filas {err.start}-{err.stop} sin resultado: {err.error}", file=sys.stderr)
+        scored = {s: (result.percent[s], result.category[s]) for s in result.percent}
+        index = percentiles.build_index(columns, scored, source=label, synthetic=store is None)
+    finally:
+        if store is not None:
+            store.close()
+    percentiles.write_index(index, args.out)
+
+    small = [k for k, g in index["groups"].items() if g["n"] < percentiles.MIN_GROUP]
+    print(f"{len(index['groups'])} grupos de {index['rows']} filas, MODEL_VERSION {index['model_version']} → {args.out} "
+          f"({time.perf_counter() - start:.1f} s)")
+    if small:
+        print(f"{len(small)} grupos con menos de {percentiles.MIN_GROUP} pacientes (sin percentil): {', '.join(small[:5])}"
+              + (" …" if len(small) > 5 else ""))
+
+
+if __name__ == "__main__":
+    main()
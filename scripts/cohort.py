@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Utilidades de cohortes sobre el almacén columnar binario.
+
+Uso:
+    python scripts/cohort.py ingest pacientes.csv cohorte.crcs [--delimiter ";"]
+    python scripts/cohort.py info cohorte.crcs
+    python scripts/cohort.py score cohorte.crcs [--workers 8] [--json]
+
+`ingest` convierte el CSV una sola vez (columnas con los nombres de
+/calculate); `score` reabre el fichero por mmap, puntúa en paralelo y
+muestra el resumen de la cohorte (percentiles, categorías, discordancia).
+Por defecto (--context app) se puntúa como en el servidor; --context package
+usa los módulos como paquete (SCORE2 por tablas).
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_modules(context: str):
+    """Módulos (cohort_stats, cohort_store, parallel) del contexto pedido."""
+    if context == "app":
+        sys.path.insert(0, os.path.join(ROOT, "backend"))
+        prefix = ""
+    else:
+        sys.path.append(ROOT)
+        prefix = "backend."
+    return [importlib.import_module(prefix + name) for name in ("cohort_stats", "cohort_store", "parallel")]
+
+
+def cmd_ingest(args, modules) -> None:
+    _cohort_stats, cohort_store, _parallel = modules
+    start = time.perf_counter()
+    try:
+        rows = cohort_store.ingest_csv(args.csv, args.store, args.delimiter)
+    except ValueError as err:
+        sys.exit(f"ERROR: {err}")
+    print(f"{rows} filas → {args.store} ({os.path.getsize(args.store)} bytes, {time.perf_counter() - start:.1f} s)")
+
+
+def cmd_info(args, modules) -> None:
+    start = time.perf_counter()
+    with modules[1].CohortStore.open(args.store) as store:
+        opened_ms = (time.perf_counter() - start) * 1000
+        print(json.dumps(store.header, indent=2, ensure_ascii=False))
+        print(f"apertura: {opened_ms:.2f} ms")
+
+
+def cmd_score(args, modules) -> None:
+    cohort_stats, cohort_store, parallel = modules
+    start = time.perf_counter()
+    with cohort_store.CohortStore.open(args.store) as store:
+        columns = store.columns()
+        result = parallel.score_cohort_parallel(columns, workers=args.workers)
+        scored = {s: (result.percent[s], result.category[s]) for s in result.percent}
+        agg = cohort_stats.CohortAggregator(tuple(scored))
+        # Las filas de shards fallidos no tienen resultado: el agregador las omite (skipped)
+        agg.add_scored(columns, scored)
+    summary = agg.summary()
+    summary["errors"] = [vars(e) for e in result.errors]
+    summary["seconds"] = round(time.perf_counter() - start, 2)
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        return
+    print(f"Filas: {summary['rows']} (sin resultado: {summary['skipped']}; {summary['seconds']} s)")
+    for scale, entry in summary["scales"].items():
+        pcts = ", ".join(f"p{k}={v}" for k, v in entry["percentiles"].items())
+        print(f"  {scale}: media {entry['mean']:.2f} % | {pcts}")
+        for cat, info in entry["categories"]["total"]["total"].items():
+            print(f"      {cat}: {info['share'] * 100:.1f} %")
+    if "total" in summary["discordance"]:
+        print(f"  Discordancia entre escalas: {summary['discordance']['total']['rate'] * 100:.1f} %")
+    for err in summary["errors"]:
+        print(f"  ERROR filas {err['start']}-{err['stop']}: {err['error']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--context", choices=("app", "package"), default="app")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ing = sub.add_parser("ingest", help="CSV → almacén binario")
+    ing.add_argument("csv")
+    ing.add_argument("store")
+    ing.add_argument("--delimiter", default=",")
+    inf = sub.add_parser("info", help="cabecera del almacén")
+    inf.add_argument("store")
+    sco = sub.add_parser("score", help="puntúa y resume la cohorte")
+    sco.add_argument("store")
+    sco.add_argument("--workers", type=int, default=None)
+    sco.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    modules = load_modules(args.context)
+    {"ingest": cmd_ingest, "info": cmd_info, "score": cmd_score}[args.command](args, modules)
+
+
+if __name__ == "__main__":
+    main()
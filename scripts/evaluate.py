@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Evalúa discriminación y calibración de las escalas en una cohorte con
+resultados observados a 10 años (backend/evaluation.py).
+
+Uso:
+    python scripts/evaluate.py cohorte.csv --outcome evento --bootstrap 1000 --workers 8
+    python scripts/evaluate.py cohorte.csv --outcome framingham=evento_cvd,acc_aha=evento_ascvd --json informe.json
+    python scripts/evaluate.py --synthetic 500000 --factor 1.2 --deciles
+
+Entrada como en scripts/recalibrate.py (CSV etiquetado o población
+sintética con resultados simulados). Las filas fuera del dominio de una
+escala (categoría "error", p. ej. SCORE2 por tablas con < 40 años) se
+excluyen de esa escala. El NRI se calcula entre escalas con el mismo
+resultado, con umbrales comunes (--thresholds, por defecto 7.5,20).
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+from recalibrate import ROOT, load_cohort
+
+
+def load_modules(context: str):
+    """Módulos (cohort_store, columnar, evaluation, parallel, synthetic) del contexto pedido."""
+    if context == "app":
+        sys.path.insert(0, os.path.join(ROOT, "backend"))
+        prefix = ""
+    else:
+        sys.path.append(ROOT)
+        prefix = "backend."
+    names = ("cohort_store", "columnar", "evaluation", "parallel", "synthetic")
+    return [importlib.import_module(prefix + name) for name in names]
+
+
+def _fmt(value, ci=None, digits=3) -> str:
+    if value is None:
+        return "-"
+    text = f"{value:.{digits}f}"
+    return f"{text} [{ci[0]:.{digits}f}, {ci[1]:.{digits}f}]" if ci else text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cohort", nargs="?", help="CSV etiquetado")
+    parser.add_argument("--synthetic", type=int, metavar="FILAS", help="población sintética con resultados simulados")
+    parser.add_argument("--factor", type=float, default=1.0, help="O/E de los resultados simulados (--synthetic)")
+    parser.add_argument("--seed", default="0")
+    parser.add_argument("--outcome", default="evento", help="columna de resultado o escala=columna,...")
+    parser.add_argument("--scales", default="framingham,score,acc_aha")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--thresholds", default="7.5,20", help="umbrales comunes (%%) del NRI categórico")
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="RÉPLICAS")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--deciles", action="store_true", help="muestra O/E por deciles")
+    parser.add_argument("--json", dest="json_out", help="guarda el informe completo en este fichero")
+    parser.add_argument("--context", choices=("app", "package"), default="app")
+    args = parser.parse_args()
+    if bool(args.cohort) == bool(args.synthetic):
+        parser.error("indica un CSV o --synthetic")
+    cohort_store, columnar, evaluation, parallel, synthetic = load_modules(args.context)
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    thresholds = tuple(float(t) for t in args.thresholds.split(",") if t.strip())
+
+    start = time.perf_counter()
+    try:
+        columns, outcomes, label = load_cohort(args, scales, cohort_store, columnar, synthetic)
+    except ValueError as err:
+        sys.exit(f"ERROR: {err}")
+    scored = parallel.score_cohort_parallel(columns, workers=args.workers, scales=list(outcomes))
+    for err in scored.errors:
+        print(f"AVISO: filas {err.start}-{err.stop} sin resultado: {err.error}", file=sys.stderr)
+    error_code = columnar.CATEGORY_CODE["error"]
+    predictions = {}
+    for scale in outcomes:
+        pct, cat = scored.percent[scale], scored.category[scale]
+        for i, code in enumerate(cat):
+            if code == error_code:
+                pct[i] = float("nan")
+        predictions[scale] = pct
+    loaded = time.perf_counter()
+    report = evaluation.evaluate(predictions, outcomes, thresholds, replicates=args.bootstrap,
+                                 seed=args.seed, workers=args.workers)
+    report["source"] = label
+    done = time.perf_counter()
+
+    ci = report.get("ci", {})
+    print(f"{label}: puntuación {loaded - start:.1f} s, métricas {done - loaded:.1f} s")
+    for scale, r in report["scales"].items():
+        cal = r["calibration"]
+        print(f"\n{scale} (n={cal['n']}, eventos={cal['observed']}, esperados={cal['expected']:.0f})")
+        print(f"  C          {_fmt(r['c_statistic'], ci.get(f'{scale}:c_statistic'))}")
+        print(f"  O/E        {_fmt(cal['oe'], ci.get(f'{scale}:oe'))}")
+        print(f"  CITL       {_fmt(cal['citl'], ci.get(f'{scale}:citl'))}")
+        print(f"  pendiente  {_fmt(cal['slope'], ci.get(f'{scale}:slope'))}")
+        if args.deciles:
+            for g in r["deciles"]:
+                print(f"    {g['min_pct']:>5}–{g['max_pct']:<5} n={g['n']:<8} obs {g['observed_pct']:>7} %  "
+                      f"esp {g['expected_pct']:>7} %  O/E {g['oe']}")
+    for name, r in report["nri"].items():
+        a, b = name.split("|")
+        print(f"\nNRI {a} → {b}: categórico {_fmt(r['categorical']['total'], ci.get(f'{name}:nri_categorical'))} "
+              f"(eventos {_fmt(r['categorical']['events'])}, no eventos {_fmt(r['categorical']['nonevents'])}); "
+              f"continuo {_fmt(r['continuous']['total'], ci.get(f'{name}:nri_continuous'))}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Puntúa una exportación FHIR R4 (Bundle JSON o NDJSON, admite .gz) en una
+sola pasada en streaming.
+
+Uso:
+    python scripts/fhir_score.py bundle.json > riesgos.csv
+    python scripts/fhir_score.py Patient.ndjson Observation.ndjson Condition.ndjson \\
+        MedicationStatement.ndjson --format jsonl --out riesgos.jsonl --workers 8
+    python scripts/fhir_score.py everything.ndjson.gz --per-bundle --as-of 2024-01-01 --region bajo
+
+Con --per-bundle (NDJSON con un Bundle $everything por paciente) cada
+paciente se puntúa al cerrar su Bundle. Si no, los pacientes se puntúan al
+final de la entrada; en memoria se guardan como mucho --max-in-memory
+estados compactos y el resto se vuelca a un SQLite temporal.
+Solo cuentan como tratamiento las prescripciones con estado --med-status
+(por defecto active,on-hold).
+Un resumen (pacientes puntuados/incompletos, tiempo) se escribe en stderr.
+Por defecto (--context app) se puntúa como en el servidor; --context package
+usa los módulos como paquete (SCORE2 por tablas).
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_modules(context: str):
+    """Módulos (exporters, fhir_ingest) del contexto pedido."""
+    if context == "app":
+        sys.path.insert(0, os.path.join(ROOT, "backend"))
+        prefix = ""
+    else:
+        sys.path.append(ROOT)
+        prefix = "backend."
+    return [importlib.import_module(prefix + name) for name in ("exporters", "fhir_ingest")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--out", default="-", help="fichero de salida ('-' = stdout)")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None,
+                        help="fecha de referencia para la edad (por defecto hoy)")
+    parser.add_argument("--region", default="moderado", help="región SCORE2 de la población")
+    parser.add_argument("--per-bundle", action="store_true", help="puntúa al cerrar cada Bundle (NDJSON)")
+    parser.add_argument("--med-status", default="active,on-hold",
+                        help="estados de MedicationStatement/Request que cuentan como tratamiento")
+    parser.add_argument("--max-in-memory", type=int, default=None,
+                        help="pacientes en memoria antes de volcar a disco (por defecto 100000)")
+    parser.add_argument("--chunk", type=int, default=None, help="pacientes por bloque (por defecto 50000)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--context", choices=("app", "package"), default="app")
+    args = parser.parse_args()
+    exporters, fhir_ingest = load_modules(args.context)
+
+    counts = {"scored": 0, "incomplete": 0}
+    start = time.perf_counter()
+
+    med_status = [s.strip() for s in args.med_status.split(",") if s.strip()]
+    chunks = fhir_ingest.iter_scored_chunks(
+        args.paths, chunk_rows=args.chunk or fhir_ingest.DEFAULT_CHUNK, workers=args.workers,
+        as_of=args.as_of, region=args.region, flush_each_bundle=args.per_bundle, med_status=med_status,
+        max_in_memory=args.max_in_memory or fhir_ingest.MAX_IN_MEMORY)
+
+    def records():
+        for chunk in chunks:
+            for rec in chunk:
+                counts["incomplete" if rec["errors"] else "scored"] += 1
+                yield rec
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8", newline="")
+    try:
+        for piece in exporters.render(args.format, records()):
+            out.write(piece)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{counts['scored']} pacientes puntuados, {counts['incomplete']} incompletos o fuera de rango "
+          f"({time.perf_counter() - start:.1f} s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Corpus dorado de regresión para las tres escalas.
+
+Genera un corpus aleatorio con semilla (entradas en todo RANGES, todas las
+regiones y combinaciones de booleanos, y una parte de las filas con no_hdl
+explícito), evalúa framingham / score / acc_aha y guarda las salidas en un
+snapshot binario compacto. Las entradas no se guardan: se regeneran de forma
+determinista a partir de (semilla, bloque).
+
+Por defecto (--context app) se puntúa con los módulos cargados como en el
+servidor (SCORE2 sustituto); --context package fija el camino de backend.*
+(SCORE2 por tablas u oficial si están disponibles). `check` usa el contexto
+guardado en el snapshot.
+
+Uso:
+    python scripts/golden_corpus.py generate --rows 2000000 --seed 42 --out golden.crgs
+    python scripts/golden_corpus.py generate --context package --out golden_package.crgs
+    python scripts/golden_corpus.py check golden.crgs          # recalcula con el código actual
+    python scripts/golden_corpus.py diff viejo.crgs nuevo.crgs
+
+Formato del snapshot (little-endian):
+    b"CRGS" | u16 versión | u32 longitud de cabecera | cabecera JSON
+    por escala: int16[rows] porcentaje en décimas | uint8[rows] código de categoría
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAGIC = b"CRGS"
+FORMAT_VERSION = 1
+GENERATOR_VERSION = 2  # subir si cambia la forma de muestrear entradas
+CHUNK_ROWS = 50_000
+BOUNDARY_SHARE = 0.05  # fracción de valores exactamente en el límite de RANGES
+NO_HDL_SHARE = 0.25  # fracción de filas con no_hdl explícito
+NO_HDL_RANGE = (60.0, 340.0)  # mg/dL; cubre los clamps de SCORE2 por ambos lados
+
+_MODULES: Dict[str, Tuple] = {}
+
+
+def load_modules(context: str):
+    """Módulos (calculators, columnar, validators) del contexto pedido; se importan una vez por proceso."""
+    if context not in _MODULES:
+        if context == "app":
+            sys.path.insert(0, os.path.join(ROOT, "backend"))
+            prefix = ""
+        else:
+            sys.path.append(ROOT)
+            prefix = "backend."
+        _MODULES[context] = tuple(importlib.import_module(prefix + name)
+                                  for name in ("calculators", "columnar", "validators"))
+    return _MODULES[context]
+
+
+def generate_inputs(seed: int, chunk: int, rows: int, context: str = "app") -> Dict[str, array]:
+    """
+    Entradas deterministas del bloque `chunk` (independiente de los demás):
+    columnas de columnar.SCHEMA más "no_hdl" (NaN = no se envía).
+    """
+    _calculators, columnar, validators = load_modules(context)
+    rng = random.Random(f"{seed}:{chunk}")
+    cols = columnar.empty_columns()
+    cols["no_hdl"] = array("d")
+    rand, uniform = rng.random, rng.uniform
+    numeric = [(cols[name].append, low, high) for name, (low, high) in validators.RANGES.items()]
+    n_regions = len(columnar.REGION_CODES)
+    nan = float("nan")
+    for _ in range(rows):
+        for put, low, high in numeric:
+            r = rand()
+            if r < BOUNDARY_SHARE:
+                put(float(low if r < BOUNDARY_SHARE / 2 else high))
+            else:
+                put(round(uniform(low, high), 1))
+        cols["sexo"].append(int(rand() * 2))
+        cols["region_riesgo"].append(int(rand() * n_regions))
+        cols["fumador"].append(int(rand() * 2))
+        cols["diabetes"].append(int(rand() * 2))
+        cols["tratamiento_hipertension"].append(int(rand() * 2))
+        cols["no_hdl"].append(round(uniform(*NO_HDL_RANGE), 1) if rand() < NO_HDL_SHARE else nan)
+    return cols
+
+
+def corpus_patient(columns: Dict[str, array], i: int, context: str = "app") -> Dict:
+    """Dict de paciente de la fila i, con no_hdl solo si la fila lo trae."""
+    patient = load_modules(context)[1].row_patient(columns, i)
+    no_hdl = columns["no_hdl"][i]
+    if no_hdl == no_hdl:
+        patient["no_hdl"] = no_hdl
+    return patient
+
+
+def _chunks(rows: int) -> List[Tuple[int, int]]:
+    return [(c, min(CHUNK_ROWS, rows - c * CHUNK_ROWS)) for c in range((rows + CHUNK_ROWS - 1) // CHUNK_ROWS)]
+
+
+def _score_chunk(args: Tuple[int, int, int, str]) -> Dict[str, Tuple[bytes, bytes]]:
+    seed, chunk, rows, context = args
+    calculators, columnar, _validators = load_modules(context)
+    cols = generate_inputs(seed, chunk, rows, context)
+    code = columnar.CATEGORY_CODE
+    out = {}
+    for scale in columnar.SCALES:
+        func = calculators.SCALE_FUNCTIONS[scale]
+        tenths, cats = array("h"), array("B")
+        for i in range(rows):
+            res = func(corpus_patient(cols, i, context))
+            tenths.append(int(round(res["percent"] * 10)))
+            cats.append(code[res["category"]])
+        out[scale] = (tenths.tobytes(), cats.tobytes())
+    return out
+
+
+def build_snapshot(rows: int, seed: int, workers: int = 1,
+                   context: str = "app") -> Tuple[Dict, Dict[str, Tuple[array, array]]]:
+    calculators, columnar, _validators = load_modules(context)
+    jobs = [(seed, c, n, context) for c, n in _chunks(rows)]
+    data = {scale: (array("h"), array("B")) for scale in columnar.SCALES}
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_score_chunk, jobs)
+            for part in parts:
+                for scale, (pct, cat) in part.items():
+                    data[scale][0].frombytes(pct)
+                    data[scale][1].frombytes(cat)
+    else:
+        for job in jobs:
+            for scale, (pct, cat) in _score_chunk(job).items():
+                data[scale][0].frombytes(pct)
+                data[scale][1].frombytes(cat)
+    header = {
+        "rows": rows,
+        "seed": seed,
+        "chunk_rows": CHUNK_ROWS,
+        "generator_version": GENERATOR_VERSION,
+        "context": context,
+        "model_version": calculators.MODEL_VERSION,
+        "score2_paths": {
+            "tables": callable(calculators.score2_lookup_from_tables),
+            "official": callable(calculators.score2_risk_official),
+        },
+        "scales": list(columnar.SCALES),
+        "categories": list(columnar.CATEGORY_LABELS),
+    }
+    return header, data
+
+
+def write_snapshot(path: str, header: Dict, data: Dict[str, Tuple[array, array]]) -> None:
+    raw_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    with open(path, "wb") as fh:
+        fh.write(MAGIC + struct.pack("<HI", FORMAT_VERSION, len(raw_header)) + raw_header)
+        for scale in header["scales"]:
+            pct, cat = data[scale]
+            if sys.byteorder == "big":
+                pct = array("h", pct)
+                pct.byteswap()
+            fh.write(pct.tobytes())
+            fh.write(cat.tobytes())
+
+
+def read_snapshot(path: str) -> Tuple[Dict, Dict[str, Tuple[array, array]]]:
+    with open(path, "rb") as fh:
+        if fh.read(4) != MAGIC:
+            raise ValueError(f"{path}: no es un snapshot CRGS")
+        version, header_len = struct.unpack("<HI", fh.read(6))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: versión de formato {version} no soportada")
+        header = json.loads(fh.read(header_len).decode("utf-8"))
+        rows = header["rows"]
+        data = {}
+        for scale in header["scales"]:
+            pct, cat = array("h"), array("B")
+            pct.frombytes(fh.read(2 * rows))
+            cat.frombytes(fh.read(rows))
+            if sys.byteorder == "big":
+                pct.byteswap()
+            data[scale] = (pct, cat)
+    return header, data
+
+
+def _differing_rows(a: array, b: array, block: int = 4096) -> List[int]:
+    """Índices distintos; compara bloques en C y solo recorre los que difieren."""
+    if a == b:
+        return []
+    rows = []
+    ma, mb = memoryview(a), memoryview(b)
+    for start in range(0, len(a), block):
+        if ma[start:start + block] != mb[start:start + block]:
+            rows.extend(i for i in range(start, min(start + block, len(a))) if a[i] != b[i])
+    return rows
+
+
+def diff_snapshots(old: Tuple[Dict, Dict], new: Tuple[Dict, Dict], show: int = 10) -> Dict:
+    (h_old, d_old), (h_new, d_new) = old, new
+    for key in ("rows", "seed", "chunk_rows", "generator_version"):
+        if h_old[key] != h_new[key]:
+            raise ValueError(f"Snapshots no comparables: {key} {h_old[key]} != {h_new[key]}")
+    report = {"rows": h_old["rows"], "model_version": [h_old["model_version"], h_new["model_version"]],
+              "context": [h_old.get("context", "package"), h_new.get("context", "package")], "scales": {}}
+    labels_old, labels_new = h_old["categories"], h_new["categories"]
+    for scale in h_old["scales"]:
+        if scale not in d_new:
+            report["scales"][scale] = {"missing": True}
+            continue
+        (p_old, c_old), (p_new, c_new) = d_old[scale], d_new[scale]
+        pct_rows = _differing_rows(p_old, p_new)
+        if labels_old == labels_new:
+            cat_rows = _differing_rows(c_old, c_new)
+        else:
+            cat_rows = [i for i in range(len(c_old)) if labels_old[c_old[i]] != labels_new[c_new[i]]]
+        changed = sorted(set(pct_rows) | set(cat_rows))
+        samples = []
+        context = h_old.get("context", "package")
+        for i in changed[:show]:
+            chunk, offset = divmod(i, h_old["chunk_rows"])
+            n = min(h_old["chunk_rows"], h_old["rows"] - chunk * h_old["chunk_rows"])
+            samples.append({
+                "row": i,
+                "patient": corpus_patient(generate_inputs(h_old["seed"], chunk, n, context), offset, context),
+                "old": {"percent": p_old[i] / 10, "category": labels_old[c_old[i]]},
+                "new": {"percent": p_new[i] / 10, "category": labels_new[c_new[i]]},
+            })
+        report["scales"][scale] = {
+            "changed_rows": len(changed),
+            "percent_changed": len(pct_rows),
+            "category_changed": len(cat_rows),
+            "max_abs_delta": max((abs(p_old[i] - p_new[i]) / 10 for i in pct_rows), default=0.0),
+            "samples": samples,
+        }
+    report["identical"] = all(s.get("changed_rows", 1) == 0 for s in report["scales"].values())
+    return report
+
+
+def print_report(report: Dict) -> None:
+    print(f"Filas: {report['rows']} | versión modelo: {report['model_version'][0]} → {report['model_version'][1]}"
+          f" | contexto: {report['context'][0]} → {report['context'][1]}")
+    for scale, s in report["scales"].items():
+        if s.get("missing"):
+            print(f"  {scale}: ausente en el snapshot nuevo")
+            continue
+        print(f"  {scale}: {s['changed_rows']} filas cambiadas (porcentaje {s['percent_changed']},"
+              f" categoría {s['category_changed']}, Δmáx {s['max_abs_delta']:.1f} pp)")
+        for sample in s["samples"]:
+            print(f"    fila {sample['row']}: {sample['old']} → {sample['new']} | {sample['patient']}")
+    print("IDÉNTICOS" if report["identical"] else "DIFERENCIAS ENCONTRADAS")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="genera y guarda un snapshot")
+    gen.add_argument("--rows", type=int, default=1_000_000)
+    gen.add_argument("--seed", type=int, default=42)
+    gen.add_argument("--out", required=True)
+    gen.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    gen.add_argument("--context", choices=("app", "package"), default="app")
+    chk = sub.add_parser("check", help="recalcula con el código actual y compara con un snapshot")
+    chk.add_argument("snapshot")
+    chk.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    chk.add_argument("--context", choices=("app", "package"), default=None,
+                     help="por defecto, el del snapshot")
+    dif = sub.add_parser("diff", help="compara dos snapshots")
+    dif.add_argument("old")
+    dif.add_argument("new")
+    for p in (chk, dif):
+        p.add_argument("--show", type=int, default=10, help="filas de ejemplo por escala")
+        p.add_argument("--json", action="store_true", help="informe en JSON")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        start = time.perf_counter()
+        header, data = build_snapshot(args.rows, args.seed, args.workers, args.context)
+        write_snapshot(args.out, header, data)
+        print(f"{args.rows} filas → {args.out} ({os.path.getsize(args.out)} bytes, "
+              f"{time.perf_counter() - start:.1f} s, modelo {header['model_version']}, contexto {header['context']})")
+        return
+
+    if args.command == "check":
+        old = read_snapshot(args.snapshot)
+        if old[0]["generator_version"] != GENERATOR_VERSION:
+            sys.exit("El snapshot se generó con otra versión del generador de entradas")
+        new = build_snapshot(old[0]["rows"], old[0]["seed"], args.workers,
+                             args.context or old[0].get("context", "package"))
+    else:
+        old, new = read_snapshot(args.old), read_snapshot(args.new)
+
+    report = diff_snapshots(old, new, args.show)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+    sys.exit(0 if report["identical"] else 1)
+
+
+if __name__ == "__main__":
+    main()
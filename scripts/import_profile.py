@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Perfil de tiempo de importación (arranque en frío) de los módulos del backend.
+
+Lanza un intérprete limpio por módulo con `python -X importtime` y resume:
+- tiempo total hasta tener el módulo importado
+- los paquetes con mayor tiempo acumulado
+
+Uso:
+    python scripts/import_profile.py                 # calculators y app
+    python scripts/import_profile.py calculators --top 15 --json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+
+
+def profile_module(module: str) -> Dict:
+    """Importa `module` en un subproceso y devuelve tiempos por paquete (µs)."""
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=BACKEND, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000.0
+
+    entries: List[Dict] = []
+    for line in proc.stderr.splitlines():
+        # Formato: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            entries.append({
+                "package": name.strip(),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+            })
+        except ValueError:
+            continue
+
+    top_level = [e for e in entries if e["depth"] == 0]
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "wall_ms": round(wall_ms, 1),
+        "imports_ms": round(sum(e["cumulative_us"] for e in top_level) / 1000.0, 1),
+        "modules_loaded": len(entries),
+        "reportlab_loaded": any(e["package"].startswith("reportlab") for e in entries),
+        "entries": sorted(entries, key=lambda e: e["cumulative_us"], reverse=True),
+    }
+
+
+def print_report(report: Dict, top: int) -> None:
+    print(f"\n==> import {report['module']}")
+    if not report["ok"]:
+        print("   ERROR:", report["error"])
+        return
+    print(f"   proceso completo: {report['wall_ms']} ms | importaciones: {report['imports_ms']} ms"
+          f" | módulos: {report['modules_loaded']} | reportlab: {'sí' if report['reportlab_loaded'] else 'no'}")
+    print(f"   {'acumulado ms':>12}  {'propio ms':>9}  paquete")
+    for e in report["entries"][:top]:
+        print(f"   {e['cumulative_us'] / 1000.0:12.1f}  {e['self_us'] / 1000.0:9.1f}  {e['package']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["calculators", "app"])
+    parser.add_argument("--top", type=int, default=10, help="paquetes a listar por módulo")
+    parser.add_argument("--json", action="store_true", help="salida JSON")
+    args = parser.parse_args()
+
+    reports = [profile_module(m) for m in args.modules]
+    if args.json:
+        for r in reports:
+            r["entries"] = r["entries"][:args.top]
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+        return
+    for r in reports:
+        print_report(r, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga HTTP con pacientes sintéticos (backend/synthetic.py).
+
+Modo cerrado (por defecto): `--concurrency` clientes envían peticiones sin
+pausa durante `--duration` segundos. Modo abierto: `--rate` llegadas por
+segundo (proceso de Poisson) independientemente de la latencia, con hasta
+`--concurrency` peticiones en vuelo (las que no caben cuentan como
+"dropped"). Con `--start-server` se lanza backend/app.py localmente.
+
+Mezcla de peticiones (`--mix`), pesos relativos:
+    framingham, score, acc-aha, all  → POST /calculate/<method>
+    risk                             → GET /risk/all (cacheable)
+    report                           → POST /calculate/all + GET /generate-report/<id>
+
+Uso:
+    python scripts/load_test.py --start-server --duration 20 --concurrency 16 --mix all=8,report=1
+    python scripts/load_test.py --url http://127.0.0.1:5000 --rate 200 --duration 30 --json informe.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from synthetic import generate_chunk, row_body  # noqa: E402
+
+PATIENT_BLOCK = 1000
+
+
+def synthetic_patients(seed) -> Iterator[Dict]:
+    """Flujo infinito de cuerpos de /calculate de la población sintética con semilla `seed`."""
+    for chunk in itertools.count():
+        cols = generate_chunk(seed, chunk, PATIENT_BLOCK)
+        for i in range(PATIENT_BLOCK):
+            yield row_body(cols, i)
+
+
+class Client:
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, bytes]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as err:
+            return err.code, err.read()
+
+    def run(self, kind: str, patient: Dict) -> int:
+        if kind in ("framingham", "score", "acc-aha", "all"):
+            return self._request("POST", f"/calculate/{kind}", patient)[0]
+        if kind == "risk":
+            query = urllib.parse.urlencode({k: str(v).lower() if isinstance(v, bool) else v for k, v in patient.items()})
+            return self._request("GET", f"/risk/all?{query}")[0]
+        if kind == "report":
+            status, body = self._request("POST", "/calculate/all", patient)
+            if status != 200:
+                return status
+            data = json.loads(body)
+            # En modo sin estado (CARDIORISK_STATELESS=1) no hay sesión: el informe se pide con el token
+            ref = data.get("session_id") or data.get("token")
+            if not ref:
+                return "sin_sesion"
+            return self._request("GET", f"/generate-report/{ref}")[0]
+        raise ValueError(f"Tipo de petición desconocido: {kind}")
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.dropped = 0
+
+    def record(self, kind: str, latency: float, status) -> None:
+        with self._lock:
+            self.latencies[kind].append(latency)
+            self.statuses[kind][status] += 1
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[idx]
+
+
+def _one(client: Client, recorder: Recorder, kind: str, patient: Dict) -> None:
+    start = time.perf_counter()
+    try:
+        status = client.run(kind, patient)
+    except Exception as err:  # timeouts, conexión rechazada...
+        status = type(err).__name__
+    recorder.record(kind, time.perf_counter() - start, status)
+
+
+def run_closed(client: Client, recorder: Recorder, mix: List[Tuple[str, float]], concurrency: int,
+               duration: float, seed: int) -> None:
+    deadline = time.perf_counter() + duration
+    kinds, weights = zip(*mix)
+
+    def worker(idx: int) -> None:
+        rng = random.Random(seed * 1000 + idx)
+        patients = synthetic_patients(f"{seed}:{idx}")
+        while time.perf_counter() < deadline:
+            _one(client, recorder, rng.choices(kinds, weights)[0], next(patients))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run_open(client: Client, recorder: Recorder, mix: List[Tuple[str, float]], concurrency: int,
+             duration: float, rate: float, seed: int) -> None:
+    rng = random.Random(seed)
+    patients = synthetic_patients(seed)
+    kinds, weights = zip(*mix)
+    in_flight = threading.BoundedSemaphore(concurrency)
+
+    def task(kind, patient):
+        try:
+            _one(client, recorder, kind, patient)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        next_at = start
+        while next_at < start + duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if in_flight.acquire(blocking=False):
+                pool.submit(task, rng.choices(kinds, weights)[0], next(patients))
+            else:
+                recorder.dropped += 1
+            next_at += rng.expovariate(rate)
+
+
+def build_report(recorder: Recorder, elapsed: float, config: Dict) -> Dict:
+    report = {"config": config, "elapsed_s": round(elapsed, 3), "dropped": recorder.dropped, "by_kind": {}}
+    all_lat: List[float] = []
+    total = errors = 0
+    for kind, lats in recorder.latencies.items():
+        lats = sorted(lats)
+        all_lat += lats
+        statuses = recorder.statuses[kind]
+        n = len(lats)
+        bad = sum(c for s, c in statuses.items() if not (isinstance(s, int) and s < 400))
+        total += n
+        errors += bad
+        report["by_kind"][kind] = {
+            "requests": n,
+            "throughput_rps": round(n / elapsed, 2) if elapsed else None,
+            "error_rate": round(bad / n, 4) if n else None,
+            "statuses": {str(s): c for s, c in statuses.items()},
+            "latency_ms": {f"p{int(q * 1000) / 10:g}": round(_percentile(lats, q) * 1000, 2)
+                           for q in (0.5, 0.9, 0.95, 0.99, 0.999)} if n else {},
+            "max_ms": round(lats[-1] * 1000, 2) if n else None,
+        }
+    all_lat.sort()
+    report["total"] = {
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "error_rate": round(errors / total, 4) if total else None,
+        "latency_ms": {f"p{int(q * 1000) / 10:g}": round(_percentile(all_lat, q) * 1000, 2)
+                       for q in (0.5, 0.9, 0.95, 0.99, 0.999)} if total else {},
+    }
+    return report
+
+
+def print_report(report: Dict) -> None:
+    cfg = report["config"]
+    mode = f"abierto {cfg['rate']} req/s" if cfg["rate"] else f"cerrado {cfg['concurrency']} clientes"
+    print(f"Carga {mode} durante {report['elapsed_s']} s contra {cfg['url']}")
+    rows = list(report["by_kind"].items()) + [("TOTAL", report["total"])]
+    print(f"{'tipo':<12}{'peticiones':>11}{'req/s':>9}{'errores':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for kind, r in rows:
+        lat = r["latency_ms"]
+        print(f"{kind:<12}{r['requests']:>11}{r['throughput_rps'] or 0:>9.1f}{(r['error_rate'] or 0) * 100:>8.1f}%"
+              f"{lat.get('p50', 0):>9.1f}{lat.get('p95', 0):>9.1f}{lat.get('p99', 0):>9.1f}")
+    if report["dropped"]:
+        print(f"Llegadas descartadas por límite de concurrencia: {report['dropped']}")
+    for kind, r in report["by_kind"].items():
+        odd = {s: c for s, c in r["statuses"].items() if s != "200"}
+        if odd:
+            print(f"  {kind}: respuestas no-200 {odd}")
+
+
+def start_server(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-c",
+         f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True, debug=False)"],
+        cwd=os.path.join(ROOT, "backend"), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/healthz"
+    for _ in range(100):
+        try:
+            with urllib.request.urlopen(url, timeout=0.5):
+                return proc
+        except Exception:
+            if proc.poll() is not None:
+                raise SystemExit("El servidor terminó al arrancar")
+            time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("El servidor no respondió a /healthz")
+
+
+def parse_mix(raw: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in raw.split(","):
+        kind, _, weight = part.partition("=")
+        mix.append((kind.strip(), float(weight or 1)))
+    valid = {"framingham", "score", "acc-aha", "all", "risk", "report"}
+    unknown = [k for k, _ in mix if k not in valid]
+    if unknown:
+        raise SystemExit(f"Tipos desconocidos en --mix: {unknown}")
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--start-server", action="store_true", help="lanza backend/app.py en --port")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="llegadas/s (modo abierto); 0 = modo cerrado")
+    parser.add_argument("--mix", default="all=1")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", metavar="FICHERO", help="guarda el informe JSON ('-' = stdout)")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    proc = start_server(args.port) if args.start_server else None
+    url = f"http://127.0.0.1:{args.port}" if proc else args.url
+    try:
+        client, recorder = Client(url, args.timeout), Recorder()
+        start = time.perf_counter()
+        if args.rate > 0:
+            run_open(client, recorder, mix, args.concurrency, args.duration, args.rate, args.seed)
+        else:
+            run_closed(client, recorder, mix, args.concurrency, args.duration, args.seed)
+        elapsed = time.perf_counter() - start
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    config = {"url": url, "duration": args.duration, "concurrency": args.concurrency, "rate": args.rate,
+              "mix": dict(mix), "seed": args.seed}
+    report = build_report(recorder, elapsed, config)
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+        return
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
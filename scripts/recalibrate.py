@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Recalibra S0, la media del índice lineal y las escalas regionales SCORE2 a
+una cohorte local con resultados observados a 10 años (backend/recalibration.py).
+
+Uso:
+    python scripts/recalibrate.py cohorte.csv --outcome evento --out recalibration.json
+    python scripts/recalibrate.py cohorte.csv --outcome framingham=evento_cvd,acc_aha=evento_ascvd
+    python scripts/recalibrate.py --synthetic 1000000 --factor 1.3 --workers 8
+
+El CSV lleva las columnas de /calculate y una columna 0/1 de resultado (la
+misma para todas las escalas o una por escala). Con --synthetic los
+resultados se simulan con el riesgo actual multiplicado por --factor, para
+comprobar que el ajuste recupera O/E = 1. Solo deben usarse filas con
+seguimiento completo a 10 años o con evento.
+
+Para activar el resultado, copia el fichero a backend/recalibration.json o
+define CARDIORISK_RECALIBRATION_PATH. MODEL_VERSION cambia y el índice de
+percentiles debe reconstruirse (scripts/build_percentiles.py).
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_modules(context: str):
+    """Módulos (cohort_store, columnar, recalibration, synthetic) del contexto pedido."""
+    if context == "app":
+        sys.path.insert(0, os.path.join(ROOT, "backend"))
+        prefix = ""
+    else:
+        sys.path.append(ROOT)
+        prefix = "backend."
+    return [importlib.import_module(prefix + name) for name in ("cohort_store", "columnar", "recalibration", "synthetic")]
+
+
+def parse_outcomes(spec: str, scales):
+    """"evento" → la misma columna para todas las escalas; "escala=columna,..." → una por escala."""
+    if "=" not in spec:
+        return {scale: spec for scale in scales}
+    pairs = dict(item.split("=", 1) for item in spec.split(",") if item.strip())
+    return {scale.strip(): column.strip() for scale, column in pairs.items() if scale.strip() in scales}
+
+
+def load_cohort(args, scales, cohort_store, columnar, synthetic):
+    """(columnas, {escala: resultados 0/1}, etiqueta de procedencia)."""
+    if args.synthetic:
+        columns = synthetic.generate_population(args.synthetic, args.seed, workers=args.workers)
+        scored = columnar.score_columns(columns, scales=scales)
+        outcomes = {s: synthetic.simulate_outcomes(scored[s][0], f"{args.seed}:{s}", args.factor) for s in scales}
+        return columns, outcomes, f"synthetic:rows={args.synthetic},seed={args.seed},factor={args.factor}"
+    mapping = parse_outcomes(args.outcome, scales)
+    columns, by_column = cohort_store.read_labelled_csv(args.cohort, sorted(set(mapping.values())), args.delimiter)
+    return columns, {scale: by_column[column] for scale, column in mapping.items()}, os.path.basename(args.cohort)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cohort", nargs="?", help="CSV etiquetado")
+    parser.add_argument("--synthetic", type=int, metavar="FILAS", help="población sintética con resultados simulados")
+    parser.add_argument("--factor", type=float, default=1.0, help="O/E de los resultados simulados (--synthetic)")
+    parser.add_argument("--seed", default="0")
+    parser.add_argument("--outcome", default="evento", help="columna de resultado o escala=columna,...")
+    parser.add_argument("--scales", default="framingham,score,acc_aha")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--out", help="fichero de recalibración a escribir")
+    parser.add_argument("--context", choices=("app", "package"), default="app")
+    args = parser.parse_args()
+    if bool(args.cohort) == bool(args.synthetic):
+        parser.error("indica un CSV o --synthetic")
+    cohort_store, columnar, recalibration, synthetic = load_modules(args.context)
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+
+    start = time.perf_counter()
+    try:
+        columns, outcomes, label = load_cohort(args, scales, cohort_store, columnar, synthetic)
+        loaded = time.perf_counter()
+        data = recalibration.recalibrate(columns, outcomes, workers=args.workers, source=label)
+    except ValueError as err:
+        sys.exit(f"ERROR: {err}")
+    fitted = time.perf_counter()
+
+    print(f"{data['rows']} filas (carga {loaded - start:.1f} s, ajuste {fitted - loaded:.1f} s)")
+    for scale, report in data["fit"].items():
+        for sex in recalibration.SEXES:
+            r = report.get(sex)
+            if not r:
+                continue
+            new = data["scales"][scale][sex]
+            print(f"  {scale:<10} {sex:<5} n={r['n']:<8} eventos={r['events']:<7} "
+                  f"O/E {r['oe_before']} → {r['oe_after']}  S0 {r['before']['S0']} → {new['S0']}  [{r['status']}]")
+        for region, info in report.get("regions", {}).items():
+            print(f"  {scale:<10} región {region}: escala {data['scales'][scale]['region_scale'][region]} "
+                  f"(O={info['observed']}, E={info['expected']}) [{info['status']}]")
+    if args.out:
+        recalibration.write_recalibration(data, args.out)
+        print(f"→ {args.out}")
+
+
+if __name__ == "__main__":
+    main()
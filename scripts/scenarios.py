@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Evalúa escenarios de intervención sobre una cohorte (backend/scenarios.py).
+
+Uso:
+    python scripts/scenarios.py cohorte.crcs escenarios.json --workers 8
+    python scripts/scenarios.py pacientes.csv escenarios.json --scales score --json resultado.json
+    python scripts/scenarios.py --synthetic 200000 escenarios.json --seed 3
+
+escenarios.json es una lista [{"name": ..., "actions": [...]}] (o un objeto
+con la clave "scenarios"), con las mismas acciones que POST /scenarios.
+Se imprime por escala la variación de eventos esperados y cuántos pacientes
+bajan o suben de categoría; con --json se guarda la salida completa
+(matrices de transición incluidas).
+
+Por defecto (--context app) se importan los módulos como los carga el
+servidor, así que SCORE2 usa el mismo cálculo que /scenarios.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_modules(context: str):
+    """Módulos (cohort_store, scenarios, synthetic) del contexto pedido."""
+    if context == "app":
+        sys.path.insert(0, os.path.join(ROOT, "backend"))
+        prefix = ""
+    else:
+        sys.path.append(ROOT)
+        prefix = "backend."
+    return [importlib.import_module(prefix + name) for name in ("cohort_store", "scenarios", "synthetic")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cohort", nargs="?", help="almacén .crcs o CSV de pacientes")
+    parser.add_argument("scenarios", help="JSON con la lista de escenarios")
+    parser.add_argument("--synthetic", type=int, metavar="FILAS", help="usar una población sintética de FILAS pacientes")
+    parser.add_argument("--scales", default="framingham,score,acc_aha")
+    parser.add_argument("--seed", type=int, default=0, help="semilla de las acciones flip")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--json", dest="json_out", help="guarda la salida completa en este fichero")
+    parser.add_argument("--context", choices=("app", "package"), default="app")
+    args = parser.parse_args()
+    if bool(args.cohort) == bool(args.synthetic):
+        parser.error("indica una cohorte o --synthetic")
+    cohort_store, scenarios_mod, synthetic = load_modules(args.context)
+
+    with open(args.scenarios, "r", encoding="utf-8") as fh:
+        spec = json.load(fh)
+    scenarios = spec.get("scenarios", []) if isinstance(spec, dict) else spec
+
+    start = time.perf_counter()
+    store = None
+    if args.synthetic:
+        columns = synthetic.generate_population(args.synthetic, str(args.seed), workers=args.workers)
+    elif args.cohort.endswith(".crcs"):
+        store = cohort_store.CohortStore.open(args.cohort)
+        columns = store.columns()
+    else:
+        try:
+            columns = cohort_store.collect_patients(cohort_store.iter_csv_patients(args.cohort, args.delimiter))
+        except ValueError as err:
+            sys.exit(f"ERROR: {err}")
+    try:
+        result = scenarios_mod.run_scenarios(columns, scenarios, [s.strip() for s in args.scales.split(",")],
+                                             seed=args.seed, workers=args.workers)
+    except ValueError as err:
+        sys.exit(f"ERROR: {err}")
+    finally:
+        if store is not None:
+            store.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{result['rows']} pacientes, {len(result['scenarios'])} escenarios ({elapsed:.1f} s)")
+    for scale in result["scales"]:
+        base = result["baseline"][scale]
+        print(f"\n{scale}: {base['expected_events']:.1f} eventos esperados a 10 años  {base['categories']}")
+        for entry in result["scenarios"]:
+            s = entry["scales"][scale]
+            rel = f"{100 * s['delta_relative']:+.1f} %" if s["delta_relative"] is not None else "-"
+            print(f"  {entry['name']:<24} Δ eventos {s['delta_events']:+9.1f} ({rel})  "
+                  f"bajan {s['moved_down']}  suben {s['moved_up']}  (filas cambiadas {entry['changed_rows']})")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()